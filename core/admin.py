@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Customer, Loan
+from .models import Customer, CustomerCreditProfile, CustomerScore, IdempotencyKey, Loan
 # Register your models here.
 admin.site.register(Customer)
-admin.site.register(Loan)   
+admin.site.register(Loan)
+admin.site.register(CustomerCreditProfile)
+admin.site.register(CustomerScore)
+admin.site.register(IdempotencyKey)
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from .emi import warm_annuity_cache
+        from .metrics import install_query_timer
+        from .profiling import install_query_capture
+
+        connection_created.connect(install_query_timer, dispatch_uid='core.metrics.query_timer')
+        connection_created.connect(install_query_capture, dispatch_uid='core.profiling.query_capture')
+        warm_annuity_cache()
@@ -0,0 +1,734 @@
+"""
+Benchmarks for the Credit Approval System.
+
+Each benchmark is a function taking the parsed command options and returning a
+JSON-serializable dict of results. They are registered in BENCHMARKS and run
+with `python manage.py benchmark <name>`, through run_benchmark(): with a
+private local-memory cache and, for benchmarks that use the database, in a
+throwaway test database, so they never touch the configured database or the
+shared cache.
+"""
+
+import asyncio
+import copy
+import importlib.util
+import json
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, connection, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Count, Sum
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from rest_framework.renderers import JSONRenderer
+
+from .cache import invalidate_all
+from .db import pool_stats
+from .emi import annuity_cache_stats, annuity_terms, emis, warm_annuity_cache
+from .models import Customer, CustomerCreditProfile, Loan
+from .replay import (
+    DEFAULT_MIX, generate, latency_summary, parse_mix, read_requests, resolve,
+    send_http, send_in_process, summarize, write_requests,
+)
+from .serializers import (
+    CustomerLoanListSerializer, CustomerLoanListValuesSerializer,
+    LoanDetailSerializer, LoanDetailValuesSerializer,
+)
+from .utils import calculate_emi, current_year_loans_q
+
+BENCH_PHONE_PREFIX = 'bench'
+
+BENCHMARKS = {}
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+
+
+def benchmark(name, database=True):
+    """
+    Register a benchmark function under `name`. database=False marks
+    benchmarks that never query the database, so no test database is created
+    for them.
+    """
+    def register(func):
+        func.database = database
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def run_benchmark(name, options, live_database=False):
+    """
+    Run the benchmark registered under `name` with BENCHMARK_CACHES as the
+    cache and, if it uses the database, in a scratch_database().
+
+    live_database=True runs it against the configured database and cache
+    instead, for replay --url, whose server must see the seeded rows.
+    """
+    func = BENCHMARKS[name]
+    if live_database:
+        return func(options)
+    with override_settings(CACHES=BENCHMARK_CACHES):
+        if not func.database:
+            return func(options)
+        with scratch_database():
+            return func(options)
+
+
+def reset_cache():
+    """
+    Empty the benchmark's private cache between runs. Refuses to clear any
+    other cache, so a benchmark called outside run_benchmark() cannot wipe
+    the shared one.
+    """
+    if settings.CACHES != BENCHMARK_CACHES:
+        raise RuntimeError("Benchmarks only clear their private cache; run them through run_benchmark().")
+    caches['default'].clear()
+
+
+def timed(func, repeat):
+    """
+    Run `func` `repeat` times and return (best seconds, last result).
+    """
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+@contextmanager
+def scratch_database():
+    """
+    Run on a throwaway test database: the default alias is pointed at a
+    freshly created and migrated test database (as the test runner does),
+    which is destroyed again on exit. Usable as a decorator.
+
+    On SQLite the test database is a temporary file rather than the test
+    runner's shared in-memory database, whose table locks fail concurrent
+    benchmarks.
+    """
+    test_settings = connections['default'].settings_dict.setdefault('TEST', {})
+    original_name = test_settings.get('NAME')
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as directory:
+        if connections['default'].vendor == 'sqlite' and not original_name:
+            test_settings['NAME'] = os.path.join(directory, 'db.sqlite3')
+        try:
+            old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'}, serialized_aliases=set())
+            try:
+                yield
+            finally:
+                # Benchmarks may have replaced the default connection (see configure_default_database).
+                connections.close_all()
+                teardown_databases(old_config, verbosity=0)
+        finally:
+            test_settings['NAME'] = original_name
+
+
+def seed_customers(count, monthly_income=Decimal('100000'), approved_limit=Decimal('10000000')):
+    """
+    Create `count` benchmark customers (phone numbers start with BENCH_PHONE_PREFIX)
+    and return their IDs. Remove them again with delete_seeded_customers().
+    """
+    start = Customer.objects.filter(phone_number__startswith=BENCH_PHONE_PREFIX).count()
+    customers = Customer.objects.bulk_create([
+        Customer(
+            first_name='Bench', last_name=str(start + i), age=30,
+            phone_number=f"{BENCH_PHONE_PREFIX}{start + i:08d}",
+            monthly_income=monthly_income, approved_limit=approved_limit, current_debt=Decimal('0.00'),
+        )
+        for i in range(count)
+    ], batch_size=1000)
+    ids = list(
+        Customer.objects.filter(phone_number__in=[customer.phone_number for customer in customers])
+        .values_list('customer_id', flat=True)
+    )
+    CustomerCreditProfile.rebuild_all(ids)
+    return ids
+
+
+def seed_loans(customer_ids, per_customer, seed):
+    """
+    Create `per_customer` loans for each customer, starting today, and build
+    their credit profiles. Returns the new loan IDs.
+    """
+    today = date.today()
+    Loan.objects.bulk_create([
+        Loan(
+            customer_id=customer_id, loan_amount=amount, interest_rate=rate, tenure=tenure,
+            monthly_payment=calculate_emi(amount, rate, tenure), start_date=today, end_date=today,
+        )
+        for customer_id in customer_ids
+        for amount, rate, tenure in sample_loan_terms(per_customer, f'{seed}-{customer_id}')
+    ], batch_size=1000)
+    CustomerCreditProfile.rebuild_all(customer_ids)
+    return list(Loan.objects.filter(customer_id__in=customer_ids).order_by('loan_id').values_list('loan_id', flat=True))
+
+
+def delete_seeded_customers():
+    """
+    Delete every benchmark customer and, by cascade, their loans and profiles.
+    """
+    Customer.objects.filter(phone_number__startswith=BENCH_PHONE_PREFIX).delete()
+    invalidate_all()
+
+
+def run_concurrently(requests, concurrency, send):
+    """
+    Call send(client, request) for every request from `concurrency` threads,
+    each with its own test client and database connection. Returns
+    (elapsed seconds, list of (request, result)).
+    """
+    pending = queue.Queue()
+    for request in requests:
+        pending.put(request)
+    results, lock = [], threading.Lock()
+
+    def worker():
+        client = Client(SERVER_NAME='localhost')
+        try:
+            while True:
+                try:
+                    request = pending.get_nowait()
+                except queue.Empty:
+                    return
+                result = send(client, request)
+                with lock:
+                    results.append((request, result))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, results
+
+
+def sample_loan_terms(size, seed):
+    """
+    Realistic (amount, rate, tenure) triples: amounts in whole rupees, rates on
+    a quarter-percent grid, tenures in common month counts.
+    """
+    rng = random.Random(seed)
+    tenures = [6, 12, 18, 24, 36, 48, 60, 84, 120, 180, 240]
+    return [
+        (
+            Decimal(rng.randrange(10_000, 5_000_000)),
+            Decimal(rng.randrange(0, 96)) / 4 + Decimal('6'),
+            rng.choice(tenures),
+        )
+        for _ in range(size)
+    ]
+
+
+@benchmark('emi', database=False)
+def emi_benchmark(options):
+    """
+    Scalar calculate_emi versus the vectorized core.emi.emis engine.
+    """
+    size = options['size']
+    terms = sample_loan_terms(size, options['seed'])
+    amounts = np.array([float(amount) for amount, _, _ in terms])
+    rates = np.array([float(rate) for _, rate, _ in terms])
+    tenures = np.array([tenure for _, _, tenure in terms])
+
+    scalar_seconds, scalar = timed(lambda: [calculate_emi(*term) for term in terms], options['repeat'])
+    vector_seconds, vector = timed(lambda: emis(amounts, rates, tenures), options['repeat'])
+    mismatches = int(np.count_nonzero(np.array([float(value) for value in scalar]) != vector))
+    return {
+        'loans': size,
+        'scalar_seconds': scalar_seconds,
+        'vectorized_seconds': vector_seconds,
+        'speedup': scalar_seconds / vector_seconds if vector_seconds else None,
+        'mismatched_emis': mismatches,
+    }
+
+
+def uncached_emi(amount, rate, tenure):
+    """
+    calculate_emi as it was before annuity terms were memoized, as the
+    reference for the emi-cache benchmark.
+    """
+    monthly_rate = rate / Decimal('100') / Decimal('12')
+    if monthly_rate == 0:
+        return amount / Decimal(str(tenure))
+    term = (Decimal('1') + monthly_rate) ** tenure
+    if term == 1:
+        return amount / Decimal(str(tenure))
+    return (amount * monthly_rate * term / (term - Decimal('1'))).quantize(Decimal('0.01'))
+
+
+@benchmark('emi-cache', database=False)
+def emi_cache_benchmark(options):
+    """
+    calculate_emi with and without memoized annuity terms. Most terms come
+    from sample_loan_terms (quarter-percent rates, common tenures); one in
+    twenty is a long-tail rate and tenure that will rarely repeat. Checks the
+    EMIs are identical and reports the cache hit ratio.
+    """
+    size = options['size']
+    rng = random.Random(options['seed'])
+    terms = [
+        (amount, Decimal(rng.randrange(500, 3000)) / 100, rng.randint(1, 360)) if rng.random() < 0.05
+        else (amount, rate, tenure)
+        for amount, rate, tenure in sample_loan_terms(size, options['seed'])
+    ]
+    # Without the metrics wrapper, which would be timed on one side only.
+    cached_emi = calculate_emi.__wrapped__
+
+    uncached_seconds, expected = timed(lambda: [uncached_emi(*term) for term in terms], options['repeat'])
+    annuity_terms.cache_clear()
+    start = time.perf_counter()
+    cold = [cached_emi(*term) for term in terms]
+    cold_seconds = time.perf_counter() - start
+    cold_stats = annuity_cache_stats()
+    annuity_terms.cache_clear()
+    warm_annuity_cache()
+    warm_seconds, warm = timed(lambda: [cached_emi(*term) for term in terms], options['repeat'])
+    warm_stats = annuity_cache_stats()
+    mismatches = sum(
+        1 for reference, first, second in zip(expected, cold, warm)
+        if not (str(reference) == str(first) == str(second))
+    )
+    return {
+        'calls': size,
+        'uncached_seconds': uncached_seconds,
+        'cold_cache_seconds': cold_seconds,
+        'warm_cache_seconds': warm_seconds,
+        'speedup': uncached_seconds / warm_seconds if warm_seconds else None,
+        'cold_hit_ratio': cold_stats['hit_ratio'],
+        'warm_hit_ratio': warm_stats['hit_ratio'],
+        'cache_size': warm_stats['size'],
+        'mismatched_emis': mismatches,
+    }
+
+
+@benchmark('create-loan-concurrency')
+def create_loan_concurrency_benchmark(options):
+    """
+    Fire `size` create-loan requests from `concurrency` threads at a few hot
+    customers, then check that no debt update was lost and that no customer
+    ended up over the 50%-of-income EMI limit.
+    """
+    size, concurrency = options['size'], options['concurrency']
+    customer_ids = seed_customers(max(1, size // 20))
+    try:
+        body = {'loan_amount': 50000, 'interest_rate': 12, 'tenure': 12}
+        requests = [dict(body, customer_id=customer_ids[i % len(customer_ids)]) for i in range(size)]
+
+        def send(client, request):
+            response = client.post('/create-loan', data=json.dumps(request), content_type='application/json')
+            return response.status_code, response.json()
+
+        seconds, results = run_concurrently(requests, concurrency, send)
+        approved = sum(1 for _, (code, data) in results if code == 200 and data.get('loan_approved'))
+        errors = sum(1 for _, (code, _) in results if code != 200)
+
+        debt_mismatches, emi_cap_violations = 0, 0
+        totals = {
+            row['customer_id']: row
+            for row in Loan.objects.filter(customer_id__in=customer_ids).values('customer_id').annotate(
+                amount=Sum('loan_amount'), emis=Sum('monthly_payment')
+            ).order_by()
+        }
+        for customer in Customer.objects.filter(customer_id__in=customer_ids):
+            row = totals.get(customer.customer_id, {'amount': Decimal('0'), 'emis': Decimal('0')})
+            debt_mismatches += customer.current_debt != row['amount']
+            emi_cap_violations += row['emis'] > customer.monthly_income * Decimal('0.5')
+        return {
+            'requests': size,
+            'concurrency': concurrency,
+            'customers': len(customer_ids),
+            'seconds': seconds,
+            'requests_per_second': size / seconds if seconds else None,
+            'approved': approved,
+            'errors': errors,
+            'debt_mismatches': debt_mismatches,
+            'emi_cap_violations': emi_cap_violations,
+        }
+    finally:
+        delete_seeded_customers()
+
+
+@benchmark('serializers')
+def serializers_benchmark(options):
+    """
+    DRF model serializers versus the .values() fast path for the loan list and
+    loan detail responses, at 1, 100 and `size` loans. Both sides include the
+    query and JSON rendering, and their output must be byte-identical.
+    """
+    renderer = JSONRenderer()
+    terms = sample_loan_terms(options['size'], options['seed'])
+    customer_id = seed_customers(1)[0]
+    today = date.today()
+    try:
+        Loan.objects.bulk_create([
+            Loan(
+                customer_id=customer_id, loan_amount=amount, tenure=tenure, interest_rate=rate,
+                monthly_payment=calculate_emi(amount, rate, tenure), emi_paid_on_time=i % (tenure + 1),
+                start_date=today, end_date=today,
+            )
+            for i, (amount, rate, tenure) in enumerate(terms)
+        ], batch_size=1000)
+        loan_ids = list(Loan.objects.filter(customer_id=customer_id).order_by('loan_id').values_list('loan_id', flat=True))
+
+        results = []
+        for count in sorted({1, min(100, len(loan_ids)), len(loan_ids)}):
+            loans = Loan.objects.filter(loan_id__in=loan_ids[:count]).order_by('loan_id')
+            drf_seconds, drf = timed(
+                lambda: renderer.render(CustomerLoanListSerializer(loans.all(), many=True).data), options['repeat']
+            )
+            fast_seconds, fast = timed(
+                lambda: renderer.render(CustomerLoanListValuesSerializer.many(CustomerLoanListValuesSerializer.project(loans.all()))),
+                options['repeat'],
+            )
+            results.append({
+                'response': 'view-loans',
+                'loans': count,
+                'drf_seconds': drf_seconds,
+                'fast_path_seconds': fast_seconds,
+                'speedup': drf_seconds / fast_seconds if fast_seconds else None,
+                'identical': drf == fast,
+            })
+
+        detail = Loan.objects.filter(loan_id=loan_ids[0])
+        drf_seconds, drf = timed(
+            lambda: renderer.render(LoanDetailSerializer(detail.select_related('customer').get()).data), options['repeat']
+        )
+        fast_seconds, fast = timed(
+            lambda: renderer.render(LoanDetailValuesSerializer.to_representation(LoanDetailValuesSerializer.project(detail.all()).get())),
+            options['repeat'],
+        )
+        results.append({
+            'response': 'view-loan',
+            'loans': 1,
+            'drf_seconds': drf_seconds,
+            'fast_path_seconds': fast_seconds,
+            'speedup': drf_seconds / fast_seconds if fast_seconds else None,
+            'identical': drf == fast,
+        })
+        return {'results': results}
+    finally:
+        delete_seeded_customers()
+
+
+def explain(queryset):
+    """
+    The database's plan for `queryset`; on PostgreSQL it is actually executed
+    (EXPLAIN ANALYZE) so the plan includes real row counts and timings.
+    """
+    options = {'analyze': True, 'buffers': True} if connection.vendor == 'postgresql' else {}
+    return queryset.explain(**options).splitlines()
+
+
+@benchmark('scale')
+def scale_benchmark(options):
+    """
+    Seed `size` loans with start dates spread over ten years and time the
+    scoring and listing queries, with and without the composite loan indexes,
+    recording their EXPLAIN plans. Queries run for a typical customer (20
+    loans) and for a heavy one holding 1% of all loans.
+
+    The indexes are dropped for the first pass and recreated afterwards, which
+    is only safe in run_benchmark()'s throwaway test database.
+    """
+    size, rng = options['size'], random.Random(options['seed'])
+    customer_ids = seed_customers(max(2, size // 20))
+    heavy_loans = max(20, size // 100)
+    year = date.today().year
+    try:
+        terms = sample_loan_terms(1000, options['seed'])
+        batch = []
+        for i in range(size):
+            amount, rate, tenure = terms[i % len(terms)]
+            start = date(year - rng.randrange(10), rng.randrange(1, 13), rng.randrange(1, 29))
+            customer_id = customer_ids[0] if i < heavy_loans else customer_ids[1 + i % (len(customer_ids) - 1)]
+            batch.append(Loan(
+                customer_id=customer_id, loan_amount=amount, interest_rate=rate, tenure=tenure,
+                monthly_payment=calculate_emi(amount, rate, tenure), start_date=start, end_date=start,
+            ))
+            if len(batch) == 10_000:
+                Loan.objects.bulk_create(batch)
+                batch = []
+        Loan.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        queries = {}
+        for label, customer_id in (('typical', customer_ids[len(customer_ids) // 2]), ('heavy', customer_ids[0])):
+            customer_loans = Loan.objects.filter(customer_id=customer_id)
+            queries[f'{label} customer: current_year_loans'] = customer_loans.filter(current_year_loans_q(year)).values('loan_id')
+            queries[f'{label} customer: loan_stats'] = customer_loans.values('customer_id').annotate(
+                loan_count=Count('loan_id'), total_loan_amount=Sum('loan_amount'),
+                total_monthly_payment=Sum('monthly_payment'),
+                current_year_loans=Count('loan_id', filter=current_year_loans_q(year)),
+            ).order_by()
+            queries[f'{label} customer: view_loans_page'] = customer_loans.order_by('loan_id').values(
+                'loan_id', 'loan_amount', 'interest_rate', 'monthly_payment'
+            )[:100]
+
+        def run_all(indexes):
+            results = {}
+            for label, queryset in queries.items():
+                seconds, _ = timed(lambda: list(queryset.all()), options['repeat'])
+                results[label] = {'indexes': indexes, 'seconds': seconds, 'plan': explain(queryset.all())}
+            return results
+
+        with connection.schema_editor() as editor:
+            for index in Loan._meta.indexes:
+                editor.remove_index(Loan, index)
+        try:
+            without_indexes = run_all(False)
+        finally:
+            with connection.schema_editor() as editor:
+                for index in Loan._meta.indexes:
+                    editor.add_index(Loan, index)
+        with_indexes = run_all(True)
+        return {
+            'loans': size,
+            'customers': len(customer_ids),
+            'heavy_customer_loans': heavy_loans,
+            'queries': {
+                label: {
+                    'speedup': without_indexes[label]['seconds'] / with_indexes[label]['seconds']
+                    if with_indexes[label]['seconds'] else None,
+                    'runs': [without_indexes[label], with_indexes[label]],
+                }
+                for label in queries
+            },
+        }
+    finally:
+        delete_seeded_customers()
+
+
+def simulated_latency(seconds):
+    """
+    A database execute wrapper that sleeps before every query, and a function
+    that installs it on every connection opened from now on (see
+    connection_created). Returns the install function; disconnect it afterwards.
+    """
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    return install
+
+
+@benchmark('async')
+def async_benchmark(options):
+    """
+    The sync (WSGI) endpoints served by `concurrency` threads versus the async
+    (ASGI) endpoints with `concurrency` requests in flight on one event loop,
+    for a mix of check-eligibility and view-loans requests. --latency-ms adds
+    a sleep before every query to simulate a slow database. Both runs must
+    return identical responses.
+    """
+    size, concurrency, rng = options['size'], options['concurrency'], random.Random(options['seed'])
+    customer_ids = seed_customers(max(1, size // 10))
+    try:
+        seed_loans(customer_ids, 3, options['seed'])
+        requests = []
+        for i in range(size):
+            customer_id = rng.choice(customer_ids)
+            if rng.random() < 0.7:
+                body = {'customer_id': customer_id, 'loan_amount': 50000, 'interest_rate': 12, 'tenure': 12}
+                requests.append((i, 'post', 'check-eligibility', json.dumps(body)))
+            else:
+                requests.append((i, 'get', f'view-loans/{customer_id}/', None))
+
+        # Both sides open a connection per request, as with the default CONN_MAX_AGE=0.
+        def send(client, request):
+            _, method, path, body = request
+            if method == 'post':
+                response = client.post(f'/{path}', data=body, content_type='application/json')
+            else:
+                response = client.get(f'/{path}')
+            connection.close()
+            return response.status_code, response.content
+
+        async def asend(client, semaphore, request):
+            _, method, path, body = request
+            async with semaphore, ThreadSensitiveContext():
+                if method == 'post':
+                    response = await client.post(f'/async/{path}', data=body, content_type='application/json')
+                else:
+                    response = await client.get(f'/async/{path}')
+                await sync_to_async(lambda: connection.close())()
+            return request, (response.status_code, response.content)
+
+        async def run_async():
+            client, semaphore = AsyncClient(SERVER_NAME='localhost'), asyncio.Semaphore(concurrency)
+            start = time.perf_counter()
+            results = await asyncio.gather(*(asend(client, semaphore, request) for request in requests))
+            return time.perf_counter() - start, results
+
+        install = simulated_latency(options['latency_ms'] / 1000)
+        connection_created.connect(install)
+        connection.close()
+        try:
+            reset_cache()
+            sync_seconds, sync_results = run_concurrently(requests, concurrency, send)
+            reset_cache()
+            async_seconds, async_results = asyncio.run(run_async())
+        finally:
+            connection_created.disconnect(install)
+            connection.close()
+
+        sync_by_id = {request[0]: result for request, result in sync_results}
+        async_by_id = {request[0]: result for request, result in async_results}
+        return {
+            'requests': size,
+            'concurrency': concurrency,
+            'latency_ms': options['latency_ms'],
+            'wsgi_sync': {
+                'seconds': sync_seconds,
+                'requests_per_second': size / sync_seconds if sync_seconds else None,
+                'errors': sum(1 for code, _ in sync_by_id.values() if code >= 500),
+            },
+            'asgi_async': {
+                'seconds': async_seconds,
+                'requests_per_second': size / async_seconds if async_seconds else None,
+                'errors': sum(1 for code, _ in async_by_id.values() if code >= 500),
+            },
+            'mismatched_responses': sum(1 for i in sync_by_id if sync_by_id[i] != async_by_id.get(i)),
+        }
+    finally:
+        delete_seeded_customers()
+
+
+def configure_default_database(settings_dict):
+    """
+    Point the default alias at `settings_dict`: close this thread's connection
+    and any pool, so connections opened from now on use the new settings.
+    """
+    connection.close()
+    if getattr(connection, 'pool', None) is not None:
+        connection.close_pool()
+    connections.settings['default'] = settings_dict
+    del connections['default']
+
+
+@benchmark('pool')
+def pool_benchmark(options):
+    """
+    Per-request latency of check-eligibility from `concurrency` threads with a
+    new connection per request, persistent connections (CONN_MAX_AGE) and a
+    psycopg connection pool. Connections are released after every request as
+    Django's request_finished handler would. Pooling needs PostgreSQL and
+    psycopg_pool; otherwise that mode is reported as skipped.
+    """
+    size, concurrency = options['size'], options['concurrency']
+    customer_ids = seed_customers(max(1, size // 10))
+    original = copy.deepcopy(connections.settings['default'])
+    base = copy.deepcopy(original)
+    base['OPTIONS'].pop('pool', None)
+    modes = {
+        'per_request': dict(base, CONN_MAX_AGE=0),
+        'persistent': dict(base, CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True),
+        'pooled': dict(base, CONN_MAX_AGE=0, OPTIONS=dict(
+            base['OPTIONS'], pool=original['OPTIONS'].get('pool') or {'min_size': concurrency, 'max_size': concurrency}
+        )),
+    }
+    body = {'loan_amount': 50000, 'interest_rate': 12, 'tenure': 12}
+    requests = [dict(body, customer_id=customer_ids[i % len(customer_ids)]) for i in range(size)]
+
+    def send(client, request):
+        start = time.perf_counter()
+        response = client.post('/check-eligibility', data=json.dumps(request), content_type='application/json')
+        close_old_connections()
+        return time.perf_counter() - start, response.status_code
+
+    results = {}
+    try:
+        for mode, settings_dict in modes.items():
+            if mode == 'pooled' and (original['ENGINE'] != 'django.db.backends.postgresql'
+                                     or importlib.util.find_spec('psycopg_pool') is None):
+                results[mode] = {'skipped': 'pooling needs PostgreSQL with psycopg[pool]'}
+                continue
+            configure_default_database(settings_dict)
+            seconds, responses = run_concurrently(requests, concurrency, send)
+            results[mode] = {
+                'seconds': seconds,
+                'requests_per_second': size / seconds if seconds else None,
+                'errors': sum(1 for _, (_, code) in responses if code != 200),
+                **latency_summary([latency for _, (latency, _) in responses]),
+                'pool': pool_stats() if mode == 'pooled' else None,
+            }
+    finally:
+        configure_default_database(original)
+        delete_seeded_customers()
+    return {'requests': size, 'concurrency': concurrency, 'modes': results}
+
+
+@benchmark('replay')
+def replay_benchmark(options):
+    """
+    Seed `size // 10` customers with three loans each, then replay traffic at
+    `concurrency`: the requests in --replay, or `size` requests generated from
+    --mix. Requests go through the test client, or to a running server at
+    --url that uses the same database. --record saves the generated traffic
+    so later runs (e.g. of another release) can replay exactly the same
+    requests. With --url the customers are seeded into the configured
+    database (see run_benchmark's live_database) and the server's cache is
+    left as it is. Reports latency percentiles, throughput, status codes and
+    queries per request (in-process only) per endpoint.
+    """
+    size, concurrency = options['size'], options['concurrency']
+    if options['replay']:
+        requests = read_requests(options['replay'])
+    else:
+        mix = parse_mix(options['mix']) if options['mix'] else DEFAULT_MIX
+        requests = generate(size, mix, options['seed'])
+    if options['record']:
+        write_requests(options['record'], requests)
+    customer_ids = seed_customers(max(1, size // 10))
+    try:
+        loan_ids = seed_loans(customer_ids, 3, options['seed'])
+        resolved = [
+            resolve(i, request, customer_ids, loan_ids, f'{BENCH_PHONE_PREFIX}r')
+            for i, request in enumerate(requests)
+        ]
+        url = options['url']
+
+        def send(client, request):
+            status, seconds, queries = send_http(url, request) if url else send_in_process(client, request)
+            return request[0], status, seconds, queries
+
+        if not url:
+            reset_cache()
+        elapsed, results = run_concurrently(resolved, concurrency, send)
+        return {
+            'requests': len(requests),
+            'concurrency': concurrency,
+            'target': url or 'in-process',
+            'customers': len(customer_ids),
+            'loans': len(loan_ids),
+            'seconds': elapsed,
+            'endpoints': summarize([result for _, result in results], elapsed),
+        }
+    finally:
+        delete_seeded_customers()
@@ -0,0 +1,233 @@
+"""
+Response cache for the read-heavy loan endpoints of the Credit Approval System.
+
+view-loan and view-loans responses are stored in the configured Django cache
+(local memory by default; see CACHES in settings) together with an ETag and a
+Last-Modified time, so repeated polls are answered without touching the
+database and conditional requests get a 304.
+
+Entries are never deleted one by one. Instead every customer has a "changed at"
+marker, plus one global marker for bulk writes that bypass Model.save. An entry
+is only served if it was built after the markers that cover it were last set:
+- Loan.save / Loan.delete / Customer.save / Customer.delete call
+  invalidate_customers() for the affected customers.
+- Bulk paths (ingestion, benchmark seeding) call invalidate_all().
+
+A marker that has been evicted invalidates every entry it covers, so eviction
+can only cause misses, never stale reads. Markers are set when the surrounding
+transaction commits, so a response built from uncommitted data is never cached.
+
+The default local-memory cache holds markers per process, so an invalidation
+only reaches the process that made it; other workers can serve the old entry
+until it expires, which is why that cache has a short TTL (see CACHES).
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+CACHE_ALIAS = 'default'
+KEY_PREFIX = 'loan-api'
+GLOBAL_MARKER = f'{KEY_PREFIX}:changed'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def customer_marker(customer_id):
+    return f'{KEY_PREFIX}:changed:customer:{customer_id}'
+
+
+def loan_detail_key(loan_id):
+    return f'{KEY_PREFIX}:loan:{loan_id}'
+
+
+def customer_loans_key(customer_id):
+    return f'{KEY_PREFIX}:customer-loans:{customer_id}'
+
+
+def cache_stats():
+    """
+    Hit/miss counters for this process, plus the hit ratio of lookups.
+    """
+    with _stats_lock:
+        stats = {name: _stats[name] for name in ('hits', 'not_modified', 'misses', 'stores', 'invalidations')}
+    lookups = stats['hits'] + stats['not_modified'] + stats['misses']
+    stats['hit_ratio'] = (stats['hits'] + stats['not_modified']) / lookups if lookups else None
+    return stats
+
+
+def _set_markers(keys):
+    now = time.time_ns()
+    _cache().set_many({key: now for key in keys}, timeout=None)
+    with _stats_lock:
+        _stats['invalidations'] += len(keys)
+
+
+def invalidate_customers(customer_ids):
+    """
+    Invalidate cached responses for these customers and their loans once the
+    current transaction commits (immediately outside a transaction).
+    """
+    keys = [customer_marker(customer_id) for customer_id in set(customer_ids) if customer_id is not None]
+    if keys:
+        transaction.on_commit(lambda: _set_markers(keys))
+
+
+def invalidate_all():
+    """
+    Invalidate every cached response once the current transaction commits.
+    """
+    transaction.on_commit(lambda: _set_markers([GLOBAL_MARKER]))
+
+
+def _is_valid(entry, markers):
+    return len(markers) == 2 and entry['built_at'] > max(markers.values())
+
+
+def _new_entry(customer_id, data, built_at):
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+    return {
+        'customer_id': customer_id,
+        'data': data,
+        'etag': quote_etag(hashlib.md5(body, usedforsecurity=False).hexdigest()),
+        'built_at': built_at,
+    }
+
+
+def _marker_keys(customer_id):
+    return [GLOBAL_MARKER, customer_marker(customer_id)]
+
+
+def get_entry(key):
+    """
+    Return the cached entry for `key` if it is still valid, else None.
+    """
+    entry = _cache().get(key)
+    if entry is None or not _is_valid(entry, _cache().get_many(_marker_keys(entry['customer_id']))):
+        return None
+    return entry
+
+
+def put_entry(key, customer_id, data, built_at):
+    """
+    Cache `data` for `key` if nothing it depends on changed since `built_at`
+    (taken before the database was read). Returns the entry with its ETag.
+    """
+    entry = _new_entry(customer_id, data, built_at)
+    marker_keys = _marker_keys(customer_id)
+    markers = _cache().get_many(marker_keys)
+    missing = [marker_key for marker_key in marker_keys if marker_key not in markers]
+    if missing:
+        # First entry for this customer, or the marker was evicted: start it
+        # just before built_at, which rules out anything built earlier. add()
+        # keeps a marker set meanwhile by a change, and re-reading sees it.
+        for marker_key in missing:
+            _cache().add(marker_key, built_at - 1, timeout=None)
+        markers = _cache().get_many(marker_keys)
+    if _is_valid(entry, markers):
+        _cache().set(key, entry)
+        _count('stores')
+    return entry
+
+
+async def aget_entry(key):
+    """
+    Async get_entry().
+    """
+    entry = await _cache().aget(key)
+    if entry is None or not _is_valid(entry, await _cache().aget_many(_marker_keys(entry['customer_id']))):
+        return None
+    return entry
+
+
+async def aput_entry(key, customer_id, data, built_at):
+    """
+    Async put_entry().
+    """
+    entry = _new_entry(customer_id, data, built_at)
+    marker_keys = _marker_keys(customer_id)
+    markers = await _cache().aget_many(marker_keys)
+    missing = [marker_key for marker_key in marker_keys if marker_key not in markers]
+    if missing:
+        for marker_key in missing:
+            await _cache().aadd(marker_key, built_at - 1, timeout=None)
+        markers = await _cache().aget_many(marker_keys)
+    if _is_valid(entry, markers):
+        await _cache().aset(key, entry)
+        _count('stores')
+    return entry
+
+
+def _respond(request, entry, render):
+    last_modified = entry['built_at'] // 1_000_000_000
+    response = get_conditional_response(request, etag=entry['etag'], last_modified=last_modified)
+    if response is None:
+        response = render(entry['data'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def _count_hit(response):
+    _count('not_modified' if response.status_code == status.HTTP_304_NOT_MODIFIED else 'hits')
+    return response
+
+
+def _render(data):
+    return Response(data, status=status.HTTP_200_OK)
+
+
+def cached_response(request, key, build, render=_render):
+    """
+    Serve `key` from the cache, honouring If-None-Match / If-Modified-Since.
+
+    On a miss, build() is called and must return either (customer_id, data)
+    to cache and send, or a response (e.g. an error) to send uncached.
+    render(data) turns cached data into a response (a DRF Response by default).
+    """
+    entry = get_entry(key)
+    if entry is not None:
+        return _count_hit(_respond(request, entry, render))
+    _count('misses')
+    built_at = time.time_ns()
+    result = build()
+    if isinstance(result, HttpResponseBase):
+        return result
+    customer_id, data = result
+    return _respond(request, put_entry(key, customer_id, data, built_at), render)
+
+
+async def acached_response(request, key, build, render):
+    """
+    Async cached_response(); build is a coroutine function.
+    """
+    entry = await aget_entry(key)
+    if entry is not None:
+        return _count_hit(_respond(request, entry, render))
+    _count('misses')
+    built_at = time.time_ns()
+    result = await build()
+    if isinstance(result, HttpResponseBase):
+        return result
+    customer_id, data = result
+    return _respond(request, await aput_entry(key, customer_id, data, built_at), render)
@@ -0,0 +1,47 @@
+"""
+Database connection helpers for the Credit Approval System.
+
+Reports how connections are being reused (see the DB_POOL / DB_CONN_MAX_AGE
+settings): psycopg pool statistics when pooling is enabled, otherwise the
+persistent-connection settings.
+"""
+
+from django.db import connections
+
+
+def pool_stats(alias='default'):
+    """
+    Connection pool statistics for this process.
+
+    in_use, idle, waiting and created come from the psycopg pool; created,
+    errors and lost are counted since the pool was opened. Without a pool
+    only the persistent-connection settings are reported.
+    """
+    wrapper = connections[alias]
+    pool = getattr(wrapper, 'pool', None)
+    if pool is None:
+        return {
+            'pooled': False,
+            'conn_max_age': wrapper.settings_dict['CONN_MAX_AGE'],
+            'conn_health_checks': wrapper.settings_dict['CONN_HEALTH_CHECKS'],
+        }
+    stats = pool.get_stats()
+    if pool.closed:
+        # Django opens the pool on the first connection request.
+        stats.update(pool_size=0, pool_available=0)
+    return {
+        'pooled': True,
+        'open': not pool.closed,
+        'min_size': stats['pool_min'],
+        'max_size': stats['pool_max'],
+        'size': stats['pool_size'],
+        'in_use': stats['pool_size'] - stats['pool_available'],
+        'idle': stats['pool_available'],
+        'waiting': stats.get('requests_waiting', 0),
+        'created': stats.get('connections_num', 0),
+        'requests': stats.get('requests_num', 0),
+        'request_wait_ms': stats.get('requests_wait_ms', 0),
+        'timeouts': stats.get('requests_errors', 0),
+        'connection_errors': stats.get('connections_errors', 0),
+        'lost': stats.get('connections_lost', 0),
+    }
@@ -0,0 +1,218 @@
+"""
+Bulk EMI and amortization-schedule engine for the Credit Approval System.
+
+Works on NumPy arrays of (amount, annual rate, tenure) so that many loans are
+priced in one pass. EMIs equal core.utils.calculate_emi exactly (half-even to
+paise; zero-rate loans are split evenly without rounding): they are priced in
+float, and the few that float cannot settle are priced again with the same
+Decimal arithmetic.
+
+Also holds that Decimal arithmetic (decimal_emi) and the memoized annuity
+terms it uses.
+"""
+
+from decimal import Decimal
+from functools import lru_cache
+
+import numpy as np
+
+ONE = Decimal('1')
+CENT = Decimal('0.01')
+EPS = np.finfo(np.float64).eps
+
+ANNUITY_CACHE_SIZE = 4096
+# Warmed at startup: quoted rates on a half-percent grid (including the 12% and
+# 16% slab corrections) over the usual tenures.
+WARM_RATES = tuple(Decimal(rate) / 2 for rate in range(12, 41))
+WARM_TENURES = (6, 12, 18, 24, 36, 48, 60, 84, 120, 180, 240)
+
+
+@lru_cache(maxsize=ANNUITY_CACHE_SIZE, typed=True)
+def annuity_terms(rate, tenure):
+    """
+    The rate-dependent parts of calculate_emi at full Decimal precision:
+    (monthly_rate, (1 + monthly_rate) ** tenure), or (0, None) at a zero rate.
+
+    Memoized, since traffic concentrates on a few rate/tenure pairs. Decimal
+    results depend only on operand values, so equal rates written differently
+    (12 and 12.00) can share an entry and EMIs stay identical. typed=True keeps
+    float rates apart, so they fail in calculate_emi as before.
+
+    Rates are keyed exactly rather than quantized: requested rates may carry
+    any number of decimal places (10.125 is not 10.13), so a rounded key would
+    change their EMIs. Equal Decimals already hash alike, so exact keys only
+    cost entries for genuinely different rates, and the LRU bound caps those.
+    """
+    monthly_rate = rate / Decimal('100') / Decimal('12')
+    if monthly_rate == 0:
+        return monthly_rate, None
+    return monthly_rate, (ONE + monthly_rate) ** tenure
+
+
+def decimal_emi(amount, rate, tenure):
+    """
+    The EMI of core.utils.calculate_emi for Decimal amount and rate: rounded
+    half-even to paise, or the unrounded even split at a zero rate.
+    """
+    monthly_rate, term = annuity_terms(rate, tenure)
+    if monthly_rate == 0 or term == 1:
+        return amount / Decimal(str(tenure))
+    return (amount * monthly_rate * term / (term - ONE)).quantize(CENT)
+
+
+def warm_annuity_cache(rates=WARM_RATES, tenures=WARM_TENURES):
+    """
+    Fill the annuity cache for these annual rates and tenures. Called from
+    CoreConfig.ready.
+    """
+    for rate in rates:
+        for tenure in tenures:
+            annuity_terms(rate, tenure)
+
+
+def annuity_cache_stats():
+    """
+    Hit/miss counters and size of the annuity cache in this process, plus its
+    hit ratio.
+    """
+    info = annuity_terms.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+        'hit_ratio': info.hits / lookups if lookups else None,
+    }
+
+
+def monthly_rates(rate):
+    """
+    Convert annual percentage rates to monthly fractional rates.
+    """
+    return np.asarray(rate, dtype=np.float64) / 100.0 / 12.0
+
+
+def emis(amount, rate, tenure):
+    """
+    Vectorized core.utils.calculate_emi for float arrays: each EMI is the
+    float of the Decimal EMI for Decimal(str(amount)) and Decimal(str(rate)).
+
+    EMIs are priced in float paise and rounded half-even. Those float cannot
+    settle are priced again with decimal_emi: zero and near-zero rates,
+    overflows, and unrounded values too close to a half-paisa tie for float
+    error to rule out rounding the other way. EMIs calculate_emi cannot
+    compute (it raises ValueError) are NaN.
+    """
+    amount, rate, tenure = np.broadcast_arrays(
+        np.asarray(amount, dtype=np.float64), np.asarray(rate, dtype=np.float64), np.asarray(tenure, dtype=np.float64)
+    )
+    monthly_rate = monthly_rates(rate)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        term = np.power(1.0 + monthly_rate, tenure)
+        paise = amount * monthly_rate * term / (term - 1.0) * 100.0
+        # Float's relative error here stays below EPS * (tenure + 1 / monthly_rate): rounding
+        # 1 + monthly_rate loses more of small rates, and the power compounds it per month.
+        error = 16 * EPS * (tenure + 1.0 / monthly_rate) * np.abs(paise)
+        unsettled = ~np.isfinite(paise) | ~(np.abs(paise - np.floor(paise) - 0.5) > error)
+    result = np.asarray(np.round(paise) / 100.0)
+    for index in np.flatnonzero(unsettled):
+        try:
+            result.flat[index] = decimal_emi(
+                Decimal(str(amount.flat[index].item())), Decimal(str(rate.flat[index].item())), int(tenure.flat[index])
+            )
+        except ArithmeticError:
+            result.flat[index] = np.nan
+    return result
+
+
+def max_principals(payment, rate, tenure):
+    """
+    Inverse of emis(): the largest amounts, floored to paise, whose EMI does
+    not exceed `payment`. Float arithmetic can leave the result a paisa off
+    the exact Decimal answer near a rounding boundary; callers that need it
+    exact check neighbours with core.utils.calculate_emi.
+    """
+    payment = np.asarray(payment, dtype=np.float64)
+    tenure = np.asarray(tenure, dtype=np.float64)
+    monthly_rate = monthly_rates(rate)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        term = np.power(1.0 + monthly_rate, tenure)
+        unrounded = (monthly_rate == 0) | (term == 1)
+        factor = np.where(unrounded, 1.0 / tenure, monthly_rate * term / (term - 1.0))
+    # Where the power overflows, term / (term - 1) is 1 to float precision.
+    factor = np.where(np.isinf(term), monthly_rate, factor)
+    # Amortized EMIs are rounded to paise, so anything below payment + half a paisa rounds down to it.
+    ceiling = np.where(unrounded, payment, payment + 0.005)
+    return np.maximum(np.floor(ceiling / factor * 100.0) / 100.0, 0.0)
+
+
+def amortization_schedules(amount, rate, tenure):
+    """
+    Build month-by-month repayment schedules for many loans at once.
+
+    Balances are carried in whole paise: each month interest is charged on the
+    opening balance (rounded half-even), the rest of the EMI repays principal,
+    and the final month repays whatever balance is left so it closes at zero.
+    The loop runs over months; every step is vectorized across loans.
+
+    Args:
+        amount, rate, tenure (array): Principal, annual rate (percent) and tenure in months.
+
+    Returns:
+        dict[str, ndarray]: 'emi' (n_loans,) plus 'payment', 'principal', 'interest'
+        and 'balance' of shape (n_loans, max_tenure). Months beyond a loan's
+        tenure are NaN.
+    """
+    amount = np.atleast_1d(np.asarray(amount, dtype=np.float64))
+    tenure = np.atleast_1d(np.asarray(tenure, dtype=np.int64))
+    monthly_rate = np.atleast_1d(monthly_rates(rate))
+    emi = np.atleast_1d(emis(amount, rate, tenure))
+
+    n_loans, n_months = amount.shape[0], int(tenure.max())
+    emi_paise = np.rint(emi * 100).astype(np.int64)
+    balance = np.rint(amount * 100).astype(np.int64)
+    principal = np.zeros((n_loans, n_months), dtype=np.int64)
+    interest = np.zeros((n_loans, n_months), dtype=np.int64)
+    closing = np.zeros((n_loans, n_months), dtype=np.int64)
+    for month in range(n_months):
+        month_interest = np.rint(balance * monthly_rate).astype(np.int64)
+        month_principal = np.minimum(np.maximum(emi_paise - month_interest, 0), balance)
+        month_principal = np.where(month == tenure - 1, balance, month_principal)
+        month_principal = np.where(month < tenure, month_principal, 0)
+        month_interest = np.where(month < tenure, month_interest, 0)
+        balance = balance - month_principal
+        principal[:, month] = month_principal
+        interest[:, month] = month_interest
+        closing[:, month] = balance
+
+    beyond = np.arange(n_months)[None, :] >= tenure[:, None]
+    def to_rupees(paise):
+        return np.where(beyond, np.nan, paise / 100.0)
+    return {
+        'emi': emi,
+        'payment': to_rupees(principal + interest),
+        'principal': to_rupees(principal),
+        'interest': to_rupees(interest),
+        'balance': to_rupees(closing),
+    }
+
+
+def amortization_schedule(amount, rate, tenure):
+    """
+    Repayment schedule for a single loan.
+
+    Returns:
+        dict: 'emi' (float) and 1-D 'month', 'payment', 'principal', 'interest'
+        and 'balance' arrays of length `tenure`.
+    """
+    schedules = amortization_schedules([amount], [rate], [tenure])
+    tenure = int(tenure)
+    return {
+        'emi': float(schedules['emi'][0]),
+        'month': np.arange(1, tenure + 1),
+        'payment': schedules['payment'][0, :tenure],
+        'principal': schedules['principal'][0, :tenure],
+        'interest': schedules['interest'][0, :tenure],
+        'balance': schedules['balance'][0, :tenure],
+    }
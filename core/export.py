@@ -0,0 +1,230 @@
+"""
+Streaming export of the loan book for the Credit Approval System.
+
+Two datasets can be exported:
+- loans: one row per loan with its customer's name and phone number, plus the
+  derived repayments_left and remaining_debt (unpaid EMIs x monthly payment,
+  the definition used by update_customer_debt)
+- customers: one row per customer with their credit-profile loan count and
+  monthly EMIs, plus the derived available_limit
+
+Rows are read through a server-side cursor `chunk_size` at a time and each
+chunk is written out as CSV, NDJSON or a Parquet row group before the next is
+read, so memory stays flat however large the book is. Both can be filtered by
+a customer_id range and by a loan start_date window (for customers: those with
+a loan started in the window).
+
+Used by the export_loan_book management command and the admin-only export
+endpoint.
+"""
+
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+
+from django.db.models import Exists, F, OuterRef
+
+from .models import Customer, Loan
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# (column, type) in output order; the type picks the Parquet column type.
+LOAN_COLUMNS = [
+    ('loan_id', 'int'), ('customer_id', 'int'), ('first_name', 'str'), ('last_name', 'str'),
+    ('phone_number', 'str'), ('loan_amount', 'decimal'), ('interest_rate', 'decimal'), ('tenure', 'int'),
+    ('monthly_payment', 'decimal'), ('emi_paid_on_time', 'int'), ('repayments_left', 'int'),
+    ('remaining_debt', 'decimal'), ('start_date', 'date'), ('end_date', 'date'),
+]
+CUSTOMER_COLUMNS = [
+    ('customer_id', 'int'), ('first_name', 'str'), ('last_name', 'str'), ('age', 'int'), ('phone_number', 'str'),
+    ('monthly_income', 'decimal'), ('approved_limit', 'decimal'), ('current_debt', 'decimal'),
+    ('available_limit', 'decimal'), ('loan_count', 'int'), ('total_monthly_payment', 'decimal'),
+]
+DATASETS = {'loans': LOAN_COLUMNS, 'customers': CUSTOMER_COLUMNS}
+
+
+def loan_rows(queryset):
+    for row in queryset:
+        repayments_left = max(row['tenure'] - row['emi_paid_on_time'], 0)
+        row['repayments_left'] = repayments_left
+        row['remaining_debt'] = repayments_left * row['monthly_payment']
+        yield row
+
+
+def customer_rows(queryset):
+    for row in queryset:
+        row['available_limit'] = max(row['approved_limit'] - row['current_debt'], Decimal('0.00'))
+        row['loan_count'] = row['loan_count'] or 0
+        row['total_monthly_payment'] = row['total_monthly_payment'] or Decimal('0.00')
+        yield row
+
+
+def export_rows(dataset, customer_from=None, customer_to=None, start_from=None, start_to=None, chunk_size=2000):
+    """
+    The dataset's rows as dicts with its columns, in customer_id (then
+    loan_id) order, read from a server-side cursor.
+    """
+    window = {}
+    if start_from is not None:
+        window['start_date__gte'] = start_from
+    if start_to is not None:
+        window['start_date__lte'] = start_to
+    ids = {}
+    if customer_from is not None:
+        ids['customer_id__gte'] = customer_from
+    if customer_to is not None:
+        ids['customer_id__lte'] = customer_to
+
+    if dataset == 'loans':
+        queryset = Loan.objects.filter(**ids, **window).order_by('customer_id', 'loan_id').values(
+            'loan_id', 'customer_id', 'loan_amount', 'interest_rate', 'tenure', 'monthly_payment',
+            'emi_paid_on_time', 'start_date', 'end_date',
+            first_name=F('customer__first_name'), last_name=F('customer__last_name'),
+            phone_number=F('customer__phone_number'),
+        )
+        return loan_rows(queryset.iterator(chunk_size=chunk_size))
+    queryset = Customer.objects.filter(**ids)
+    if window:
+        queryset = queryset.filter(Exists(Loan.objects.filter(customer_id=OuterRef('customer_id'), **window)))
+    queryset = queryset.order_by('customer_id').values(
+        'customer_id', 'first_name', 'last_name', 'age', 'phone_number',
+        'monthly_income', 'approved_limit', 'current_debt',
+        loan_count=F('credit_profile__loan_count'),
+        total_monthly_payment=F('credit_profile__total_monthly_payment'),
+    )
+    return customer_rows(queryset.iterator(chunk_size=chunk_size))
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunk(rows, names):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([row[name] for name in names] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def _ndjson_chunk(rows, names):
+    return b''.join(
+        json.dumps({name: _json_value(row[name]) for name in names}, ensure_ascii=False, separators=(',', ':')).encode()
+        + b'\n'
+        for row in rows
+    )
+
+
+class _Sink:
+    """
+    Write-only file object that hands written bytes back in pieces, so a
+    ParquetWriter can be streamed one row group at a time.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def _parquet_schema(columns):
+    import pyarrow as pa
+
+    types = {'int': pa.int64(), 'str': pa.string(), 'decimal': pa.decimal128(16, 2), 'date': pa.date32()}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+class LoanBookExport:
+    """
+    An export of one dataset in one format, iterated as chunks of bytes.
+    `rows` counts the rows written so far.
+    """
+
+    def __init__(self, dataset, fmt, chunk_size=2000, **filters):
+        if dataset not in DATASETS:
+            raise ValueError(f"dataset must be one of: {', '.join(DATASETS)}.")
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of: {', '.join(FORMATS)}.")
+        if fmt == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ValueError("Writing Parquet files requires the pyarrow package.")
+        self.dataset = dataset
+        self.format = fmt
+        self.columns = DATASETS[dataset]
+        self.chunk_size = chunk_size
+        self.filters = filters
+        self.rows = 0
+
+    @property
+    def content_type(self):
+        return FORMATS[self.format]
+
+    @property
+    def filename(self):
+        return f'{self.dataset}.{self.format}'
+
+    def chunks(self):
+        """
+        Lists of at most chunk_size rows.
+        """
+        rows = export_rows(self.dataset, chunk_size=self.chunk_size, **self.filters)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            self.rows += len(chunk)
+            yield chunk
+
+    def __iter__(self):
+        names = [name for name, _ in self.columns]
+        if self.format == 'parquet':
+            yield from self.parquet(names)
+            return
+        if self.format == 'csv':
+            yield _csv_chunk([dict(zip(names, names))], names)
+        write = _csv_chunk if self.format == 'csv' else _ndjson_chunk
+        for chunk in self.chunks():
+            yield write(chunk, names)
+
+    def parquet(self, names):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = _parquet_schema(self.columns)
+        sink = _Sink()
+        writer = pq.ParquetWriter(sink, schema)
+        for chunk in self.chunks():
+            writer.write_table(pa.Table.from_pydict({name: [row[name] for row in chunk] for name in names}, schema=schema))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
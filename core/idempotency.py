@@ -0,0 +1,115 @@
+"""
+Idempotency-Key support for the Credit Approval System's write endpoints.
+
+A client (or gateway) that retries a request sends the same Idempotency-Key
+header each time. The first request is processed and its response stored in
+an IdempotencyKey row; every later request with that key gets the stored
+response back without being processed again. Reusing a key with a different
+request body is rejected.
+
+Stored responses are also put in the Django cache once committed, so hot
+retries are answered without a database round trip. Rows are kept until
+`python manage.py purge_idempotency_keys` removes those older than
+IDEMPOTENCY_KEY_TTL_HOURS.
+
+Concurrent duplicates are serialized by the unique (scope, key) constraint:
+claim() inserts the row inside the transaction that does the work, so a second
+request with the same key blocks on the insert until the first commits (and
+then replays its response) or rolls back (and then proceeds itself).
+"""
+
+import hashlib
+import json
+
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import CACHE_ALIAS, KEY_PREFIX
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def key_error(key):
+    """
+    Why `key` is not a usable Idempotency-Key, or None.
+    """
+    if not key.strip():
+        return f"{HEADER} must not be empty."
+    if len(key) > MAX_KEY_LENGTH:
+        return f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."
+    return None
+
+
+def fingerprint(data):
+    """
+    SHA-256 of the request body in canonical JSON form.
+    """
+    body = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _cache_key(scope, key):
+    return f'{KEY_PREFIX}:idempotency:{scope}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def get_cached(scope, key):
+    """
+    The committed (fingerprint, status_code, response) stored for a key, from
+    the cache only; None if it is not there.
+    """
+    return caches[CACHE_ALIAS].get(_cache_key(scope, key))
+
+
+def claim(scope, key, request_fingerprint):
+    """
+    Start processing a keyed request inside the current transaction.
+
+    Returns None if this request now owns the key; the caller must then call
+    complete() before the transaction commits. Otherwise returns the existing,
+    completed IdempotencyKey to replay, waiting first for a concurrent request
+    holding the key to finish.
+    """
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(scope=scope, key=key, fingerprint=request_fingerprint)
+        return None
+    except IntegrityError:
+        return IdempotencyKey.objects.get(scope=scope, key=key)
+
+
+def complete(scope, key, request_fingerprint, response):
+    """
+    Store the response of a request that owns its key, and put it in the cache
+    once the transaction commits.
+    """
+    IdempotencyKey.objects.filter(scope=scope, key=key).update(
+        status_code=response.status_code, response=response.data
+    )
+    stored = (request_fingerprint, response.status_code, response.data)
+    transaction.on_commit(lambda: caches[CACHE_ALIAS].set(_cache_key(scope, key), stored))
+
+
+def replay(request_fingerprint, stored):
+    """
+    The response for a repeated key: the original one, or 422 if the key was
+    first used with a different request body.
+    """
+    original_fingerprint, status_code, data = stored
+    if original_fingerprint != request_fingerprint:
+        return Response(
+            {"error": f"{HEADER} was already used with a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(data, status=status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def replay_record(request_fingerprint, record):
+    """
+    replay() for an IdempotencyKey row.
+    """
+    return replay(request_fingerprint, (record.fingerprint, record.status_code, record.response))
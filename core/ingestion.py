@@ -0,0 +1,414 @@
+"""
+Bulk, set-based ingestion of customer and loan data for the Credit Approval System.
+
+This module provides:
+- Fixed-size chunked readers for xlsx, CSV and Parquet files
+- Vectorized validation of customer and loan rows held in pandas DataFrames
+- Batched upserts (bulk_create with update_conflicts) instead of per-row saves
+- Refreshing the derived customer figures (current debt, credit profiles)
+  that Loan.save would normally maintain
+- Partitioned ingestion for running in parallel worker processes
+
+Used by the load_excel_data management command.
+"""
+
+import os
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+import pandas as pd
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .cache import invalidate_all
+from .models import Customer, CustomerCreditProfile, Loan
+
+CUSTOMER_COLUMNS = {
+    'customer_id': 'customer_id',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'age': 'age',
+    'phone_number': 'phone_number',
+    'monthly_salary': 'monthly_income',
+    'approved_limit': 'approved_limit',
+}
+
+LOAN_COLUMNS = {
+    'loan_id': 'loan_id',
+    'customer_id': 'customer_id',
+    'loan_amount': 'loan_amount',
+    'interest_rate': 'interest_rate',
+    'tenure': 'tenure',
+    'monthly_payment': 'monthly_payment',
+    'emis_paid_on_time': 'emi_paid_on_time',
+    'date_of_approval': 'start_date',
+    'end_date': 'end_date',
+}
+
+CUSTOMER_UPDATE_FIELDS = ['first_name', 'last_name', 'age', 'phone_number', 'monthly_income', 'approved_limit', 'current_debt']
+LOAN_UPDATE_FIELDS = ['customer', 'loan_amount', 'interest_rate', 'tenure', 'monthly_payment', 'emi_paid_on_time', 'start_date', 'end_date', 'updated_at']
+
+CENT = Decimal('0.01')
+
+
+class IngestReport:
+    """
+    Counts and rejected rows for one ingestion step.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.rows_read = 0
+        self.rows_written = 0
+        self.rejected = []
+        self.errors = []
+        self.customer_ids = set()
+        self.seconds = 0.0
+
+    def reject(self, rows, reason):
+        """
+        Record every row number in `rows` as rejected for `reason`.
+        """
+        self.rejected.extend((int(row), reason) for row in rows)
+
+    def merge(self, other):
+        """
+        Fold another report for the same step into this one. Timing is left to
+        the caller, which knows whether the parts ran one after another.
+        """
+        self.rows_read += other.rows_read
+        self.rows_written += other.rows_written
+        self.rejected.extend(other.rejected)
+        self.errors.extend(other.errors)
+        self.customer_ids |= other.customer_ids
+
+    @property
+    def rows_per_second(self):
+        return self.rows_written / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (
+            f"{self.label}: {self.rows_written} written, {len(self.rejected)} rejected "
+            f"of {self.rows_read} read in {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/sec)"
+        )
+
+
+def _xlsx_chunks(path, chunk_size):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        start, chunk = 0, []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=header, index=pd.RangeIndex(start, start + len(chunk)))
+                start, chunk = start + len(chunk), []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header, index=pd.RangeIndex(start, start + len(chunk)))
+    finally:
+        workbook.close()
+
+
+def _parquet_chunks(path, chunk_size):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Reading Parquet files requires the pyarrow package.")
+    start = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        chunk = batch.to_pandas()
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        yield chunk
+
+
+def iter_chunks(path, chunk_size):
+    """
+    Yield a file's rows as DataFrames of at most `chunk_size` rows, so only one
+    chunk is held in memory at a time. The index counts data rows from 0 across
+    chunks, so rejected rows are reported with their line number in the file.
+
+    Supports .xlsx/.xlsm (openpyxl read-only mode), .csv and .parquet.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        return _xlsx_chunks(path, chunk_size)
+    if extension == '.csv':
+        return pd.read_csv(path, chunksize=chunk_size)
+    if extension == '.parquet':
+        return _parquet_chunks(path, chunk_size)
+    raise ValueError(f"Unsupported file type: {path}")
+
+
+def normalize_columns(df):
+    """
+    Lower-case and snake-case spreadsheet headers ("Monthly Salary" -> "monthly_salary").
+    """
+    df.columns = [str(col).strip().lower().replace(' ', '_') for col in df.columns]
+    return df
+
+
+def _select(df, columns, report):
+    """
+    Rename the source columns we ingest, failing fast if any are missing.
+    """
+    missing = sorted(set(columns) - set(df.columns))
+    if missing:
+        raise ValueError(f"{report.label}: missing columns {', '.join(missing)}")
+    return df[list(columns)].rename(columns=columns)
+
+
+def _reject_where(df, mask, reason, report):
+    """
+    Drop rows matching `mask`, recording them (by spreadsheet row number) in `report`.
+    """
+    mask = mask.fillna(True).astype(bool)
+    if mask.any():
+        report.reject(df.index[mask] + 2, reason)
+    return df[~mask]
+
+
+def _numbers(series):
+    return pd.to_numeric(series, errors='coerce')
+
+
+def _strings(series):
+    # Numeric columns (e.g. phone numbers read from Excel) must not pick up a ".0" suffix.
+    if pd.api.types.is_numeric_dtype(series):
+        series = pd.to_numeric(series, errors='coerce').round().astype('Int64')
+    return series.astype('string').str.strip()
+
+
+def validate_customers(df, report):
+    """
+    Apply the Customer model's field and clean() rules to a whole DataFrame.
+    Returns the valid rows with model field names; rejects are recorded in `report`.
+    """
+    df = _select(df, CUSTOMER_COLUMNS, report)
+    report.rows_read += len(df)
+    for column in ('customer_id', 'age', 'monthly_income', 'approved_limit'):
+        df[column] = _numbers(df[column])
+    df = _reject_where(df, df['customer_id'].isna() | (df['customer_id'] <= 0) | (df['customer_id'] % 1 != 0), "invalid customer_id", report)
+    for column in ('first_name', 'last_name', 'phone_number'):
+        df[column] = _strings(df[column])
+    df = _reject_where(df, df['first_name'].isna() | (df['first_name'].str.len() == 0) | (df['first_name'].str.len() > 50), "invalid first_name", report)
+    df = _reject_where(df, df['last_name'].isna() | (df['last_name'].str.len() == 0) | (df['last_name'].str.len() > 50), "invalid last_name", report)
+    df = _reject_where(df, df['phone_number'].isna() | (df['phone_number'].str.len() == 0) | (df['phone_number'].str.len() > 15), "invalid phone_number", report)
+    df = _reject_where(df, df['age'].isna() | (df['age'] < 0) | (df['age'] % 1 != 0), "invalid age", report)
+    df = _reject_where(df, df['monthly_income'].isna() | (df['monthly_income'] < 0) | (df['monthly_income'] >= 10 ** 8), "invalid monthly_salary", report)
+    df = _reject_where(df, df['approved_limit'].isna() | (df['approved_limit'].abs() >= 10 ** 10), "invalid approved_limit", report)
+    df = _reject_where(df, df.duplicated('customer_id', keep='last'), "duplicate customer_id (later row wins)", report)
+    return df.astype({'customer_id': 'int64', 'age': 'int64'})
+
+
+def validate_loans(df, report, known_customer_ids):
+    """
+    Apply the Loan model's field and clean() rules to a whole DataFrame and
+    resolve customer references against `known_customer_ids`.
+    Returns the valid rows with model field names; rejects are recorded in `report`.
+    """
+    df = _select(df, LOAN_COLUMNS, report)
+    report.rows_read += len(df)
+    for column in ('loan_id', 'customer_id', 'loan_amount', 'interest_rate', 'tenure', 'monthly_payment', 'emi_paid_on_time'):
+        df[column] = _numbers(df[column])
+    for column in ('start_date', 'end_date'):
+        df[column] = pd.to_datetime(df[column], errors='coerce')
+    df = _reject_where(df, df['loan_id'].isna() | (df['loan_id'] <= 0) | (df['loan_id'] % 1 != 0), "invalid loan_id", report)
+    df = _reject_where(df, df['customer_id'].isna() | ~df['customer_id'].isin(known_customer_ids), "customer not found", report)
+    df = _reject_where(df, df['loan_amount'].isna() | (df['loan_amount'] <= 0) | (df['loan_amount'] >= 10 ** 10), "invalid loan_amount", report)
+    df = _reject_where(df, df['interest_rate'].isna() | (df['interest_rate'] < 0) | (df['interest_rate'] >= 1000), "invalid interest_rate", report)
+    df = _reject_where(df, df['tenure'].isna() | (df['tenure'] <= 0) | (df['tenure'] % 1 != 0), "invalid tenure", report)
+    df = _reject_where(df, df['monthly_payment'].isna() | (df['monthly_payment'].abs() >= 10 ** 10), "invalid monthly_payment", report)
+    df = _reject_where(df, df['emi_paid_on_time'].isna() | (df['emi_paid_on_time'] < 0) | (df['emi_paid_on_time'] % 1 != 0), "invalid emis_paid_on_time", report)
+    df = _reject_where(df, df['start_date'].isna(), "invalid date_of_approval", report)
+    df = _reject_where(df, df['end_date'].isna(), "invalid end_date", report)
+    df = _reject_where(df, df.duplicated('loan_id', keep='last'), "duplicate loan_id (later row wins)", report)
+    return df.astype({'loan_id': 'int64', 'customer_id': 'int64', 'tenure': 'int64', 'emi_paid_on_time': 'int64'})
+
+
+def _money(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def upsert_customers(df, batch_size=1000):
+    """
+    Insert or update validated customer rows in batches. Returns the number of rows written.
+    """
+    customers = [
+        Customer(
+            customer_id=row.customer_id,
+            first_name=row.first_name,
+            last_name=row.last_name,
+            age=row.age,
+            phone_number=row.phone_number,
+            monthly_income=_money(row.monthly_income),
+            approved_limit=_money(row.approved_limit),
+            current_debt=Decimal('0.00'),
+        )
+        for row in df.itertuples(index=False)
+    ]
+    Customer.objects.bulk_create(
+        customers,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['customer_id'],
+        update_fields=CUSTOMER_UPDATE_FIELDS,
+    )
+    invalidate_all()
+    return len(customers)
+
+
+def upsert_loans(df, batch_size=1000):
+    """
+    Insert or update validated loan rows in batches. Returns the number of rows written.
+    """
+    loans = [
+        Loan(
+            loan_id=row.loan_id,
+            customer_id=row.customer_id,
+            loan_amount=_money(row.loan_amount),
+            interest_rate=_money(row.interest_rate),
+            tenure=row.tenure,
+            monthly_payment=_money(row.monthly_payment),
+            emi_paid_on_time=row.emi_paid_on_time,
+            start_date=row.start_date.date(),
+            end_date=row.end_date.date(),
+        )
+        for row in df.itertuples(index=False)
+    ]
+    Loan.objects.bulk_create(
+        loans,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['loan_id'],
+        update_fields=LOAN_UPDATE_FIELDS,
+    )
+    invalidate_all()
+    return len(loans)
+
+
+def refresh_customer_rollups(customer_ids, batch_size=10_000):
+    """
+    Recompute what Loan.save maintains row by row for customers touched by a
+    bulk load: current debt (sum of loan amounts) and the credit profile.
+    """
+    customer_ids = sorted(customer_ids)
+    for start in range(0, len(customer_ids), batch_size):
+        with transaction.atomic():
+            _refresh_rollups(customer_ids[start:start + batch_size])
+
+
+def _refresh_rollups(customer_ids):
+    loan_totals = Loan.objects.filter(customer_id=OuterRef('customer_id')).order_by().values('customer_id').annotate(
+        total=Sum('loan_amount')
+    ).values('total')
+    Customer.objects.filter(customer_id__in=customer_ids).update(
+        current_debt=Coalesce(
+            Subquery(loan_totals, output_field=DecimalField(max_digits=12, decimal_places=2)),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+    )
+    CustomerCreditProfile.rebuild_all(customer_ids)
+
+
+def ingest_customers(df, batch_size=1000):
+    """
+    Validate and upsert a DataFrame of customers in one transaction.
+    """
+    report = IngestReport("Customers")
+    start = time.perf_counter()
+    valid = validate_customers(normalize_columns(df), report)
+    with transaction.atomic():
+        report.rows_written = upsert_customers(valid, batch_size)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def ingest_loans(df, batch_size=1000, refresh_rollups=True):
+    """
+    Validate and upsert a DataFrame of loans in one transaction, resolving every
+    referenced customer with a single lookup.
+
+    With refresh_rollups=False the touched customers are only collected in
+    report.customer_ids, so a caller loading many chunks can refresh them once
+    with refresh_customer_rollups() at the end.
+    """
+    report = IngestReport("Loans")
+    start = time.perf_counter()
+    df = normalize_columns(df)
+    referenced = pd.to_numeric(df.get('customer_id'), errors='coerce').dropna().unique().tolist()
+    known = set(Customer.objects.filter(customer_id__in=referenced).values_list('customer_id', flat=True))
+    valid = validate_loans(df, report, known)
+    loan_ids = valid['loan_id'].tolist()
+    # Customers losing a loan to another customer need their rollups refreshed too.
+    previous_owners = Loan.objects.filter(loan_id__in=loan_ids).values_list('customer_id', flat=True).distinct()
+    report.customer_ids = set(valid['customer_id'].unique().tolist()) | set(previous_owners)
+    with transaction.atomic():
+        report.rows_written = upsert_loans(valid, batch_size)
+        if refresh_rollups:
+            _refresh_rollups(report.customer_ids)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def split_partitions(kind, path, partitions, directory, chunk_size=50_000):
+    """
+    Read `path` once, chunk by chunk, and spill each chunk's rows into one
+    pickle file per partition under `directory`, so worker processes ingest
+    their own rows without parsing the input again.
+
+    Customers are partitioned by customer_id and loans by loan_id (a loan ID can
+    appear under more than one customer, and all of its rows must go to the
+    same worker for the later row to win). Rows without a usable key go to
+    partition 0 to be rejected once. Returns one list of spill files per
+    partition, in file order.
+    """
+    key = 'customer_id' if kind == 'customers' else 'loan_id'
+    files = [[] for _ in range(partitions)]
+    for number, chunk in enumerate(iter_chunks(path, chunk_size)):
+        chunk = normalize_columns(chunk)
+        keys = _numbers(chunk[key]) if key in chunk else pd.Series(float('nan'), index=chunk.index)
+        assignment = (keys % partitions).fillna(0)
+        for partition in range(partitions):
+            part = chunk[assignment == partition]
+            if part.empty:
+                continue
+            spill = os.path.join(directory, f"{kind}-{partition}-{number}.pkl")
+            part.to_pickle(spill)
+            files[partition].append(spill)
+    return files
+
+
+def ingest_partition(kind, files, partition, partitions, batch_size=1000):
+    """
+    Ingest one partition written by split_partitions(), in a single transaction.
+
+    Meant to run in a worker process with its own database connection. Loan
+    partitions leave customer rollups to the caller via report.customer_ids.
+    A failure rolls back this partition only and is recorded in report.errors.
+    """
+    report = IngestReport(f"{kind.capitalize()} [partition {partition + 1}/{partitions}]")
+    start = time.perf_counter()
+    try:
+        with transaction.atomic():
+            for spill in files:
+                part = pd.read_pickle(spill)
+                if kind == 'customers':
+                    report.merge(ingest_customers(part, batch_size))
+                else:
+                    report.merge(ingest_loans(part, batch_size, refresh_rollups=False))
+    except Exception as e:
+        report.rows_written = 0
+        report.customer_ids = set()
+        report.errors.append(f"{report.label}: {e}")
+    report.seconds = time.perf_counter() - start
+    return report
@@ -0,0 +1,111 @@
+"""
+Request-scoped customer identity map for the Credit Approval System.
+
+A single API request used to load the same customer several times (serializer
+validation, core.utils helpers, Loan.save). CustomerLoader caches each customer
+row the first time it is fetched so every layer shares one instance, and
+CustomerLoaderMiddleware gives each request its own loader.
+
+Outside a request (management commands, the shell) get_customer_loader()
+returns a fresh, uncached loader so nothing is shared between unrelated calls.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+
+from .models import Customer
+
+_current_loader = ContextVar('customer_loader', default=None)
+
+
+class CustomerLoader:
+    """
+    Identity map of Customer rows keyed by customer_id. Misses are cached too,
+    so a missing customer is also looked up only once.
+    """
+
+    def __init__(self):
+        self._customers = {}
+        self._lock_rows = False
+        self._locked = set()
+
+    def get(self, customer_id):
+        """
+        Return the Customer with this ID, or None if it does not exist.
+        The credit profile and stored score are joined in, so scoring needs no
+        further query.
+        Inside locking(), the row is fetched with SELECT ... FOR UPDATE.
+        """
+        if self._lock_rows and customer_id not in self._locked:
+            self._locked.add(customer_id)
+            # The profile is read after the lock is granted so it cannot be stale.
+            customer = Customer.objects.select_for_update().filter(customer_id=customer_id).first()
+        elif customer_id in self._customers:
+            return self._customers[customer_id]
+        else:
+            customer = Customer.objects.select_related('credit_profile', 'stored_score').filter(customer_id=customer_id).first()
+        self._customers[customer_id] = customer
+        return customer
+
+    async def aget(self, customer_id):
+        """
+        Async get() for the ASGI views, sharing the same map. Not available
+        inside locking().
+        """
+        if self._lock_rows:
+            raise transaction.TransactionManagementError("aget() cannot lock rows; use get() inside locking().")
+        if customer_id not in self._customers:
+            self._customers[customer_id] = await Customer.objects.select_related('credit_profile', 'stored_score').filter(
+                customer_id=customer_id
+            ).afirst()
+        return self._customers[customer_id]
+
+    @contextmanager
+    def locking(self):
+        """
+        Lock every customer fetched in this block until the surrounding
+        transaction ends. Only rows actually requested are locked, so requests
+        for unrelated customers do not wait on each other.
+        """
+        if not transaction.get_connection().in_atomic_block:
+            raise transaction.TransactionManagementError("locking() requires an atomic block.")
+        self._lock_rows = True
+        try:
+            yield self
+        finally:
+            self._lock_rows = False
+            self._locked.clear()
+
+    def prime(self, customer):
+        """
+        Add an already loaded customer to the map.
+        """
+        self._customers[customer.customer_id] = customer
+        return customer
+
+    def forget(self, customer_id):
+        """
+        Drop a customer so the next get() reloads it.
+        """
+        self._customers.pop(customer_id, None)
+
+
+def get_customer_loader():
+    """
+    The current request's loader, or a throwaway one outside a request.
+    """
+    return _current_loader.get() or CustomerLoader()
+
+
+@contextmanager
+def customer_loader_scope():
+    """
+    Run a block with its own CustomerLoader installed as the current loader.
+    """
+    token = _current_loader.set(CustomerLoader())
+    try:
+        yield _current_loader.get()
+    finally:
+        _current_loader.reset(token)
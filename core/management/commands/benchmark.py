@@ -0,0 +1,36 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmarks import BENCHMARKS, run_benchmark
+
+
+class Command(BaseCommand):
+    help = "Run a named benchmark and print its results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(BENCHMARKS), help='Benchmark to run.')
+        parser.add_argument('--size', type=int, default=100_000, help='Problem size (e.g. number of loans).')
+        parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions; the best run is reported.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for generated data.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Parallel clients for request-level benchmarks.')
+        parser.add_argument(
+            '--latency-ms', type=float, default=0.0,
+            help='Simulated latency added to every database query, for request-level benchmarks.'
+        )
+        parser.add_argument('--mix', help='replay: endpoint weights, e.g. "check-eligibility=60,view-loan=40".')
+        parser.add_argument('--replay', metavar='PATH', help='replay: JSONL traffic file to replay instead of generating.')
+        parser.add_argument('--record', metavar='PATH', help='replay: write the replayed traffic to this JSONL file.')
+        parser.add_argument('--url', help='replay: base URL of a running server; in-process if omitted.')
+        parser.add_argument(
+            '--live-database', action='store_true',
+            help='replay --url: seed the configured database, which the server must use, instead of a test database.'
+        )
+
+    def handle(self, *args, **options):
+        live_database = options['name'] == 'replay' and bool(options['url'])
+        if live_database and not options['live_database']:
+            raise CommandError(
+                "replay --url seeds benchmark customers into the configured database, which the server must use. "
+                "Pass --live-database to allow it."
+            )
+        results = run_benchmark(options['name'], options, live_database=live_database)
+        self.stdout.write(json.dumps({'benchmark': options['name'], **results}, indent=2, default=str))
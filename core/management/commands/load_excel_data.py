@@ -1,77 +1,135 @@
-import pandas as pd
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
 from django.core.management.base import BaseCommand
-from django.db import connection
-from core.models import Customer, Loan
-from decimal import Decimal, ROUND_HALF_UP
+from django.db import connection, connections
+from core.ingestion import (
+    IngestReport, ingest_customers, ingest_loans, ingest_partition, iter_chunks, refresh_customer_rollups,
+    split_partitions
+)
 
 
-class Command(BaseCommand):
-    help = 'Ingests data from customer_data.xlsx and loan_data.xlsx'
-
-    def handle(self, *args, **kwargs):
-        try:
-            self.stdout.write("📥 Loading customer_data.xlsx...")
-            customer_df = pd.read_excel('customer_data.xlsx')
-            customer_df.columns = [col.strip().lower().replace(' ', '_') for col in customer_df.columns]
-
-            for _, row in customer_df.iterrows():
-                Customer.objects.update_or_create(
-                    customer_id=row['customer_id'],
-                    defaults={
-                        'first_name': row['first_name'],
-                        'last_name': row['last_name'],
-                        'age': row['age'],
-                        'phone_number': str(row['phone_number']),
-                        'monthly_income': row['monthly_salary'],
-                        'approved_limit': row['approved_limit'],
-                        'current_debt': 0  # Assuming 0 if not present
-                    }
-                )
+def peak_rss_mb():
+    """
+    High-water mark of this process's resident memory, in MiB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB elsewhere.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
 
-            self.stdout.write(self.style.SUCCESS("✅ Customers data ingested."))
 
-            self.stdout.write("📥 Loading loan_data.xlsx...")
-            loan_df = pd.read_excel('loan_data.xlsx')
-            loan_df.columns = [col.strip().lower().replace(' ', '_') for col in loan_df.columns]
-
-            for _, row in loan_df.iterrows():
-                try:
-                    customer = Customer.objects.get(customer_id=row['customer_id'])
+class Command(BaseCommand):
+    help = 'Ingests customer and loan data (xlsx, CSV or Parquet; defaults to customer_data.xlsx and loan_data.xlsx)'
 
-                    # Ensure interest_rate has exactly 2 decimal places
-                    interest_rate = Decimal(str(row['interest_rate'])).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', default='customer_data.xlsx', help='Customer file (.xlsx, .csv or .parquet).')
+        parser.add_argument('--loans', default='loan_data.xlsx', help='Loan file (.xlsx, .csv or .parquet).')
+        parser.add_argument('--chunk-size', type=int, default=50_000, help='Rows read and written per chunk.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk upsert statement.')
+        parser.add_argument('--show-rejected', type=int, default=20, help='How many rejected rows to list per file.')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Worker processes; rows are hash-partitioned (customers by customer_id, loans by loan_id) and each partition is ingested in its own transaction.'
+        )
 
-                    Loan.objects.update_or_create(
-                        loan_id=row['loan_id'],
-                        defaults={
-                            'customer': customer,
-                            'loan_amount': row['loan_amount'],
-                            'interest_rate': interest_rate,
-                            'tenure': row['tenure'],
-                            'monthly_payment': row['monthly_payment'],
-                            'emi_paid_on_time': row['emis_paid_on_time'],
-                            'start_date': pd.to_datetime(row['date_of_approval']).date(),
-                            'end_date': pd.to_datetime(row['end_date']).date(),
-                        }
-                    )
-                except Customer.DoesNotExist:
-                    self.stdout.write(self.style.WARNING(
-                        f"⚠️ Skipped loan {row['loan_id']} (customer {row['customer_id']} not found)"
-                    ))
+    def handle(self, *args, **options):
+        try:
+            if options['workers'] > 1:
+                self.ingest_parallel(options)
+            else:
+                self.stdout.write(f"📥 Loading {options['customers']}...")
+                customer_report = self.ingest_file(options['customers'], ingest_customers, "Customers", options)
+                self.report(customer_report, options['show_rejected'])
+                self.stdout.write(self.style.SUCCESS("✅ Customers data ingested."))
 
-            self.stdout.write(self.style.SUCCESS("✅ Loans data ingested."))
+                self.stdout.write(f"📥 Loading {options['loans']}...")
+                loan_report = self.ingest_file(options['loans'], self.ingest_loan_chunk, "Loans", options)
+                self.report(loan_report, options['show_rejected'])
+                refresh_customer_rollups(loan_report.customer_ids)
+                self.stdout.write(f"🔁 Refreshed debt and credit profiles for {len(loan_report.customer_ids)} customers.")
+                self.stdout.write(self.style.SUCCESS("✅ Loans data ingested."))
 
             # --- Sequence reset automation ---
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "SELECT setval(pg_get_serial_sequence('core_customer', 'customer_id'), "
-                    "(SELECT COALESCE(MAX(customer_id), 1) FROM core_customer));"
-                )
-                cursor.execute(
-                    "SELECT setval(pg_get_serial_sequence('core_loan', 'loan_id'), "
-                    "(SELECT COALESCE(MAX(loan_id), 1) FROM core_loan));"
-                )
-            self.stdout.write(self.style.SUCCESS("✅ PostgreSQL sequences reset."))
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT setval(pg_get_serial_sequence('core_customer', 'customer_id'), "
+                        "(SELECT COALESCE(MAX(customer_id), 1) FROM core_customer));"
+                    )
+                    cursor.execute(
+                        "SELECT setval(pg_get_serial_sequence('core_loan', 'loan_id'), "
+                        "(SELECT COALESCE(MAX(loan_id), 1) FROM core_loan));"
+                    )
+                self.stdout.write(self.style.SUCCESS("✅ PostgreSQL sequences reset."))
 
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"❌ Error occurred: {e}"))
+
+    def ingest_file(self, path, ingest, label, options):
+        """
+        Read `path` chunk by chunk, writing each chunk before the next is read.
+        """
+        total = IngestReport(label)
+        start = time.perf_counter()
+        for chunk in iter_chunks(path, options['chunk_size']):
+            total.merge(ingest(chunk, options['batch_size']))
+            self.stdout.write(f"   … {total.rows_read} rows processed (peak RSS {peak_rss_mb():.1f} MiB)")
+        total.seconds = time.perf_counter() - start
+        return total
+
+    def ingest_parallel(self, options):
+        """
+        Ingest customers, then loans, with one process per partition. Each
+        file is read once here and split into per-partition spill files.
+        Every customer partition finishes before any loan partition starts,
+        and customer rollups are refreshed once after all loan partitions.
+        """
+        workers = options['workers']
+        # Workers are spawned fresh and open their own connections.
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as pool, \
+                tempfile.TemporaryDirectory(prefix='load_excel_data-') as directory:
+            for kind, label in (('customers', "Customers"), ('loans', "Loans")):
+                path = options[kind]
+                self.stdout.write(f"📥 Loading {path} with {workers} workers...")
+                total = IngestReport(label)
+                start = time.perf_counter()
+                files = split_partitions(kind, path, workers, directory, options['chunk_size'])
+                self.stdout.write(f"   … split into {workers} partitions in {time.perf_counter() - start:.2f}s")
+                futures = [
+                    pool.submit(ingest_partition, kind, files[partition], partition, workers, options['batch_size'])
+                    for partition in range(workers)
+                ]
+                for future in as_completed(futures):
+                    part = future.result()
+                    status = self.style.ERROR("failed") if part.errors else "done"
+                    self.stdout.write(f"   … {part.label} {status}: {part.rows_written} written in {part.seconds:.2f}s")
+                    total.merge(part)
+                total.seconds = time.perf_counter() - start
+                self.report(total, options['show_rejected'])
+                if kind == 'loans':
+                    refresh_customer_rollups(total.customer_ids)
+                    self.stdout.write(f"🔁 Refreshed debt and credit profiles for {len(total.customer_ids)} customers.")
+                if total.errors:
+                    self.stdout.write(self.style.ERROR(f"❌ {label}: {len(total.errors)} of {workers} partitions rolled back."))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"✅ {label} data ingested."))
+
+    @staticmethod
+    def ingest_loan_chunk(chunk, batch_size):
+        # Customer rollups are refreshed once after the whole file, not per chunk.
+        return ingest_loans(chunk, batch_size, refresh_rollups=False)
+
+    def report(self, report, show_rejected):
+        self.stdout.write(f"📊 {report.summary()}; peak RSS {peak_rss_mb():.1f} MiB")
+        for row, reason in report.rejected[:show_rejected]:
+            self.stdout.write(self.style.WARNING(f"⚠️ Skipped row {row}: {reason}"))
+        if len(report.rejected) > show_rejected:
+            self.stdout.write(self.style.WARNING(f"⚠️ ... and {len(report.rejected) - show_rejected} more rejected rows"))
+        for error in report.errors:
+            self.stdout.write(self.style.ERROR(f"❌ {error}"))
@@ -0,0 +1,63 @@
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from core.ingestion import iter_chunks, normalize_columns
+from core.repayments import post_repayments, summarize
+
+
+class Command(BaseCommand):
+    help = "Post EMI repayments in bulk from a file with loan_id and emis_paid columns (.csv, .xlsx or .parquet)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Repayment file (.csv, .xlsx or .parquet).')
+        parser.add_argument('--chunk-size', type=int, default=50_000, help='Rows read from the file at a time.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Repayments applied per transaction.')
+        parser.add_argument('--show-rejected', type=int, default=20, help='How many rejected rows to list.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        counts = {'applied': 0, 'rejected': 0, 'failed': 0}
+        problems = []
+        try:
+            chunks = iter_chunks(options['path'], options['chunk_size'])
+            for chunk in chunks:
+                chunk = normalize_columns(chunk)
+                missing = {'loan_id', 'emis_paid'} - set(chunk.columns)
+                if missing:
+                    raise CommandError(f"Missing columns: {', '.join(sorted(missing))}")
+                loan_ids = pd.to_numeric(chunk['loan_id'], errors='coerce')
+                emis_paid = pd.to_numeric(chunk['emis_paid'], errors='coerce')
+                usable = (loan_ids > 0) & (loan_ids % 1 == 0) & (emis_paid > 0) & (emis_paid % 1 == 0)
+                for row in chunk.index[~usable]:
+                    # Row numbers as in the file, counting the header as row 1.
+                    problems.append((row + 2, chunk.at[row, 'loan_id'], "loan_id and emis_paid must be positive integers."))
+                counts['rejected'] += int((~usable).sum())
+                rows = chunk.index[usable]
+                records = list(zip(loan_ids[usable].astype(int).tolist(), emis_paid[usable].astype(int).tolist()))
+                results = post_repayments(records, options['batch_size'])
+                for key, value in summarize(results).items():
+                    counts[key] += value
+                problems.extend(
+                    (row + 2, result['loan_id'], result['error'])
+                    for row, result in zip(rows, results) if result['status'] != 'applied'
+                )
+                self.stdout.write(f"   … {sum(counts.values())} rows processed")
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        seconds = time.perf_counter() - start
+        rate = counts['applied'] / seconds if seconds else 0.0
+        self.stdout.write(
+            f"📊 Repayments: {counts['applied']} applied, {counts['rejected']} rejected, {counts['failed']} failed "
+            f"in {seconds:.2f}s ({rate:,.0f} rows/sec)"
+        )
+        show = options['show_rejected']
+        problems.sort(key=lambda problem: problem[0])
+        for row, loan_id, error in problems[:show]:
+            self.stdout.write(self.style.WARNING(f"⚠️ Skipped row {row} (loan {loan_id}): {error}"))
+        if len(problems) > show:
+            self.stdout.write(self.style.WARNING(f"⚠️ ... and {len(problems) - show} more"))
+        if counts['failed']:
+            raise CommandError(f"{counts['failed']} repayments failed with database errors; re-run for those rows.")
+        self.stdout.write(self.style.SUCCESS("✅ Repayments posted."))
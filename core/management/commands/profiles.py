@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.profiling import list_report_paths, load_report, reports_dir
+import json
+
+
+class Command(BaseCommand):
+    help = "List, show or clear the request profiling reports (see PROFILING_* settings)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'report_id', nargs='?',
+            help='Show this report (an ID or unique ID prefix) instead of listing.'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Number of reports to list, newest first (default 20).'
+        )
+        parser.add_argument(
+            '--slowest-queries', type=int, default=10,
+            help='Number of SQL statements to show with a report, slowest first (default 10).'
+        )
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Print the full report as JSON.'
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete every stored report.'
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            paths = list_report_paths()
+            for path in paths:
+                path.unlink(missing_ok=True)
+            self.stdout.write(self.style.SUCCESS(f"✅ Deleted {len(paths)} profiling reports."))
+            return
+        if options['report_id']:
+            report = load_report(options['report_id'])
+            if report is None:
+                raise CommandError(f"No single report matches {options['report_id']!r}.")
+            if options['json']:
+                self.stdout.write(json.dumps(report, indent=2))
+            else:
+                self.show(report, options['slowest_queries'])
+            return
+        paths = list_report_paths()[:options['limit']]
+        if not paths:
+            self.stdout.write(f"No profiling reports in {reports_dir()}.")
+            return
+        for path in paths:
+            report = json.loads(path.read_text())
+            self.stdout.write(
+                f"{report['id']}  {report['time']}  {report['trigger']:<6}  {report['status']}  "
+                f"{report['duration_ms']:>9.1f} ms  {report['query_count']:>3} queries  "
+                f"{report['db_ms']:>8.1f} ms SQL  {report['method']} {report['path']}"
+            )
+
+    def show(self, report, slowest_queries):
+        self.stdout.write(
+            f"{report['method']} {report['path']} ({report['view']}) -> {report['status']}\n"
+            f"{report['time']}, {report['trigger']}: {report['duration_ms']:.1f} ms total, "
+            f"{report['query_count']} queries in {report['db_ms']:.1f} ms"
+        )
+        queries = sorted(report['queries'], key=lambda query: query['ms'], reverse=True)[:slowest_queries]
+        if queries:
+            self.stdout.write("\nSlowest SQL:")
+            for query in queries:
+                self.stdout.write(f"  {query['ms']:>8.3f} ms  {query['sql']}")
+                for site in query['call_sites']:
+                    self.stdout.write(f"               at {site}")
+        if report['profile']:
+            self.stdout.write(f"\n{report['profile']}")
+        else:
+            self.stdout.write("\nNo cProfile statistics (async request).")
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses older than the retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=float, dest='hours',
+            help='Age in hours beyond which keys are deleted (default IDEMPOTENCY_KEY_TTL_HOURS).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Rows deleted per statement, to keep transactions short (default 10000).'
+        )
+
+    def handle(self, *args, **options):
+        hours = options['hours'] if options['hours'] is not None else settings.IDEMPOTENCY_KEY_TTL_HOURS
+        if hours < 0:
+            raise CommandError("--older-than must not be negative.")
+        cutoff = timezone.now() - timedelta(hours=hours)
+        deleted = 0
+        while True:
+            batch = list(
+                IdempotencyKey.objects.filter(created_at__lt=cutoff)
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            deleted += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"✅ Deleted {deleted} idempotency keys older than {hours:g} hours."))
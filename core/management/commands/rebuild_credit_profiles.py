@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.models import CustomerCreditProfile
+
+
+class Command(BaseCommand):
+    help = "Rebuild CustomerCreditProfile rollups from the loan table, or check them for drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report profiles that disagree with the loan table; do not write.'
+        )
+        parser.add_argument(
+            '--customer', type=int, nargs='+', dest='customer_ids',
+            help='Limit the rebuild/check to these customer IDs.'
+        )
+
+    def handle(self, *args, **options):
+        customer_ids = options['customer_ids']
+        if options['check']:
+            self.check_drift(customer_ids)
+            return
+        with transaction.atomic():
+            written = CustomerCreditProfile.rebuild_all(customer_ids)
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {written} credit profiles."))
+
+    def check_drift(self, customer_ids):
+        expected = CustomerCreditProfile.compute(customer_ids)
+        stored = CustomerCreditProfile.objects.in_bulk(list(expected))
+        drifted = 0
+        for customer_id, values in expected.items():
+            profile = stored.get(customer_id)
+            if profile is None:
+                if not values['loan_count']:
+                    # Scoring falls back to aggregating loans for customers without a profile.
+                    continue
+                drifted += 1
+                self.stdout.write(self.style.WARNING(f"⚠️ Customer {customer_id}: profile missing"))
+                continue
+            for field, (actual, wanted) in profile.drift(values).items():
+                drifted += 1
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ Customer {customer_id}: {field} is {actual}, expected {wanted}"
+                ))
+        if drifted:
+            raise CommandError(f"{drifted} credit profile discrepancies found; run without --check to rebuild.")
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(expected)} credit profiles match the loan table."))
@@ -1,25 +1,71 @@
-from django.core.management.base import BaseCommand
-from core.models import Customer, Loan  # Make sure app name is correct
-from decimal import Decimal, ROUND_HALF_UP
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core.models import Customer, JobState, Loan  # Make sure app name is correct
+from decimal import Decimal
+
+JOB_NAME = 'update_customer_debt'
+DEBT_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
 
 class Command(BaseCommand):
     help = "Update the current_debt field of each customer based on active loans"
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Only recompute customers whose loans changed at or after this ISO datetime.'
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only recompute customers whose loans changed since the last successful run.'
+        )
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        since = self.resolve_since(options)
+
+        # Total debt: unpaid EMIs * monthly_payment, summed per customer in Decimal.
+        remaining = Loan.objects.filter(
+            customer_id=OuterRef('customer_id'), tenure__gt=F('emi_paid_on_time')
+        ).order_by().values('customer_id').annotate(
+            total=Sum(ExpressionWrapper(
+                (F('tenure') - F('emi_paid_on_time')) * F('monthly_payment'), output_field=DEBT_FIELD
+            ))
+        ).values('total')
+
         customers = Customer.objects.all()
-        updated_count = 0
-
-        for customer in customers:
-            # Get all loans for this customer
-            loans = Loan.objects.filter(customer=customer)
-
-            # Calculate total debt: unpaid EMIs * monthly_payment
-            total_debt = 0
-            for loan in loans:
-                emis_left = loan.tenure - loan.emi_paid_on_time
-                if emis_left > 0:
-                    total_debt += float(emis_left) * float(loan.monthly_payment)
-            # Quantize to 2 decimal places
-            customer.current_debt = Decimal(str(total_debt)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            customer.save()
-            updated_count += 1
+        if since is not None:
+            # Loan.save/delete also touch the credit profile, which catches deleted loans.
+            changed = Loan.objects.filter(updated_at__gte=since).values('customer_id')
+            customers = customers.filter(
+                Q(customer_id__in=changed) | Q(credit_profile__updated_at__gte=since)
+            )
+
+        with transaction.atomic():
+            updated_count = customers.update(
+                current_debt=Coalesce(Subquery(remaining, output_field=DEBT_FIELD), Value(Decimal('0.00')), output_field=DEBT_FIELD)
+            )
+            JobState.objects.update_or_create(name=JOB_NAME, defaults={'last_run_at': started})
+
+        scope = "" if since is None else f" with loan changes since {since.isoformat()}"
+        self.stdout.write(self.style.SUCCESS(f"✅ Updated current debt for {updated_count} customers{scope}."))
+
+    def resolve_since(self, options):
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid --since datetime: {options['since']}")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            return since
+        if options['incremental']:
+            state = JobState.objects.filter(name=JOB_NAME).first()
+            if state is None or state.last_run_at is None:
+                self.stdout.write("No previous run recorded; recomputing all customers.")
+                return None
+            return state.last_run_at
+        return None
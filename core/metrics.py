@@ -0,0 +1,304 @@
+"""
+Request metrics for the Credit Approval System, exposed in Prometheus text
+format at /metrics.
+
+MetricsMiddleware records, per URL name:
+- request latency
+- number of database queries and time spent in them
+- serialization time (rendering the response body)
+- response size (not known for streamed responses, which are skipped)
+- responses by status code
+
+@timed(name) records the duration of hot business functions
+(check_eligibility, calculate_emi).
+
+Every histogram has fixed buckets whose counters are allocated once, when the
+histogram is created; recording a value only increments existing counters.
+Metrics are kept per process, like the response cache, EMI annuity cache and
+pool statistics, which are included in the output.
+"""
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .cache import cache_stats
+from .db import pool_stats
+from .emi import annuity_cache_stats
+
+PREFIX = 'credit_api'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FUNCTION_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 1.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+UNMATCHED = 'unmatched'
+
+_lock = threading.Lock()
+_current = ContextVar('request_metrics', default=None)
+
+
+class Histogram:
+    """
+    A Prometheus histogram with fixed bucket upper bounds. Not thread-safe on
+    its own; callers hold _lock.
+    """
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        cumulative += self.counts[-1]
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class ViewMetrics:
+    """
+    The histograms and status counters of one URL name.
+    """
+    __slots__ = ('latency', 'queries', 'db_time', 'serialization', 'size', 'statuses')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_time = Histogram(LATENCY_BUCKETS)
+        self.serialization = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.statuses = {}
+
+
+class RequestMetrics:
+    """
+    Counters for the request in progress, shared by every thread it runs on.
+    """
+    __slots__ = ('queries', 'db_time', 'serialization', 'render_started')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization = 0.0
+        self.render_started = None
+
+
+_views = {}
+_functions = {}
+
+
+def _view_metrics(name):
+    metrics = _views.get(name)
+    if metrics is None:
+        metrics = _views[name] = ViewMetrics()
+    return metrics
+
+
+def record_request(name, seconds, request_metrics, response):
+    size = None if response.streaming else len(response.content)
+    with _lock:
+        metrics = _view_metrics(name)
+        metrics.latency.observe(seconds)
+        metrics.queries.observe(request_metrics.queries)
+        metrics.db_time.observe(request_metrics.db_time)
+        metrics.serialization.observe(request_metrics.serialization)
+        if size is not None:
+            metrics.size.observe(size)
+        metrics.statuses[response.status_code] = metrics.statuses.get(response.status_code, 0) + 1
+
+
+def record_serialization(seconds):
+    """
+    Add rendering time to the current request (for responses built outside DRF).
+    """
+    request_metrics = _current.get()
+    if request_metrics is not None:
+        request_metrics.serialization += seconds
+
+
+def _record_function(name, seconds):
+    with _lock:
+        histogram = _functions.get(name)
+        if histogram is None:
+            histogram = _functions[name] = Histogram(FUNCTION_BUCKETS)
+        histogram.observe(seconds)
+
+
+def timed(name):
+    """
+    Record every call's duration under `name` (sync or async functions).
+    """
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _record_function(name, time.perf_counter() - start)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record_function(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def _time_query(execute, sql, params, many, context):
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.queries += 1
+        request_metrics.db_time += time.perf_counter() - start
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    connection_created receiver (connected in CoreConfig.ready) that counts
+    and times the queries of the current request on every connection.
+    """
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, queries, DB time, serialization time and response size
+    for each request under its URL name. Place it first in MIDDLEWARE so the
+    latency covers the other middleware too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, start, request_metrics, response)
+        return response
+
+    async def __acall__(self, request):
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, start, request_metrics, response)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns.
+        request_metrics = _current.get()
+        if request_metrics is not None:
+            request_metrics.render_started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self.rendered(request_metrics))
+        return response
+
+    def rendered(self, request_metrics):
+        request_metrics.serialization += time.perf_counter() - request_metrics.render_started
+
+    def record(self, request, start, request_metrics, response):
+        match = getattr(request, 'resolver_match', None)
+        name = (match.view_name if match is not None else None) or UNMATCHED
+        record_request(name, time.perf_counter() - start, request_metrics, response)
+
+
+def _scalar_lines(name, help_text, value, metric_type='gauge'):
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}', f'{name} {value}']
+
+
+def render_metrics():
+    """
+    All metrics of this process in Prometheus text exposition format.
+    """
+    with _lock:
+        views = sorted(_views.items())
+        functions = sorted(_functions.items())
+        lines = []
+        for attribute, name, help_text in (
+            ('latency', 'request_duration_seconds', 'Request latency by URL name.'),
+            ('queries', 'request_db_queries', 'Database queries per request by URL name.'),
+            ('db_time', 'request_db_duration_seconds', 'Time spent in database queries per request by URL name.'),
+            ('serialization', 'request_serialization_seconds', 'Time spent rendering the response body by URL name.'),
+            ('size', 'response_size_bytes', 'Response body size by URL name (streamed responses excluded).'),
+        ):
+            metric = f'{PREFIX}_{name}'
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+            for view, metrics in views:
+                lines.extend(getattr(metrics, attribute).samples(metric, f'view="{view}"'))
+        metric = f'{PREFIX}_responses_total'
+        lines += [f'# HELP {metric} Responses by URL name and status code.', f'# TYPE {metric} counter']
+        for view, metrics in views:
+            for code, count in sorted(metrics.statuses.items()):
+                lines.append(f'{metric}{{view="{view}",status="{code}"}} {count}')
+        metric = f'{PREFIX}_function_duration_seconds'
+        lines += [f'# HELP {metric} Duration of instrumented functions.', f'# TYPE {metric} histogram']
+        for function, histogram in functions:
+            lines.extend(histogram.samples(metric, f'function="{function}"'))
+
+    stats = cache_stats()
+    for name in ('hits', 'not_modified', 'misses', 'stores', 'invalidations'):
+        lines += _scalar_lines(f'{PREFIX}_cache_{name}_total', f'Response cache {name.replace("_", " ")}.', stats[name], 'counter')
+
+    stats = annuity_cache_stats()
+    for name in ('hits', 'misses'):
+        lines += _scalar_lines(f'{PREFIX}_emi_annuity_cache_{name}_total', f'EMI annuity cache {name}.', stats[name], 'counter')
+    lines += _scalar_lines(f'{PREFIX}_emi_annuity_cache_size', 'Entries in the EMI annuity cache.', stats['size'])
+
+    stats = pool_stats()
+    lines += _scalar_lines(f'{PREFIX}_db_pool_enabled', 'Whether a database connection pool is in use.', int(stats['pooled']))
+    if stats['pooled']:
+        for name, help_text, metric_type in (
+            ('size', 'Open pooled connections.', 'gauge'),
+            ('in_use', 'Pooled connections checked out.', 'gauge'),
+            ('idle', 'Pooled connections available.', 'gauge'),
+            ('waiting', 'Requests waiting for a pooled connection.', 'gauge'),
+            ('created', 'Connections opened by the pool.', 'counter'),
+            ('requests', 'Connection requests served by the pool.', 'counter'),
+            ('timeouts', 'Connection requests that timed out.', 'counter'),
+            ('connection_errors', 'Failed connection attempts.', 'counter'),
+            ('lost', 'Pooled connections found broken.', 'counter'),
+        ):
+            suffix = '_total' if metric_type == 'counter' else ''
+            lines += _scalar_lines(f'{PREFIX}_db_pool_{name}{suffix}', help_text, stats[name], metric_type)
+    return '\n'.join(lines) + '\n'
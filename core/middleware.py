@@ -0,0 +1,33 @@
+"""
+Middleware for the Credit Approval System.
+
+- CustomerLoaderMiddleware: gives every request its own customer identity map.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .loaders import customer_loader_scope
+
+
+class CustomerLoaderMiddleware:
+    """
+    Install a fresh CustomerLoader for the duration of each request.
+    Works under both WSGI and ASGI without forcing async views onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with customer_loader_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with customer_loader_scope():
+            return await self.get_response(request)
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_credit_profiles(apps, schema_editor):
+    Customer = apps.get_model('core', 'Customer')
+    Loan = apps.get_model('core', 'Loan')
+    CustomerCreditProfile = apps.get_model('core', 'CustomerCreditProfile')
+    profiles = {
+        customer_id: CustomerCreditProfile(customer_id=customer_id, loans_per_year={})
+        for customer_id in Customer.objects.values_list('customer_id', flat=True)
+    }
+    totals = Loan.objects.values('customer_id').annotate(
+        loan_count=Count('loan_id'),
+        total_tenure=Sum('tenure'),
+        total_emis_paid=Sum('emi_paid_on_time'),
+        total_loan_amount=Sum('loan_amount'),
+        total_monthly_payment=Sum('monthly_payment'),
+    ).order_by()
+    for row in totals:
+        profile = profiles[row.pop('customer_id')]
+        for field, value in row.items():
+            setattr(profile, field, value)
+    per_year = Loan.objects.values('customer_id', 'start_date__year').annotate(count=Count('loan_id')).order_by()
+    for row in per_year:
+        profiles[row['customer_id']].loans_per_year[str(row['start_date__year'])] = row['count']
+    CustomerCreditProfile.objects.bulk_create(profiles.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerCreditProfile',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='credit_profile', serialize=False, to='core.customer')),
+                ('loan_count', models.PositiveIntegerField(default=0)),
+                ('total_tenure', models.PositiveIntegerField(default=0)),
+                ('total_emis_paid', models.PositiveIntegerField(default=0)),
+                ('total_loan_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_monthly_payment', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('loans_per_year', models.JSONField(default=dict, help_text='Loan count keyed by start year')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_credit_profiles, migrations.RunPython.noop),
+    ]
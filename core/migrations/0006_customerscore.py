@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerScore',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stored_score', serialize=False, to='core.customer')),
+                ('credit_score', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('scored_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
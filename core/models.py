@@ -4,14 +4,23 @@ Django models for the Credit Approval System.
 Defines:
 - Customer: Stores customer personal and financial information.
 - Loan: Stores loan details and maintains customer debt consistency.
+- CustomerCreditProfile: Per-customer rollup of the loan figures used for credit scoring.
+- CustomerScore: Credit scores precomputed for every customer by score_all_customers.
+- JobState: Bookkeeping for incremental and resumable management commands.
+- IdempotencyKey: Stored responses of requests sent with an Idempotency-Key header.
 
-Includes logic to update customer debt on loan creation and deletion.
+Includes logic to update customer debt and the credit profile on loan creation,
+update and deletion, and to invalidate cached API responses on every change.
 """
 
 from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Greatest
 from decimal import Decimal
 from django.core.exceptions import ValidationError
 
+from .cache import invalidate_customers
+
 class Customer(models.Model):
     """
     Model representing a customer in the credit approval system.
@@ -40,6 +49,150 @@ class Customer(models.Model):
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
+        invalidate_customers([self.customer_id])
+
+    def delete(self, *args, **kwargs):
+        customer_id = self.customer_id
+        result = super().delete(*args, **kwargs)
+        invalidate_customers([customer_id])
+        return result
+
+class CustomerCreditProfile(models.Model):
+    """
+    Denormalized rollup of a customer's loans, kept in step with Loan.save and
+    Loan.delete so that credit scoring reads one row instead of scanning loans.
+    """
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name="credit_profile"
+    )
+    loan_count = models.PositiveIntegerField(default=0)
+    total_tenure = models.PositiveIntegerField(default=0)
+    total_emis_paid = models.PositiveIntegerField(default=0)
+    total_loan_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_monthly_payment = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    loans_per_year = models.JSONField(default=dict, help_text="Loan count keyed by start year")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    ROLLUP_FIELDS = (
+        'loan_count', 'total_tenure', 'total_emis_paid',
+        'total_loan_amount', 'total_monthly_payment', 'loans_per_year',
+    )
+
+    def __str__(self):
+        """
+        String representation of the credit profile.
+        """
+        return f"Credit profile for Customer {self.customer_id}"
+
+    def apply_loan(self, values, sign):
+        """
+        Add (sign=1) or remove (sign=-1) one loan's figures from the rollup.
+        `values` is a loan snapshot as produced by Loan.profile_values().
+        """
+        self.loan_count += sign
+        self.total_tenure += sign * values['tenure']
+        self.total_emis_paid += sign * values['emi_paid_on_time']
+        self.total_loan_amount += sign * values['loan_amount']
+        self.total_monthly_payment += sign * values['monthly_payment']
+        year = str(values['start_date'].year)
+        count = self.loans_per_year.get(year, 0) + sign
+        if count:
+            self.loans_per_year[year] = count
+        else:
+            self.loans_per_year.pop(year, None)
+
+    @classmethod
+    def record_loan_change(cls, old=None, new=None):
+        """
+        Apply a loan insert (new only), update (old and new) or delete (old only)
+        to the affected profiles. Must run inside the transaction that wrote the loan.
+        """
+        changes = {}
+        for values, sign in ((old, -1), (new, 1)):
+            if values:
+                changes.setdefault(values['customer_id'], []).append((values, sign))
+        for customer_id, items in changes.items():
+            profile, created = cls.objects.select_for_update().get_or_create(customer_id=customer_id)
+            if created:
+                # No rollup existed yet: the loan table already reflects this change.
+                profile.rebuild()
+                continue
+            for values, sign in items:
+                profile.apply_loan(values, sign)
+            profile.save()
+
+    @classmethod
+    def compute(cls, customer_ids=None):
+        """
+        Compute the expected rollup for customers straight from the loan table.
+        Returns {customer_id: {field: value}}; customers without loans get zeros.
+        """
+        customers = Customer.objects.all()
+        loans = Loan.objects.all()
+        if customer_ids is not None:
+            customers = customers.filter(customer_id__in=customer_ids)
+            loans = loans.filter(customer_id__in=customer_ids)
+        expected = {
+            customer_id: {
+                'loan_count': 0,
+                'total_tenure': 0,
+                'total_emis_paid': 0,
+                'total_loan_amount': Decimal('0.00'),
+                'total_monthly_payment': Decimal('0.00'),
+                'loans_per_year': {},
+            }
+            for customer_id in customers.values_list('customer_id', flat=True)
+        }
+        totals = loans.values('customer_id').annotate(
+            loan_count=models.Count('loan_id'),
+            total_tenure=models.Sum('tenure'),
+            total_emis_paid=models.Sum('emi_paid_on_time'),
+            total_loan_amount=models.Sum('loan_amount'),
+            total_monthly_payment=models.Sum('monthly_payment'),
+        ).order_by()
+        for row in totals:
+            expected[row.pop('customer_id')].update(row)
+        per_year = loans.values('customer_id', 'start_date__year').annotate(
+            count=models.Count('loan_id')
+        ).order_by()
+        for row in per_year:
+            expected[row['customer_id']]['loans_per_year'][str(row['start_date__year'])] = row['count']
+        return expected
+
+    @classmethod
+    def rebuild_all(cls, customer_ids=None, batch_size=1000):
+        """
+        Recompute and upsert profiles from scratch. Returns the number of rows written.
+        """
+        expected = cls.compute(customer_ids)
+        profiles = [cls(customer_id=customer_id, **values) for customer_id, values in expected.items()]
+        cls.objects.bulk_create(
+            profiles,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['customer'],
+            update_fields=list(cls.ROLLUP_FIELDS) + ['updated_at'],
+        )
+        return len(profiles)
+
+    def rebuild(self):
+        """
+        Recompute this profile from the loan table and save it.
+        """
+        values = self.compute([self.customer_id]).get(self.customer_id, {})
+        for field, value in values.items():
+            setattr(self, field, value)
+        self.save()
+
+    def drift(self, expected):
+        """
+        Return {field: (stored, expected)} for every rollup field that disagrees.
+        """
+        return {
+            field: (getattr(self, field), expected[field])
+            for field in self.ROLLUP_FIELDS
+            if getattr(self, field) != expected[field]
+        }
 
 class Loan(models.Model):
     """
@@ -55,30 +208,80 @@ class Loan(models.Model):
     emi_paid_on_time = models.PositiveIntegerField(default=0)
     start_date = models.DateField()
     end_date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    PROFILE_FIELDS = ('customer_id', 'loan_amount', 'tenure', 'monthly_payment', 'emi_paid_on_time', 'start_date')
+
+    class Meta:
+        indexes = [
+            # Scoring: a customer's loans started within a date range.
+            models.Index(fields=['customer', 'start_date'], name='loan_customer_start_idx'),
+            # Listing: a customer's loans in loan_id order (also keyset pagination).
+            models.Index(fields=['customer', 'loan_id'], name='loan_customer_loan_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remember the loaded credit-profile figures so updates can be applied as deltas.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._profile_snapshot = instance.profile_values()
+        return instance
+
+    def profile_values(self):
+        """
+        Snapshot of the fields CustomerCreditProfile rolls up, or None if any are deferred.
+        """
+        if any(field not in self.__dict__ for field in self.PROFILE_FIELDS):
+            return None
+        return {field: self.__dict__[field] for field in self.PROFILE_FIELDS}
 
     def save(self, *args, **kwargs):
         """
-        On creation, increase the customer's current debt by the loan amount.
-        On update, just save the loan.
+        On creation, atomically increase the customer's current debt by the loan amount.
+        On every save, fold the change into the customer's credit profile.
         """
-        self.full_clean()
+        # A customer instance that was loaded from the database (e.g. from the
+        # request's identity map) does not need its existence re-checked.
+        customer_loaded = Loan.customer.is_cached(self) and not self.customer._state.adding
+        self.full_clean(exclude=['customer'] if customer_loaded else None)
         with transaction.atomic():
             is_new = self._state.adding
+            old = None
+            if not is_new:
+                old = getattr(self, '_profile_snapshot', None)
+                if old is None:
+                    old = Loan.objects.filter(pk=self.pk).values(*self.PROFILE_FIELDS).first()
             super().save(*args, **kwargs)
             if is_new:
+                # Atomic increment: concurrent loans for one customer cannot lose updates.
+                Customer.objects.filter(pk=self.customer_id).update(
+                    current_debt=models.F('current_debt') + self.loan_amount
+                )
                 self.customer.current_debt += self.loan_amount
-                self.customer.save()
+            new = self.profile_values()
+            CustomerCreditProfile.record_loan_change(old=old, new=new)
+            self._profile_snapshot = new
+            invalidate_customers([self.customer_id, old and old['customer_id']])
 
     def delete(self, *args, **kwargs):
         """
-        On deletion, decrease the customer's current debt by the loan amount.
+        On deletion, atomically decrease the customer's current debt by the loan
+        amount (not below zero) and remove the loan from the customer's credit profile.
         """
         with transaction.atomic():
-            self.customer.current_debt -= self.loan_amount
-            if self.customer.current_debt < Decimal('0.0'):
-                self.customer.current_debt = Decimal('0.0')
-            self.customer.save()
-            super().delete(*args, **kwargs)
+            old = getattr(self, '_profile_snapshot', None) or self.profile_values()
+            if old is None:
+                old = Loan.objects.filter(pk=self.pk).values(*self.PROFILE_FIELDS).first()
+            Customer.objects.filter(pk=self.customer_id).update(
+                current_debt=Greatest(models.F('current_debt') - self.loan_amount, Value(Decimal('0.0')))
+            )
+            self.customer.current_debt = max(self.customer.current_debt - self.loan_amount, Decimal('0.0'))
+            result = super().delete(*args, **kwargs)
+            CustomerCreditProfile.record_loan_change(old=old)
+            invalidate_customers([self.customer_id])
+            return result
 
     def clean(self):
         if self.loan_amount <= 0:
@@ -93,3 +296,63 @@ class Loan(models.Model):
         String representation of the loan.
         """
         return f"Loan {self.loan_id} for Customer {self.customer.customer_id}"
+
+class CustomerScore(models.Model):
+    """
+    A customer's credit score as last computed by the score_all_customers
+    job. scored_at is when the loans it was computed from were read, so a
+    credit profile updated later means the score is out of date.
+    """
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name="stored_score"
+    )
+    credit_score = models.DecimalField(max_digits=5, decimal_places=2)
+    scored_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        """
+        String representation of the stored score.
+        """
+        return f"Customer {self.customer_id}: {self.credit_score} ({self.scored_at})"
+
+class JobState(models.Model):
+    """
+    Last successful run and progress checkpoint of a named background job,
+    used by commands that can run incrementally or resume.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    checkpoint = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """
+        String representation of the job state.
+        """
+        return f"{self.name} (last run {self.last_run_at})"
+
+class IdempotencyKey(models.Model):
+    """
+    The response to a request made with an Idempotency-Key header, so a retry
+    with the same key gets the original response instead of being processed
+    again. The row is inserted when processing starts (status_code is None
+    until then) in the same transaction that does the work, so a concurrent
+    duplicate waits on the unique constraint and then sees the finished row.
+    """
+    scope = models.CharField(max_length=50, help_text="Endpoint the key was used on")
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64, help_text="SHA-256 of the request body")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='idempotency_scope_key_unique'),
+        ]
+
+    def __str__(self):
+        """
+        String representation of the idempotency key.
+        """
+        return f"{self.scope} {self.key} ({self.status_code})"
@@ -0,0 +1,19 @@
+"""
+Pagination classes for the Credit Approval System API.
+
+- LoanCursorPagination: keyset pagination on loan_id, so fetching any page
+  costs the same however deep into a customer's loans it is.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class LoanCursorPagination(CursorPagination):
+    """
+    Cursor (keyset) pagination over loans ordered by loan_id.
+    Clients pick the page size with ?page_size= (up to max_page_size).
+    """
+    ordering = 'loan_id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
@@ -0,0 +1,230 @@
+"""
+On-demand request profiling for the Credit Approval System.
+
+ProfilingMiddleware profiles a request when either:
+- it carries an X-Profile-Token header equal to PROFILING_TOKEN, or
+- it is picked by sampling (a PROFILING_SAMPLE_RATE fraction of requests).
+
+A profiled request gets a report with its cProfile statistics and every SQL
+statement it ran (parameters left out), with its duration and the core.* call
+sites that issued it. Reports are JSON files in PROFILING_DIR, kept as a ring
+buffer of the newest PROFILING_MAX_REPORTS; `python manage.py profiles` lists
+and shows them. Header-triggered requests get the report ID back in an
+X-Profile-Id response header.
+
+cProfile only sees the thread it runs on, and under ASGI one thread serves many
+requests at once, so async requests are reported with SQL and timings only
+(and their SQL call sites stop at the sync_to_async boundary).
+With neither setting configured the middleware removes itself.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+TOKEN_HEADER = 'X-Profile-Token'
+ID_HEADER = 'X-Profile-Id'
+MAX_QUERIES = 500
+MAX_CALL_SITES = 3
+PROFILE_LINES = 40
+
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames from these modules are instrumentation, not call sites.
+SKIPPED_FILES = {os.path.join(CORE_DIR, name) for name in ('profiling.py', 'metrics.py', 'middleware.py')}
+
+_current = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """
+    SQL captured for the request being profiled.
+    """
+    __slots__ = ('queries', 'query_count', 'db_time')
+
+    def __init__(self):
+        self.queries = []
+        self.query_count = 0
+        self.db_time = 0.0
+
+
+def call_sites():
+    """
+    The innermost core.* frames (file:line in function) of the current stack.
+    """
+    sites = []
+    frame = sys._getframe(2)
+    while frame is not None and len(sites) < MAX_CALL_SITES:
+        filename = frame.f_code.co_filename
+        if filename.startswith(CORE_DIR) and filename not in SKIPPED_FILES:
+            sites.append(f'core/{os.path.relpath(filename, CORE_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return sites
+
+
+def _capture_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - start
+        profile.query_count += 1
+        profile.db_time += seconds
+        if len(profile.queries) < MAX_QUERIES:
+            profile.queries.append({
+                'sql': sql, 'many': many, 'ms': round(seconds * 1000, 3), 'call_sites': call_sites(),
+            })
+
+
+def install_query_capture(sender, connection, **kwargs):
+    """
+    connection_created receiver (connected in CoreConfig.ready) that records
+    the SQL of the request being profiled on every connection.
+    """
+    if _capture_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_capture_query)
+
+
+def reports_dir():
+    return Path(settings.PROFILING_DIR)
+
+
+def _report_path(report_id):
+    return reports_dir() / f'{report_id}.json'
+
+
+def save_report(report):
+    """
+    Write a report and drop the oldest beyond PROFILING_MAX_REPORTS.
+    """
+    directory = reports_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = _report_path(report['id'])
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(json.dumps(report, indent=1))
+    os.replace(temporary, path)
+    for old in list_report_paths()[settings.PROFILING_MAX_REPORTS:]:
+        old.unlink(missing_ok=True)
+
+
+def list_report_paths():
+    """
+    Report files, newest first. IDs start with a nanosecond timestamp, so
+    name order is age order.
+    """
+    try:
+        return sorted(reports_dir().glob('*.json'), reverse=True)
+    except FileNotFoundError:
+        return []
+
+
+def load_report(report_id):
+    """
+    The report with this ID (or a unique ID prefix), or None.
+    """
+    matches = [path for path in list_report_paths() if path.stem.startswith(report_id)]
+    if len(matches) != 1:
+        return None
+    return json.loads(matches[0].read_text())
+
+
+def _profile_text(profiler):
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    return stream.getvalue()
+
+
+class ProfilingMiddleware:
+    """
+    Profile sampled or token-bearing requests and store their reports.
+    Place it first in MIDDLEWARE so writing the report is not counted in the
+    request metrics.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not (settings.PROFILING_SAMPLE_RATE or settings.PROFILING_TOKEN):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def should_profile(self, request):
+        token = request.headers.get(TOKEN_HEADER)
+        if token is not None and settings.PROFILING_TOKEN:
+            if hmac.compare_digest(token, settings.PROFILING_TOKEN):
+                return 'header'
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = self.should_profile(request)
+        if trigger is None:
+            return self.get_response(request)
+        profile = RequestProfile()
+        profiler = cProfile.Profile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, trigger, start, profile, _profile_text(profiler))
+
+    async def __acall__(self, request):
+        trigger = self.should_profile(request)
+        if trigger is None:
+            return await self.get_response(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, trigger, start, profile, None)
+
+    def finish(self, request, response, trigger, start, profile, profile_text):
+        seconds = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        report = {
+            'id': f'{time.time_ns()}-{os.getpid()}',
+            'time': datetime.now(timezone.utc).isoformat(),
+            'trigger': trigger,
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match is not None else None,
+            'status': response.status_code,
+            'duration_ms': round(seconds * 1000, 3),
+            'query_count': profile.query_count,
+            'db_ms': round(profile.db_time * 1000, 3),
+            'queries': profile.queries,
+            'profile': profile_text,
+        }
+        save_report(report)
+        if trigger == 'header':
+            response[ID_HEADER] = report['id']
+        return response
@@ -0,0 +1,151 @@
+"""
+Bulk EMI repayment posting for the Credit Approval System.
+
+A repayment record says that `emis_paid` more EMIs of loan `loan_id` have been
+paid. Records are applied in chunks, one transaction per chunk, with a few
+set-based UPDATEs per chunk instead of a Loan.save per record:
+- Loan.emi_paid_on_time (and updated_at) for every loan paid in the chunk
+- Customer.current_debt, reduced by EMIs paid x monthly payment, not below zero
+  (the unpaid-EMI definition used by update_customer_debt)
+- CustomerCreditProfile.total_emis_paid, so scoring sees the payments
+
+Each record gets its own result. Records for unknown loans, or that would take
+a loan past its tenure, are rejected without affecting the rest; several
+records for one loan are applied in order.
+
+Used by the repayments endpoint and the post_repayments management command.
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import DecimalField, F, IntegerField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .cache import invalidate_customers
+from .models import Customer, CustomerCreditProfile, Loan
+
+logger = logging.getLogger(__name__)
+
+DEBT_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+def applied(loan_id, emi_paid_on_time, tenure):
+    return {
+        'loan_id': loan_id,
+        'status': 'applied',
+        'emi_paid_on_time': emi_paid_on_time,
+        'repayments_left': tenure - emi_paid_on_time,
+    }
+
+
+def rejected(loan_id, error, status='rejected'):
+    return {'loan_id': loan_id, 'status': status, 'error': error}
+
+
+def _by_key(model, key, values, output_field):
+    """
+    CASE key WHEN k THEN values[k] ... ELSE 0 END, for one UPDATE over many
+    rows. Written as raw SQL because compiling thousands of When() objects
+    costs far more than running the statement.
+    """
+    column = connection.ops.quote_name(model._meta.get_field(key).column)
+    sql = f"CASE {column} {' '.join(['WHEN %s THEN %s'] * len(values))} ELSE 0 END"
+    params = [param for item in values.items() for param in item]
+    return RawSQL(sql, params, output_field=output_field)
+
+
+def apply_repayments(records):
+    """
+    Apply one chunk of (loan_id, emis_paid) records in the current
+    transaction. The loans are locked first, so concurrent postings for the
+    same loan cannot both pass the tenure check. Returns one result per record.
+    """
+    loans = {
+        row['loan_id']: row
+        for row in Loan.objects.select_for_update().filter(
+            loan_id__in={loan_id for loan_id, _ in records}
+        ).order_by('loan_id').values('loan_id', 'customer_id', 'tenure', 'emi_paid_on_time', 'monthly_payment')
+    }
+    paid = {}
+    results = []
+    for loan_id, emis_paid in records:
+        loan = loans.get(loan_id)
+        if loan is None:
+            results.append(rejected(loan_id, "Loan not found."))
+            continue
+        current = paid.get(loan_id, loan['emi_paid_on_time'])
+        left = loan['tenure'] - current
+        if emis_paid > left:
+            results.append(rejected(loan_id, f"Overpayment: {emis_paid} EMIs posted but only {left} left."))
+            continue
+        paid[loan_id] = current + emis_paid
+        results.append(applied(loan_id, paid[loan_id], loan['tenure']))
+
+    loan_emis, customer_emis, customer_debt = {}, {}, {}
+    for loan_id, total in paid.items():
+        loan = loans[loan_id]
+        emis = total - loan['emi_paid_on_time']
+        if not emis:
+            continue
+        customer_id = loan['customer_id']
+        loan_emis[loan_id] = emis
+        customer_emis[customer_id] = customer_emis.get(customer_id, 0) + emis
+        customer_debt[customer_id] = customer_debt.get(customer_id, Decimal('0.00')) + emis * loan['monthly_payment']
+    if not loan_emis:
+        return results
+
+    now = timezone.now()
+    Loan.objects.filter(loan_id__in=loan_emis).update(
+        emi_paid_on_time=F('emi_paid_on_time') + _by_key(Loan, 'loan_id', loan_emis, IntegerField()),
+        updated_at=now,
+    )
+    Customer.objects.filter(customer_id__in=customer_debt).update(
+        current_debt=Greatest(
+            F('current_debt') - _by_key(Customer, 'customer_id', customer_debt, DEBT_FIELD),
+            Value(Decimal('0.00')),
+            output_field=DEBT_FIELD,
+        )
+    )
+    CustomerCreditProfile.objects.filter(customer_id__in=customer_emis).update(
+        total_emis_paid=F('total_emis_paid') + _by_key(CustomerCreditProfile, 'customer', customer_emis, IntegerField()),
+        updated_at=now,
+    )
+    invalidate_customers(customer_debt)
+    return results
+
+
+def post_repayments(records, chunk_size=1000):
+    """
+    Apply (loan_id, emis_paid) records `chunk_size` at a time, each chunk in
+    its own transaction. Returns one result per record, in order. A chunk that
+    fails with a database error is rolled back and its records are reported
+    as failed; the other chunks are still applied.
+    """
+    records = list(records)
+    results = []
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        try:
+            with transaction.atomic():
+                results.extend(apply_repayments(chunk))
+        except DatabaseError as e:
+            logger.error(f"Database error while posting repayments: {e}")
+            results.extend(
+                rejected(loan_id, "Database error while posting repayments.", status='failed')
+                for loan_id, _ in chunk
+            )
+    return results
+
+
+def summarize(results):
+    """
+    Counts of results by status.
+    """
+    counts = {'applied': 0, 'rejected': 0, 'failed': 0}
+    for result in results:
+        counts[result['status']] += 1
+    return counts
@@ -0,0 +1,188 @@
+"""
+Request replay for load-testing the Credit Approval System API.
+
+Traffic is described as JSONL, one request per line, with customers and loans
+referred to by their position in the seeded data rather than by database ID,
+so the same file can be replayed against any freshly seeded database:
+
+    {"endpoint": "check-eligibility", "customer": 12, "loan_amount": 150000, "interest_rate": 11.5, "tenure": 24}
+    {"endpoint": "create-loan", "customer": 3, "loan_amount": 50000, "interest_rate": 14, "tenure": 12}
+    {"endpoint": "view-loan", "loan": 40}
+    {"endpoint": "view-loans", "customer": 3}
+    {"endpoint": "register", "first_name": "Replay", "last_name": "7", "age": 31, "monthly_income": 55000}
+
+generate() produces such traffic from a weighted endpoint mix. send_in_process()
+and send_http() issue one resolved request against the test client or a running
+server, and summarize() turns the timings into per-endpoint statistics. The
+`replay` benchmark in core.benchmarks ties these together.
+"""
+
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+DEFAULT_MIX = {
+    'check-eligibility': 40,
+    'view-loans': 20,
+    'view-loan': 20,
+    'create-loan': 15,
+    'register': 5,
+}
+
+TENURES = [6, 12, 18, 24, 36, 48, 60]
+
+
+def parse_mix(text):
+    """
+    Parse an endpoint mix such as "check-eligibility=60,view-loan=40".
+    """
+    mix = {}
+    for part in text.split(','):
+        endpoint, _, weight = part.partition('=')
+        endpoint = endpoint.strip()
+        if endpoint not in DEFAULT_MIX:
+            raise ValueError(f"Unknown endpoint in mix: {endpoint!r}. Choose from: {', '.join(DEFAULT_MIX)}.")
+        mix[endpoint] = float(weight or 1)
+    return mix
+
+
+def generate(size, mix, seed):
+    """
+    `size` symbolic requests drawn from the weighted endpoint `mix`.
+    Customer and loan positions are left unbounded; resolve() wraps them.
+    """
+    rng = random.Random(seed)
+    endpoints = rng.choices(list(mix), weights=list(mix.values()), k=size)
+    requests = []
+    for i, endpoint in enumerate(endpoints):
+        if endpoint in ('check-eligibility', 'create-loan'):
+            requests.append({
+                'endpoint': endpoint,
+                'customer': rng.randrange(1_000_000),
+                'loan_amount': rng.randrange(10, 500) * 1000,
+                'interest_rate': rng.randrange(32, 72) / 4,
+                'tenure': rng.choice(TENURES),
+            })
+        elif endpoint == 'view-loans':
+            requests.append({'endpoint': endpoint, 'customer': rng.randrange(1_000_000)})
+        elif endpoint == 'view-loan':
+            requests.append({'endpoint': endpoint, 'loan': rng.randrange(1_000_000)})
+        else:
+            requests.append({
+                'endpoint': endpoint, 'first_name': 'Replay', 'last_name': str(i),
+                'age': rng.randrange(21, 65), 'monthly_income': rng.randrange(20, 200) * 1000,
+            })
+    return requests
+
+
+def read_requests(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_requests(path, requests):
+    with open(path, 'w') as f:
+        for request in requests:
+            f.write(json.dumps(request) + '\n')
+
+
+def resolve(index, request, customer_ids, loan_ids, phone_prefix):
+    """
+    Turn symbolic request number `index` into (endpoint, method, path, body)
+    against the seeded customer and loan IDs.
+    """
+    endpoint = request['endpoint']
+    if endpoint in ('check-eligibility', 'create-loan'):
+        body = {key: request[key] for key in ('loan_amount', 'interest_rate', 'tenure')}
+        body['customer_id'] = customer_ids[request['customer'] % len(customer_ids)]
+        return endpoint, 'POST', f'/{endpoint}', body
+    if endpoint == 'view-loans':
+        return endpoint, 'GET', f"/view-loans/{customer_ids[request['customer'] % len(customer_ids)]}/", None
+    if endpoint == 'view-loan':
+        return endpoint, 'GET', f"/view-loan/{loan_ids[request['loan'] % len(loan_ids)]}/", None
+    if endpoint == 'register':
+        body = {key: request[key] for key in ('first_name', 'last_name', 'age', 'monthly_income')}
+        body['phone_number'] = f'{phone_prefix}{index:09d}'
+        return endpoint, 'POST', '/register', body
+    raise ValueError(f"Unknown endpoint: {endpoint!r}")
+
+
+def send_in_process(client, resolved):
+    """
+    Issue a resolved request through the Django test client.
+    Returns (status code, seconds, queries).
+    """
+    _, method, path, body = resolved
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        if method == 'POST':
+            response = client.post(path, data=json.dumps(body), content_type='application/json')
+        else:
+            response = client.get(path)
+        seconds = time.perf_counter() - start
+    return response.status_code, seconds, len(queries)
+
+
+def send_http(base_url, resolved, timeout=30):
+    """
+    Issue a resolved request to a running server at `base_url`. Query counts
+    are not visible from outside, so None is returned for them. Connection
+    failures are reported as status 0.
+    """
+    _, method, path, body = resolved
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(
+        base_url.rstrip('/') + path, data=data, method=method, headers={'Content-Type': 'application/json'}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - start, None
+
+
+def latency_summary(seconds):
+    milliseconds = np.array(seconds) * 1000
+    return {
+        'mean_ms': float(milliseconds.mean()),
+        'p50_ms': float(np.percentile(milliseconds, 50)),
+        'p95_ms': float(np.percentile(milliseconds, 95)),
+        'p99_ms': float(np.percentile(milliseconds, 99)),
+    }
+
+
+def summarize(results, elapsed):
+    """
+    Per-endpoint and overall statistics from [(endpoint, status, seconds,
+    queries)] collected over `elapsed` wall-clock seconds.
+    """
+    groups = {'all': results}
+    for result in results:
+        groups.setdefault(result[0], []).append(result)
+    summary = {}
+    for name, rows in groups.items():
+        statuses = {}
+        for _, status, _, _ in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        queries = [count for _, _, _, count in rows if count is not None]
+        summary[name] = {
+            'requests': len(rows),
+            'throughput_rps': len(rows) / elapsed if elapsed else None,
+            'errors': sum(1 for _, status, _, _ in rows if status == 0 or status >= 500),
+            'statuses': statuses,
+            **latency_summary([seconds for _, _, seconds, _ in rows]),
+            'queries_per_request': sum(queries) / len(queries) if queries else None,
+        }
+    return summary
@@ -0,0 +1,99 @@
+"""
+Vectorized credit scoring for the Credit Approval System.
+
+Applies the same rules as core.utils.eligibility_from_stats to many
+applications at once using NumPy arrays:
+- Credit score from the customer's loan stats (or a fresh stored score)
+- Slab-based interest rate correction
+- EMI calculation
+- The 50%-of-income EMI test
+
+Float arithmetic decides every application it can settle. Applications too
+close to a decision threshold for float error to rule out the other side (a
+credit score near 10, 30 or 50, total EMIs near half the monthly income) or
+whose EMI cannot be computed are flagged unsettled, and the caller decides
+them with eligibility_from_stats.
+"""
+
+import numpy as np
+
+from .emi import emis
+
+W1, W2, W3, W4 = 0.4, 0.2, 0.15, 0.25
+
+SCORE_THRESHOLDS = (10.0, 30.0, 50.0)
+# Live scores are rounded to 0.01, so within half a cent of a threshold the
+# rounding decides the slab; float error is many orders of magnitude smaller.
+SCORE_MARGIN = 0.01
+# Relative float error allowed in the EMI test before it is left to Decimal.
+EMI_TOLERANCE = 1e-9
+
+
+def credit_scores(loan_count, total_tenure, total_emis_paid, total_loan_amount, current_year_loans):
+    """
+    Unrounded float credit scores for arrays of loan stats, as
+    core.utils.calculate_credit_score computes them before rounding.
+    """
+    loan_count = np.asarray(loan_count, dtype=np.float64)
+    total_tenure = np.asarray(total_tenure, dtype=np.float64)
+    P = np.where(loan_count > 0, np.asarray(total_emis_paid, dtype=np.float64) / np.where(total_tenure == 0, 1, total_tenure), 0.0)
+    N_norm = np.exp(-0.1 * loan_count)
+    A_norm = np.exp(-0.2 * np.asarray(current_year_loans, dtype=np.float64))
+    V_norm = 1.0 / (1.0 + 0.00001 * np.asarray(total_loan_amount, dtype=np.float64))
+    return 100.0 * (W1 * P + W2 * N_norm + W3 * A_norm + W4 * V_norm)
+
+
+def score_applications(stats, loan_amount, interest_rate, tenure):
+    """
+    Score a batch of applications.
+
+    Args:
+        stats (dict[str, array]): Per-application customer figures: current_debt,
+            approved_limit, monthly_income, stored_score (NaN where there is no
+            fresh stored score) and the get_loan_stats() keys.
+        loan_amount, interest_rate, tenure (array): Requested loan terms.
+
+    Returns:
+        dict[str, ndarray]: approval, corrected_interest_rate,
+        monthly_installment and unsettled, one entry per application. Entries
+        of unsettled applications are not meaningful.
+    """
+    interest_rate = np.asarray(interest_rate, dtype=np.float64)
+    stored_score = np.asarray(stats['stored_score'], dtype=np.float64)
+    live_score = credit_scores(
+        stats['loan_count'], stats['total_tenure'], stats['total_emis_paid'],
+        stats['total_loan_amount'], stats['current_year_loans'],
+    )
+    has_stored = ~np.isnan(stored_score)
+    score = np.where(has_stored, stored_score, live_score)
+    # Stored scores are already rounded; only live ones can fall either side.
+    unsettled = np.zeros(score.shape, dtype=bool)
+    for threshold in SCORE_THRESHOLDS:
+        unsettled |= ~has_stored & (np.abs(live_score - threshold) <= SCORE_MARGIN)
+
+    # Over-limit customers score 0.
+    over_limit = np.asarray(stats['current_debt'], dtype=np.float64) > np.asarray(stats['approved_limit'], dtype=np.float64)
+    score = np.where(over_limit, 0.0, score)
+    unsettled &= ~over_limit
+
+    approval = score > 10
+    slab_12 = (score > 30) & (score <= 50) & (interest_rate <= 12)
+    slab_16 = (score > 10) & (score <= 30) & (interest_rate <= 16)
+    corrected_rate = np.where(slab_12, 12.0, np.where(slab_16, 16.0, interest_rate))
+
+    monthly_installment = emis(loan_amount, corrected_rate, tenure)
+    unsettled |= np.isnan(monthly_installment)
+    current_emis = np.asarray(stats['total_monthly_payment'], dtype=np.float64)
+    emi_threshold = np.asarray(stats['monthly_income'], dtype=np.float64) * 0.5
+    with np.errstate(invalid='ignore'):
+        margin = emi_threshold - current_emis - monthly_installment
+        tolerance = EMI_TOLERANCE * (np.abs(emi_threshold) + np.abs(current_emis) + np.abs(monthly_installment))
+        unsettled |= approval & ~(np.abs(margin) > tolerance)
+        approval = approval & (margin >= 0)
+
+    return {
+        'approval': approval,
+        'corrected_interest_rate': corrected_rate,
+        'monthly_installment': monthly_installment,
+        'unsettled': unsettled,
+    }
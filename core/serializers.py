@@ -4,15 +4,23 @@ Serializers for the Credit Approval System API.
 This module defines serializers for:
 - Customer registration and detail
 - Loan detail and creation
-- Eligibility checks
+- Eligibility checks and loan offers
 - Listing loans for a customer
+- Posting EMI repayments in bulk
+- Loan book export filters
+- Fast-path read serializers that build loan responses from .values() rows
 
 Serializers handle validation and transformation between model instances and JSON representations.
 """
 
 # core/serializers.py
 
+import decimal
+from abc import ABC, abstractmethod
+
+from django.db.models import F
 from rest_framework import serializers
+from .loaders import get_customer_loader
 from .models import Customer, Loan
 
 # Serializer for registering a new customer
@@ -38,7 +46,7 @@ class CustomerRegisterSerializer(serializers.ModelSerializer):
         }
 
 # Serializer for checking customer eligibility for a loan
-class CheckEligibilityRequestSerializer(serializers.Serializer):
+class CheckEligibilityItemSerializer(serializers.Serializer):
     customer_id = serializers.IntegerField(
         min_value=1,
         error_messages={
@@ -72,11 +80,26 @@ class CheckEligibilityRequestSerializer(serializers.Serializer):
         }
     )
 
+class CheckEligibilityRequestSerializer(CheckEligibilityItemSerializer):
     def validate_customer_id(self, value):
-        if not Customer.objects.filter(customer_id=value).exists():
+        if get_customer_loader().get(value) is None:
             raise serializers.ValidationError("Customer with this ID does not exist.")
         return value
 
+# Serializer for checking many applications at once; customer existence is
+# resolved in bulk by the view rather than per item.
+class CheckEligibilityBatchRequestSerializer(serializers.Serializer):
+    applications = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=10000,
+        error_messages={
+            "required": "Applications are required.",
+            "empty": "Applications must not be empty.",
+            "max_length": "At most {max_length} applications can be checked per request."
+        }
+    )
+
 class CheckEligibilityResponseSerializer(serializers.Serializer):
     customer_id = serializers.IntegerField()
     approval = serializers.BooleanField()
@@ -85,6 +108,34 @@ class CheckEligibilityResponseSerializer(serializers.Serializer):
     tenure = serializers.IntegerField()
     monthly_installment = serializers.FloatField()
 
+# Serializer for the loan offers query string (?interest_rate=...&tenure=...)
+class LoanOffersRequestSerializer(serializers.Serializer):
+    # The largest rate a Loan can store (max_digits=5, decimal_places=2).
+    interest_rate = serializers.FloatField(
+        min_value=0.0,
+        max_value=999.99,
+        error_messages={
+            "min_value": "Interest rate cannot be negative.",
+            "max_value": "Interest rate must be at most {max_value}.",
+            "required": "Interest rate is required.",
+            "invalid": "Interest rate must be a valid number."
+        }
+    )
+    tenure = serializers.ListField(
+        child=serializers.IntegerField(
+            min_value=1,
+            max_value=600,
+            error_messages={
+                "min_value": "Tenure must be at least 1 month.",
+                "max_value": "Tenure must be at most 600 months.",
+                "invalid": "Tenure must be an integer."
+            }
+        ),
+        required=False,
+        max_length=24,
+        error_messages={"max_length": "At most {max_length} tenures can be requested."}
+    )
+
 # Serializer for viewing loan details    
 class CustomerBriefSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(source='customer_id')
@@ -177,7 +228,7 @@ class CreateLoanRequestSerializer(serializers.Serializer):
     )
 
     def validate_customer_id(self, value):
-        if not Customer.objects.filter(customer_id=value).exists():
+        if get_customer_loader().get(value) is None:
             raise serializers.ValidationError("Customer with this ID does not exist.")
         return value
 
@@ -186,4 +237,140 @@ class CreateLoanResponseSerializer(serializers.Serializer):
     customer_id = serializers.IntegerField()
     loan_approved = serializers.BooleanField()
     message = serializers.CharField()
-    monthly_installment = serializers.FloatField()
\ No newline at end of file
+    monthly_installment = serializers.FloatField()
+
+# Serializers for posting EMI repayments in bulk; loan existence and tenure
+# are checked per record by core.repayments.
+class RepaymentItemSerializer(serializers.Serializer):
+    loan_id = serializers.IntegerField(
+        min_value=1,
+        error_messages={
+            "min_value": "Loan ID must be a positive integer.",
+            "required": "Loan ID is required.",
+            "invalid": "Loan ID must be an integer."
+        }
+    )
+    emis_paid = serializers.IntegerField(
+        min_value=1,
+        error_messages={
+            "min_value": "EMIs paid must be at least 1.",
+            "required": "EMIs paid is required.",
+            "invalid": "EMIs paid must be an integer."
+        }
+    )
+
+class RepaymentBatchRequestSerializer(serializers.Serializer):
+    repayments = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=10000,
+        error_messages={
+            "required": "Repayments are required.",
+            "empty": "Repayments must not be empty.",
+            "max_length": "At most {max_length} repayments can be posted per request."
+        }
+    )
+
+# Serializer for the loan book export filters (query string or command options)
+class LoanBookExportRequestSerializer(serializers.Serializer):
+    customer_from = serializers.IntegerField(required=False, min_value=1)
+    customer_to = serializers.IntegerField(required=False, min_value=1)
+    start_from = serializers.DateField(required=False)
+    start_to = serializers.DateField(required=False)
+
+    def validate(self, data):
+        for low, high in (('customer_from', 'customer_to'), ('start_from', 'start_to')):
+            if low in data and high in data and data[low] > data[high]:
+                raise serializers.ValidationError({high: f"Must not be before {low}."})
+        return data
+
+# Fast-path read serializers.
+#
+# These produce exactly the same JSON as LoanDetailSerializer and
+# CustomerLoanListSerializer, but from dicts returned by .values() instead of
+# model instances and DRF field objects, which dominates CPU on read endpoints.
+
+CENT = decimal.Decimal('0.01')
+MONEY_CONTEXT = decimal.Context(prec=12)
+RATE_CONTEXT = decimal.Context(prec=5)
+
+
+def decimal_string(value, context=MONEY_CONTEXT):
+    """
+    Format a Decimal the way serializers.DecimalField(decimal_places=2) does.
+    """
+    return f'{value.quantize(CENT, context=context):f}'
+
+
+class ValuesSerializer(ABC):
+    """
+    Base class for fast-path serializers: `project` turns a queryset into the
+    .values() rows a subclass's `to_representation` expects.
+    """
+    annotations = {}
+    fields = ()
+
+    @classmethod
+    def project(cls, queryset):
+        if cls.annotations:
+            queryset = queryset.annotate(**cls.annotations)
+        return queryset.values(*cls.fields)
+
+    @staticmethod
+    @abstractmethod
+    def to_representation(row):
+        """
+        The response dict for one row from `project`.
+        """
+
+    @classmethod
+    def many(cls, rows):
+        to_representation = cls.to_representation
+        return [to_representation(row) for row in rows]
+
+
+class LoanDetailValuesSerializer(ValuesSerializer):
+    """
+    .values() equivalent of LoanDetailSerializer.
+    """
+    fields = (
+        'loan_id', 'loan_amount', 'interest_rate', 'monthly_payment', 'tenure',
+        'customer_id', 'customer__first_name', 'customer__last_name',
+        'customer__phone_number', 'customer__age',
+    )
+
+    @staticmethod
+    def to_representation(row):
+        return {
+            'loan_id': row['loan_id'],
+            'customer': {
+                'id': row['customer_id'],
+                'first_name': row['customer__first_name'],
+                'last_name': row['customer__last_name'],
+                'phone_number': row['customer__phone_number'],
+                'age': row['customer__age'],
+            },
+            'loan_amount': decimal_string(row['loan_amount']),
+            'interest_rate': decimal_string(row['interest_rate'], RATE_CONTEXT),
+            'monthly_installment': decimal_string(row['monthly_payment']),
+            'tenure': row['tenure'],
+        }
+
+
+class CustomerLoanListValuesSerializer(ValuesSerializer):
+    """
+    .values() equivalent of CustomerLoanListSerializer; repayments_left is
+    computed in SQL.
+    """
+    annotations = {'repayments_left': F('tenure') - F('emi_paid_on_time')}
+    fields = ('loan_id', 'loan_amount', 'interest_rate', 'monthly_payment', 'repayments_left')
+
+    @staticmethod
+    def to_representation(row):
+        return {
+            'loan_id': row['loan_id'],
+            'loan_amount': decimal_string(row['loan_amount']),
+            'interest_rate': decimal_string(row['interest_rate'], RATE_CONTEXT),
+            'monthly_installment': decimal_string(row['monthly_payment']),
+            'repayments_left': row['repayments_left'],
+        }
@@ -0,0 +1,722 @@
+import io
+import json
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import idempotency
+from .emi import annuity_terms, emis, max_principals, warm_annuity_cache
+from .ingestion import ingest_partition, split_partitions
+from .models import Customer, CustomerCreditProfile, CustomerScore, IdempotencyKey, Loan
+from .prescoring import score_range
+from .repayments import apply_repayments
+from .scoring import score_applications
+from .utils import calculate_emi, credit_decision, get_loan_stats, stored_credit_score
+
+
+def make_customer(phone_number='9000000001', monthly_income='50000.00', approved_limit='1800000.00', **fields):
+    return Customer.objects.create(
+        first_name='Asha', last_name='Rao', age=30, phone_number=phone_number,
+        monthly_income=Decimal(monthly_income), approved_limit=Decimal(approved_limit), **fields
+    )
+
+
+def make_loan(customer, loan_amount='100000.00', interest_rate='10.00', tenure=12, monthly_payment='8791.59',
+              emi_paid_on_time=6, start_date=None):
+    start_date = start_date or date(date.today().year, 1, 15)
+    return Loan.objects.create(
+        customer=customer, loan_amount=Decimal(loan_amount), interest_rate=Decimal(interest_rate),
+        tenure=tenure, monthly_payment=Decimal(monthly_payment), emi_paid_on_time=emi_paid_on_time,
+        start_date=start_date, end_date=date(start_date.year + 1, start_date.month, start_date.day),
+    )
+
+
+class LoanStatsQueryTests(TestCase):
+    """
+    Loan stats for scoring cost one query: the credit profile row, or one
+    aggregate over the loans for customers without a profile.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_customer()
+        make_loan(cls.customer)
+        make_loan(cls.customer, loan_amount='50000.00', tenure=24, monthly_payment='2307.25', emi_paid_on_time=20,
+                  start_date=date(2020, 3, 1))
+
+    def expected_stats(self):
+        return {
+            'loan_count': 2,
+            'total_tenure': 36,
+            'total_emis_paid': 26,
+            'total_loan_amount': Decimal('150000.00'),
+            'total_monthly_payment': Decimal('11098.84'),
+            'current_year_loans': 1,
+        }
+
+    def test_from_credit_profile(self):
+        customer = Customer.objects.get(pk=self.customer.pk)
+        with self.assertNumQueries(1):
+            stats = get_loan_stats(customer)
+        self.assertEqual(stats, self.expected_stats())
+
+    def test_from_aggregate_without_profile(self):
+        CustomerCreditProfile.objects.filter(customer=self.customer).delete()
+        customer = Customer.objects.select_related('credit_profile').get(pk=self.customer.pk)
+        with self.assertNumQueries(1):
+            stats = get_loan_stats(customer)
+        self.assertEqual(stats, self.expected_stats())
+
+
+
+class CreditProfileRollupTests(TestCase):
+    """
+    Loan.save and Loan.delete keep every CustomerCreditProfile equal to what
+    CustomerCreditProfile.compute() derives from the loan table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = make_customer()
+        cls.second = make_customer(phone_number='9000000002')
+
+    def assert_profiles_match(self):
+        expected = CustomerCreditProfile.compute()
+        for customer_id, values in expected.items():
+            profile = CustomerCreditProfile.objects.filter(customer_id=customer_id).first()
+            if profile is None:
+                self.assertEqual(values['loan_count'], 0)
+                continue
+            self.assertEqual(profile.drift(values), {}, customer_id)
+
+    def test_insert(self):
+        make_loan(self.first)
+        make_loan(self.first, loan_amount='2500.50', tenure=6, monthly_payment='430.10', emi_paid_on_time=2,
+                  start_date=date(2021, 6, 1))
+        self.assert_profiles_match()
+        self.assertEqual(CustomerCreditProfile.objects.get(customer=self.first).loan_count, 2)
+
+    def test_update(self):
+        loan = make_loan(self.first)
+        loan = Loan.objects.get(pk=loan.pk)
+        loan.emi_paid_on_time = 11
+        loan.loan_amount = Decimal('120000.00')
+        loan.monthly_payment = Decimal('10500.00')
+        loan.start_date = date(2019, 2, 1)
+        loan.save()
+        self.assert_profiles_match()
+
+    def test_delete(self):
+        make_loan(self.first)
+        loan = make_loan(self.first, start_date=date(2022, 3, 1))
+        Loan.objects.get(pk=loan.pk).delete()
+        self.assert_profiles_match()
+        self.assertEqual(CustomerCreditProfile.objects.get(customer=self.first).loans_per_year, {str(date.today().year): 1})
+
+    def test_loan_moved_to_another_customer(self):
+        make_loan(self.second)
+        loan = Loan.objects.get(pk=make_loan(self.first).pk)
+        loan.customer = self.second
+        loan.save()
+        self.assert_profiles_match()
+        self.assertEqual(CustomerCreditProfile.objects.get(customer=self.first).loan_count, 0)
+        self.assertEqual(CustomerCreditProfile.objects.get(customer=self.second).loan_count, 2)
+
+    def test_check_reports_drift(self):
+        make_loan(self.first)
+        call_command('rebuild_credit_profiles', '--check', stdout=io.StringIO())
+        CustomerCreditProfile.objects.filter(customer=self.first).update(loan_count=5)
+        with self.assertRaises(CommandError) as raised:
+            call_command('rebuild_credit_profiles', '--check', stdout=io.StringIO())
+        # manage.py exits with the error's return code.
+        self.assertEqual(raised.exception.returncode, 1)
+        call_command('rebuild_credit_profiles', stdout=io.StringIO())
+        call_command('rebuild_credit_profiles', '--check', stdout=io.StringIO())
+
+
+class CheckEligibilityQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_customer()
+        make_loan(cls.customer)
+
+    def test_single_customer_query(self):
+        body = {'customer_id': self.customer.customer_id, 'loan_amount': 100000, 'interest_rate': 14, 'tenure': 12}
+        # The customer row, joined with its credit profile and stored score.
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('check-customer-eligibility'), body, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['customer_id'], self.customer.customer_id)
+
+
+
+class EndpointQueryTests(TestCase):
+    """
+    Each request fetches its customer row at most once (the request's
+    CustomerLoader), and the endpoints' query counts stay fixed.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_customer()
+        cls.loan = make_loan(cls.customer)
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_customer_selected_once(self, queries):
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT') and 'FROM "core_customer"' in query['sql']]
+        self.assertEqual(len(selects), 1, selects)
+
+    def test_check_eligibility(self):
+        body = {'customer_id': self.customer.customer_id, 'loan_amount': 100000, 'interest_rate': 14, 'tenure': 12}
+        with self.assertNumQueries(1) as queries:
+            response = self.client.post(reverse('check-customer-eligibility'), body, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_customer_selected_once(queries)
+
+    def test_create_loan(self):
+        body = {'customer_id': self.customer.customer_id, 'loan_amount': 100000, 'interest_rate': 14, 'tenure': 12}
+        # The customer, its profile once locked, the loan insert, the debt update, the
+        # profile read and update, and a savepoint and release for each nested atomic block.
+        with self.assertNumQueries(12) as queries:
+            response = self.client.post(reverse('create-loan'), body, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['loan_approved'])
+        self.assert_customer_selected_once(queries)
+
+    def test_view_loan(self):
+        # The loan joined with its customer.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('view-loan', args=[self.loan.loan_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['customer']['id'], self.customer.customer_id)
+
+    def test_view_loans(self):
+        with self.assertNumQueries(2) as queries:
+            response = self.client.get(reverse('view-loans-by-customer', args=[self.customer.customer_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['loan_id'] for row in response.json()], [self.loan.loan_id])
+        self.assert_customer_selected_once(queries)
+
+
+class BatchEligibilityParityTests(TestCase):
+    """
+    Every batch result must equal the single check-eligibility response (or
+    its error body) for the same application.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # Scores about 97, so requested rates are never corrected.
+        cls.customer = make_customer(monthly_income='38657.42', approved_limit='1400000.00')
+        make_loan(cls.customer, loan_amount='5000.00', tenure=12, monthly_payment='594.49', emi_paid_on_time=12,
+                  start_date=date(2020, 1, 15))
+        cls.rich = make_customer(phone_number='9000000002', monthly_income='5000000.00', approved_limit='180000000.00')
+
+    def assert_parity(self, *applications):
+        batch = self.client.post(
+            reverse('check-eligibility-batch'), {'applications': list(applications)}, content_type='application/json'
+        )
+        self.assertEqual(batch.status_code, 200)
+        for application, result in zip(applications, batch.json()['results']):
+            single = self.client.post(reverse('check-customer-eligibility'), application, content_type='application/json')
+            self.assertEqual(result, single.json(), application)
+        return batch.json()['results']
+
+    def application(self, customer, loan_amount, interest_rate, tenure):
+        return {'customer_id': customer.customer_id, 'loan_amount': loan_amount, 'interest_rate': interest_rate,
+                'tenure': tenure}
+
+    def test_emi_cap_compared_exactly(self):
+        # 594.49 + 18734.22 is exactly half of 38657.42, which is within the cap.
+        result, = self.assert_parity(self.application(self.customer, 18734.22, 0, 1))
+        self.assertTrue(result['approval'])
+        self.assertEqual(result['monthly_installment'], 18734.22)
+
+    def test_zero_rate_installment(self):
+        result, = self.assert_parity(self.application(self.customer, 10000, 0, 3))
+        self.assertEqual(result['monthly_installment'], float(Decimal(10000) / 3))
+
+    def test_half_paisa_tie_rounds_half_even(self):
+        # 1250111.50 x 1.01 = 1262612.615 exactly.
+        result, = self.assert_parity(self.application(self.rich, 1250111.50, 12, 1))
+        self.assertEqual(result['monthly_installment'], 1262612.62)
+
+    def test_stored_score_is_used(self):
+        CustomerScore.objects.create(customer=self.customer, credit_score=Decimal('20.00'), scored_at=timezone.now())
+        result, = self.assert_parity(self.application(self.customer, 1000, 10, 12))
+        self.assertEqual(result['corrected_interest_rate'], 16.0)
+
+    def test_out_of_range_terms(self):
+        self.assert_parity(
+            self.application(self.customer, 1e300, 10, 12),
+            self.application(self.customer, 100000, 1e300, 12),
+            self.application(self.customer, 100000, 1e300, 5000),
+        )
+
+    def test_random_applications(self):
+        rng = random.Random(3)
+        customers = [self.customer, self.rich]
+        for number in range(6):
+            customer = make_customer(phone_number=f'90000001{number:02d}', monthly_income=f'{rng.randint(10, 200)}000.00')
+            for _ in range(rng.randint(0, 4)):
+                tenure = rng.choice((6, 12, 24))
+                make_loan(customer, loan_amount=f'{rng.randint(1, 500)}000.00', interest_rate='12.00', tenure=tenure,
+                          monthly_payment=f'{rng.randint(100, 20000)}.00', emi_paid_on_time=rng.randint(0, tenure))
+            customers.append(customer)
+        self.assert_parity(*(
+            self.application(rng.choice(customers), round(rng.uniform(1000, 2000000), 2),
+                             rng.choice((0, 8.5, 11.99, 12, 14, 16, 21.75)), rng.choice((1, 6, 12, 36, 60)))
+            for _ in range(60)
+        ))
+
+
+class ScoreApplicationsTests(SimpleTestCase):
+    """
+    core.scoring.score_applications must leave applications near a decision
+    threshold to the Decimal path.
+    """
+
+    def stats(self, **overrides):
+        stats = {
+            'current_debt': [0.0], 'approved_limit': [100000.0], 'monthly_income': [50000.0],
+            'stored_score': [np.nan], 'loan_count': [0], 'total_tenure': [0], 'total_emis_paid': [0],
+            'total_loan_amount': [0.0], 'current_year_loans': [0], 'total_monthly_payment': [0.0],
+        }
+        stats.update(overrides)
+        return stats
+
+    def test_settled_application(self):
+        scored = score_applications(self.stats(), [100000], [10], [12])
+        self.assertFalse(scored['unsettled'][0])
+        self.assertTrue(scored['approval'][0])
+        self.assertEqual(scored['monthly_installment'][0], float(calculate_emi(Decimal(100000), Decimal(10), 12)))
+
+    def test_live_score_near_threshold_is_unsettled(self):
+        # 100 * (0.2 * exp(-0.1) + 0.15 * exp(-0.2) + 0.25 / (1 + 0.00001 * V)) = 30.004
+        target = (30.004 - 100 * (0.2 * np.exp(-0.1) + 0.15 * np.exp(-0.2))) / 25
+        stats = self.stats(loan_count=[1], total_tenure=[12], current_year_loans=[1],
+                           total_loan_amount=[(1 / target - 1) / 0.00001])
+        self.assertTrue(score_applications(stats, [1000], [10], [12])['unsettled'][0])
+
+    def test_stored_score_on_threshold_is_settled(self):
+        scored = score_applications(self.stats(stored_score=[30.0]), [1000], [10], [12])
+        self.assertFalse(scored['unsettled'][0])
+        self.assertEqual(scored['corrected_interest_rate'][0], 16.0)
+
+    def test_emi_cap_tie_is_unsettled(self):
+        scored = score_applications(self.stats(monthly_income=[2 * 1000 / 3]), [1000], [0], [3])
+        self.assertTrue(scored['unsettled'][0])
+
+
+class EmiEngineTests(SimpleTestCase):
+    """
+    core.emi.emis must equal float(calculate_emi(...)) for the same terms.
+    """
+
+    def assert_matches_calculate_emi(self, amounts, rates, tenures):
+        expected = [
+            float(calculate_emi(Decimal(str(amount)), Decimal(str(rate)), tenure))
+            for amount, rate, tenure in zip(amounts, rates, tenures)
+        ]
+        self.assertEqual(emis(amounts, rates, tenures).tolist(), expected)
+
+    def test_half_paisa_ties_round_half_even(self):
+        # At 12% for one month the EMI is amount x 1.01: 1262612.615 and 1262613.625.
+        self.assertEqual(emis([1250111.50, 1250112.50], [12, 12], [1, 1]).tolist(), [1262612.62, 1262613.62])
+        self.assert_matches_calculate_emi([1250111.50, 1250112.50, 50.50, 150.50], [12] * 4, [1] * 4)
+
+    def test_zero_rate_is_split_unrounded(self):
+        self.assertEqual(float(emis(10000, 0, 3)), float(Decimal(10000) / Decimal(3)))
+        self.assert_matches_calculate_emi([10000, 18734.22, 1.01], [0, 0, 0], [3, 1, 7])
+
+    def test_random_terms(self):
+        rng = random.Random(4)
+        size = 5000
+        amounts = [rng.randrange(100, 10**9) / 100 for _ in range(size)]
+        rates = [rng.choice([0, 0.01, 6.25, 10.5, 12, 16, rng.randrange(0, 4000) / 100]) for _ in range(size)]
+        tenures = [rng.randrange(1, 601) for _ in range(size)]
+        self.assert_matches_calculate_emi(amounts, rates, tenures)
+
+    def test_uncomputable_terms_are_nan(self):
+        self.assertTrue(np.isnan(emis([1e300, 100000], [10, 1e300], [12, 5000])).all())
+
+    def test_annuity_cache_keys_rates_exactly(self):
+        annuity_terms.cache_clear()
+        self.addCleanup(warm_annuity_cache)
+        rates = [Decimal('12'), Decimal('12.00'), Decimal('12.0'), Decimal('10.125'), Decimal('10.13')]
+        cached = [calculate_emi(Decimal('250000.00'), rate, 36) for rate in rates]
+        with mock.patch('core.emi.annuity_terms', annuity_terms.__wrapped__):
+            uncached = [calculate_emi(Decimal('250000.00'), rate, 36) for rate in rates]
+        self.assertEqual(cached, uncached)
+        # Equal rates share an entry; a rate with three decimals keeps its own EMI.
+        self.assertEqual(annuity_terms.cache_info().currsize, 3)
+        self.assertNotEqual(cached[3], cached[4])
+
+
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_customer()
+        cls.loan = make_loan(cls.customer)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_miss_is_stored(self):
+        url = reverse('view-loan', args=[self.loan.loan_id])
+        with self.assertNumQueries(1):
+            first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_loan_save_invalidates(self):
+        detail = reverse('view-loan', args=[self.loan.loan_id])
+        listing = reverse('view-loans-by-customer', args=[self.customer.customer_id])
+        self.client.get(detail)
+        self.assertEqual(self.client.get(listing).json()[0]['repayments_left'], 6)
+
+        loan = Loan.objects.get(pk=self.loan.pk)
+        loan.emi_paid_on_time = 8
+        loan.monthly_payment = Decimal('9000.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            loan.save()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(detail).json()['monthly_installment'], '9000.00')
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(listing).json()[0]['repayments_left'], 4)
+        with self.assertNumQueries(0):
+            self.client.get(detail)
+            self.client.get(listing)
+
+
+class AsyncCheckEligibilityTests(TestCase):
+    """
+    The async check-eligibility view answers exactly like the sync one,
+    errors included.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_customer()
+        make_loan(cls.customer)
+
+    async def assert_same_response(self, body):
+        sync = await sync_to_async(self.client.post)(
+            reverse('check-customer-eligibility'), body, content_type='application/json'
+        )
+        response = await self.async_client.post(reverse('async-check-eligibility'), body, content_type='application/json')
+        self.assertEqual((response.status_code, response.json()), (sync.status_code, sync.json()), body)
+        return response
+
+    async def test_same_responses(self):
+        customer_id = self.customer.customer_id
+        application = {'customer_id': customer_id, 'loan_amount': 100000, 'interest_rate': 14, 'tenure': 12}
+        response = await self.assert_same_response(json.dumps(application))
+        self.assertEqual(response.status_code, 200)
+        for body in ([], 'x', 5, None, {}, {**application, 'customer_id': 999999}, {**application, 'tenure': 0},
+                     {**application, 'customer_id': 'abc'}, {**application, 'loan_amount': 1e300}):
+            with self.subTest(body=body):
+                response = await self.assert_same_response(json.dumps(body))
+                self.assertEqual(response.status_code, 400)
+
+    async def test_malformed_json(self):
+        response = await self.assert_same_response('{"customer_id": ')
+        self.assertEqual(response.status_code, 400)
+
+
+class LoanOffersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_customer()
+        make_loan(cls.customer, emi_paid_on_time=12, start_date=date(2020, 1, 15))
+
+    def offers(self, query):
+        return self.client.get(reverse('loan-offers', args=[self.customer.customer_id]) + query)
+
+    def approved(self, amount, interest_rate, tenure):
+        body = {'customer_id': self.customer.customer_id, 'loan_amount': amount, 'interest_rate': interest_rate,
+                'tenure': tenure}
+        return self.client.post(reverse('check-customer-eligibility'), body, content_type='application/json').json()['approval']
+
+    def test_out_of_range_rates_rejected(self):
+        for rate in ('1e300', '1000', 'inf', 'nan', '-1'):
+            with self.subTest(rate=rate):
+                response = self.offers(f'?interest_rate={rate}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('interest_rate', response.json()['errors'])
+
+    def test_highest_rate_offers_are_exact(self):
+        response = self.offers('?interest_rate=999.99&tenure=1&tenure=600')
+        self.assertEqual(response.status_code, 200)
+        for offer in response.json()['offers']:
+            self.assertEqual(offer['limited_by'], 'income')
+            self.assertTrue(self.approved(offer['max_loan_amount'], 999.99, offer['tenure']))
+            self.assertFalse(self.approved(round(offer['max_loan_amount'] + 0.01, 2), 999.99, offer['tenure']))
+
+    def test_max_principals_finite_when_power_overflows(self):
+        principals = max_principals(1000.0, [1e300, 5000], [600, 600])
+        self.assertTrue(np.isfinite(principals).all())
+        self.assertEqual(principals.tolist(), [0.0, 240.0])
+
+
+class PrescoringTests(TestCase):
+    """
+    Scores stored by score_all_customers must equal the live scores, so the
+    10/30/50 slab decisions are the same either way.
+    """
+    # (loans, EMIs paid, loans this year, total loan amount, score): one rupee
+    # more of total loan amount drops each score a paisa, below or onto a slab boundary.
+    BOUNDARY_BOOKS = [
+        (10, 0, 10, 3949357, '10.01'), (10, 0, 10, 3949358, '10.00'),
+        (3, 0, 3, 259378, '30.01'), (3, 0, 3, 259379, '30.00'),
+        (2, 12, 1, 1752642, '50.01'), (2, 12, 1, 1752643, '50.00'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customers = []
+        for number, (loans, paid, this_year, total, score) in enumerate(cls.BOUNDARY_BOOKS):
+            customer = make_customer(phone_number=f'91{number:08d}', monthly_income='9000000.00',
+                                     approved_limit='900000000.00')
+            for index in range(loans):
+                make_loan(
+                    customer, loan_amount=str(total - 1000 * (loans - 1) if index == 0 else 1000), tenure=12,
+                    monthly_payment='100.00', emi_paid_on_time=min(paid - 12 * index, 12) if paid > 12 * index else 0,
+                    start_date=None if index < this_year else date(2020, 1, 15),
+                )
+            cls.customers.append((customer, Decimal(score)))
+        over_limit = make_customer(phone_number='9200000000', approved_limit='1000.00', current_debt=Decimal('5000.00'))
+        make_loan(over_limit)
+        cls.over_limit = over_limit
+
+    def decision(self, customer_id, stored):
+        customer = Customer.objects.select_related('credit_profile', 'stored_score').get(pk=customer_id)
+        self.assertEqual(stored_credit_score(customer) is not None, stored)
+        return credit_decision(customer, get_loan_stats(customer), 10)
+
+    def test_stored_scores_match_live_scores(self):
+        ids = [customer.customer_id for customer, _ in self.customers] + [self.over_limit.customer_id]
+        count, _ = score_range(min(ids), max(ids), date.today().year)
+        self.assertEqual(count, len(ids))
+        stored = dict(CustomerScore.objects.values_list('customer_id', 'credit_score'))
+        for customer, score in self.customers:
+            with self.subTest(score=score):
+                self.assertEqual(stored[customer.customer_id], score)
+                from_stored = self.decision(customer.customer_id, stored=True)
+                with override_settings(CREDIT_SCORE_MAX_AGE_HOURS=0):
+                    live = self.decision(customer.customer_id, stored=False)
+                self.assertEqual(live[0], score)
+                self.assertEqual(from_stored, live)
+
+    def test_debt_paid_down_after_scoring(self):
+        customer_id = self.over_limit.customer_id
+        score_range(customer_id, customer_id, date.today().year)
+        body = {'customer_id': customer_id, 'loan_amount': 10000, 'interest_rate': 14, 'tenure': 12}
+        response = self.client.post(reverse('check-customer-eligibility'), body, content_type='application/json')
+        self.assertFalse(response.json()['approval'])
+        # Debt changes do not touch the credit profile, so the stored score stays fresh.
+        Customer.objects.filter(pk=customer_id).update(current_debt=Decimal('0.00'))
+        score, _, _, _ = self.decision(customer_id, stored=True)
+        with override_settings(CREDIT_SCORE_MAX_AGE_HOURS=0):
+            self.assertEqual(self.decision(customer_id, stored=False)[0], score)
+        response = self.client.post(reverse('check-customer-eligibility'), body, content_type='application/json')
+        self.assertTrue(response.json()['approval'])
+
+
+class PartitionedIngestTests(TestCase):
+    """
+    split_partitions reads a file once; every row lands in exactly one
+    partition, with all rows for a key in the same one.
+    """
+
+    def test_split_and_ingest(self):
+        customers = pd.DataFrame({
+            'Customer ID': [1, 2, 3, 2, 'x'], 'First Name': ['A', 'B', 'C', 'D', 'E'], 'Last Name': ['R'] * 5,
+            'Age': [30] * 5, 'Phone Number': [9000000001, 9000000002, 9000000003, 9000000004, 9000000005],
+            'Monthly Salary': [50000] * 5, 'Approved Limit': [1800000] * 5,
+        })
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'customers.csv')
+            customers.to_csv(path, index=False)
+            files = split_partitions('customers', path, 3, directory, chunk_size=2)
+            reports = [ingest_partition('customers', files[partition], partition, 3) for partition in range(3)]
+        self.assertEqual(sum(report.rows_read for report in reports), 5)
+        # Both rows for customer 2 are written, in file order, from different chunks.
+        self.assertEqual(sum(report.rows_written for report in reports), 4)
+        rejected = [row for report in reports for row in report.rejected]
+        self.assertEqual(rejected, [(6, "invalid customer_id")])
+        self.assertEqual(Customer.objects.get(customer_id=2).first_name, 'D')
+
+
+class IdempotencyTests(TestCase):
+    """
+    create-loan requests with an Idempotency-Key header are processed once;
+    retries get the stored response back.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_customer()
+        cls.body = {'customer_id': cls.customer.customer_id, 'loan_amount': 100000, 'interest_rate': 14, 'tenure': 12}
+
+    def setUp(self):
+        cache.clear()
+
+    def create_loan(self, key, body=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('create-loan'), body or self.body, content_type='application/json',
+                headers={idempotency.HEADER: key},
+            )
+
+    def test_replay_returns_stored_response(self):
+        first = self.create_loan('retry-1')
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn(idempotency.REPLAYED_HEADER, first.headers)
+        # From the cache, then from the IdempotencyKey row.
+        for clear_cache in (False, True):
+            if clear_cache:
+                cache.clear()
+            with self.subTest(clear_cache=clear_cache):
+                retry = self.create_loan('retry-1')
+                self.assertEqual(retry.status_code, 200)
+                self.assertEqual(retry.headers[idempotency.REPLAYED_HEADER], 'true')
+                self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Loan.objects.filter(customer=self.customer).count(), 1)
+
+    def test_key_reused_with_different_body(self):
+        self.create_loan('retry-2')
+        response = self.create_loan('retry-2', {**self.body, 'loan_amount': 200000})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Loan.objects.filter(customer=self.customer).count(), 1)
+
+    def test_server_errors_are_not_stored(self):
+        with mock.patch('core.views.check_eligibility', side_effect=DatabaseError):
+            response = self.create_loan('retry-3')
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(IdempotencyKey.objects.filter(key='retry-3').exists())
+        retry = self.create_loan('retry-3')
+        self.assertEqual(retry.status_code, 200)
+        self.assertNotIn(idempotency.REPLAYED_HEADER, retry.headers)
+        self.assertTrue(retry.json()['loan_approved'])
+
+    @override_settings(IDEMPOTENCY_KEY_TTL_HOURS=24)
+    def test_purge_removes_expired_keys(self):
+        for key in ('old-1', 'old-2', 'new'):
+            IdempotencyKey.objects.create(scope='create-loan', key=key, fingerprint='f', status_code=200, response={})
+        IdempotencyKey.objects.filter(key__startswith='old').update(created_at=timezone.now() - timedelta(hours=25))
+        call_command('purge_idempotency_keys', '--batch-size', '1', stdout=io.StringIO())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
+        call_command('purge_idempotency_keys', '--older-than', '0', stdout=io.StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+        with self.assertRaises(CommandError):
+            call_command('purge_idempotency_keys', '--older-than', '-1', stdout=io.StringIO())
+
+
+class RepaymentTests(TestCase):
+    """
+    apply_repayments applies each record on its own: loan EMI counts, the
+    customer's current debt (not below zero) and the credit profile.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_customer()
+        cls.loan = make_loan(cls.customer, tenure=12, monthly_payment='8791.59', emi_paid_on_time=6)
+        cls.other = make_loan(cls.customer, loan_amount='5000.00', tenure=6, monthly_payment='860.00', emi_paid_on_time=0)
+        cls.staff = User.objects.create_user('staff', password='x', is_staff=True)
+
+    def apply(self, records):
+        with transaction.atomic():
+            return apply_repayments(records)
+
+    def test_applied(self):
+        Customer.objects.filter(pk=self.customer.pk).update(current_debt=Decimal('100000.00'))
+        result, = self.apply([(self.loan.loan_id, 2)])
+        self.assertEqual(result, {'loan_id': self.loan.loan_id, 'status': 'applied', 'emi_paid_on_time': 8,
+                                  'repayments_left': 4})
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).emi_paid_on_time, 8)
+        self.assertEqual(Customer.objects.get(pk=self.customer.pk).current_debt, Decimal('100000.00') - 2 * Decimal('8791.59'))
+        self.assertEqual(CustomerCreditProfile.objects.get(customer=self.customer).total_emis_paid, 8)
+
+    def test_overpayment_rejected(self):
+        result, = self.apply([(self.loan.loan_id, 7)])
+        self.assertEqual(result['status'], 'rejected')
+        self.assertEqual(result['error'], "Overpayment: 7 EMIs posted but only 6 left.")
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).emi_paid_on_time, 6)
+
+    def test_unknown_loan_rejected(self):
+        results = self.apply([(999999, 1), (self.other.loan_id, 1)])
+        self.assertEqual(results[0], {'loan_id': 999999, 'status': 'rejected', 'error': "Loan not found."})
+        self.assertEqual(results[1]['status'], 'applied')
+
+    def test_several_records_for_one_loan(self):
+        results = self.apply([(self.loan.loan_id, 2), (self.loan.loan_id, 3), (self.loan.loan_id, 2), (self.loan.loan_id, 1)])
+        self.assertEqual([result['status'] for result in results], ['applied', 'applied', 'rejected', 'applied'])
+        self.assertEqual([result.get('emi_paid_on_time') for result in results], [8, 11, None, 12])
+        self.assertEqual(results[2]['error'], "Overpayment: 2 EMIs posted but only 1 left.")
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).emi_paid_on_time, 12)
+        self.assertEqual(CustomerCreditProfile.objects.get(customer=self.customer).total_emis_paid, 12)
+
+    def test_debt_not_below_zero(self):
+        Customer.objects.filter(pk=self.customer.pk).update(current_debt=Decimal('1000.00'))
+        self.apply([(self.loan.loan_id, 6), (self.other.loan_id, 6)])
+        self.assertEqual(Customer.objects.get(pk=self.customer.pk).current_debt, Decimal('0.00'))
+
+    def test_endpoint_is_staff_only(self):
+        body = {'repayments': [{'loan_id': self.loan.loan_id, 'emis_paid': 1}]}
+        response = self.client.post(reverse('post-repayments'), body, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).emi_paid_on_time, 6)
+        self.client.force_login(self.staff)
+        response = self.client.post(reverse('post-repayments'), body, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['applied'], 1)
+
+
+class ExportLoanBookCommandTests(TestCase):
+    """
+    A failed export_loan_book run leaves no partial file and raises the
+    error that stopped it.
+    """
+
+    def test_failure_while_writing(self):
+        def chunks():
+            yield b'loan_id\n'
+            raise RuntimeError("stream broke")
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'loans.csv')
+            with mock.patch('core.management.commands.export_loan_book.LoanBookExport', return_value=chunks()):
+                with self.assertRaisesMessage(RuntimeError, "stream broke"):
+                    call_command('export_loan_book', output, stdout=io.StringIO())
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_failure_to_open(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'missing', 'loans.csv')
+            with self.assertRaises(FileNotFoundError) as raised:
+                call_command('export_loan_book', output, stdout=io.StringIO())
+        # The open() error itself, not one from cleaning up a file that was never created.
+        self.assertIsNone(raised.exception.__context__)
@@ -5,8 +5,19 @@ from . import views
 urlpatterns = [
     path('register', views.RegisterCustomerView.as_view(), name='register-customer'),
     path('check-eligibility', views.CheckEligibilityView.as_view(), name='check-customer-eligibility'),
+    path('check-eligibility/batch', views.CheckEligibilityBatchView.as_view(), name='check-eligibility-batch'),
+    path('offers/<int:customer_id>/', views.LoanOffersView.as_view(), name='loan-offers'),
     path('view-loan/<int:loan_id>/', views.ViewLoanDetail.as_view(), name='view-loan'),
+    path('amortization/<int:loan_id>/', views.LoanAmortizationView.as_view(), name='loan-amortization'),
     path('view-loans/<int:customer_id>/', views.ViewLoansByCustomer.as_view(), name='view-loans-by-customer'),
     path('create-loan', views.CreateLoanView.as_view(), name='create-loan'),
+    path('repayments', views.PostRepaymentsView.as_view(), name='post-repayments'),
+    path('export/<slug:dataset>.<slug:fmt>', views.LoanBookExportView.as_view(), name='export-loan-book'),
+    path('cache-stats', views.CacheStatsView.as_view(), name='cache-stats'),
+    path('pool-stats', views.PoolStatsView.as_view(), name='pool-stats'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
+    path('async/check-eligibility', views.AsyncCheckEligibilityView.as_view(), name='async-check-eligibility'),
+    path('async/view-loan/<int:loan_id>/', views.AsyncViewLoanDetail.as_view(), name='async-view-loan'),
+    path('async/view-loans/<int:customer_id>/', views.AsyncViewLoansByCustomer.as_view(), name='async-view-loans-by-customer'),
 
 ]
@@ -2,46 +2,171 @@
 Utility functions for the Credit Approval System.
 
 This module provides:
-- Loan eligibility calculation logic
+- Loan eligibility calculation logic, using stored credit scores while fresh
 - Customer validation helpers
 - EMI calculation and related financial utilities
+- Maximum approvable loan offers over a tenure grid
 
 Business logic is separated from views and serializers for maintainability and reuse.
 """
 
-from django.db.models import Sum
+from django.conf import settings
+from django.db.models import Count, Q, Sum
 from django.db import DatabaseError
+from django.utils import timezone
 from decimal import Decimal
 import math
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from rest_framework import status
 from rest_framework.response import Response
-from .models import Customer
+from .emi import CENT, decimal_emi, max_principals
+from .loaders import get_customer_loader
+from .metrics import timed
+from .models import Customer, CustomerCreditProfile, Loan
+
+def customer_limits_error(customer):
+    """
+    Return an error message if the customer's income or approved limit cannot
+    be used for an eligibility check, otherwise None.
+    """
+    if customer.monthly_income <= 0:
+        return "Customer's monthly income is invalid or zero."
+    if customer.approved_limit <= 0:
+        return "Customer's approved limit is invalid or zero."
+    return None
 
 def get_valid_customer(customer_id):
     """
     Retrieve a customer by ID and return a tuple of (customer, error_response).
     If the customer does not exist, error_response contains a DRF Response object.
+    The customer comes from the request's identity map, so validating and then
+    fetching the same customer costs one query.
     """
-    try:
-        customer = Customer.objects.get(customer_id=customer_id)
-        if customer.monthly_income <= 0:
-            return None, Response(
-                {"error": "Customer's monthly income is invalid or zero."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        if customer.approved_limit <= 0:
-            return None, Response(
-                {"error": "Customer's approved limit is invalid or zero."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        return customer, None
-    except Customer.DoesNotExist:
+    customer = get_customer_loader().get(customer_id)
+    if customer is None:
         return None, Response(
             {"error": "Customer not found."},
             status=status.HTTP_404_NOT_FOUND
         )
+    error = customer_limits_error(customer)
+    if error:
+        return None, Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+    return customer, None
+
+def current_year_loans_q(year=None):
+    """
+    Loans started in `year` (default: this year), as a half-open start_date
+    range that an index on (customer, start_date) can serve, rather than an
+    extract of the year from every row.
+    """
+    year = year or datetime.now().year
+    return Q(start_date__gte=date(year, 1, 1), start_date__lt=date(year + 1, 1, 1))
+
+def _loan_stats_aggregates(current_year):
+    """
+    Aggregate expressions computing loan stats directly from the loan table.
+    """
+    return {
+        'loan_count': Count('loan_id'),
+        'total_tenure': Sum('tenure'),
+        'total_emis_paid': Sum('emi_paid_on_time'),
+        'total_loan_amount': Sum('loan_amount'),
+        'total_monthly_payment': Sum('monthly_payment'),
+        'current_year_loans': Count('loan_id', filter=current_year_loans_q(current_year)),
+    }
+
+def _stats_from_aggregates(row):
+    """
+    Loan stats from a row of _loan_stats_aggregates() (empty for no loans).
+    """
+    return {
+        'loan_count': row.get('loan_count') or 0,
+        'total_tenure': row.get('total_tenure') or 0,
+        'total_emis_paid': row.get('total_emis_paid') or 0,
+        'total_loan_amount': row.get('total_loan_amount') or Decimal('0.00'),
+        'total_monthly_payment': row.get('total_monthly_payment') or Decimal('0.00'),
+        'current_year_loans': row.get('current_year_loans') or 0,
+    }
+
+def _stats_from_profile(profile, current_year):
+    return {
+        'loan_count': profile.loan_count,
+        'total_tenure': profile.total_tenure,
+        'total_emis_paid': profile.total_emis_paid,
+        'total_loan_amount': profile.total_loan_amount,
+        'total_monthly_payment': profile.total_monthly_payment,
+        'current_year_loans': profile.loans_per_year.get(str(current_year), 0),
+    }
 
+def get_loan_stats(customer):
+    """
+    Collect every loan figure the credit score needs in a single query.
+
+    Reads the customer's CustomerCreditProfile row; customers without a profile
+    fall back to one conditional aggregate over their loans.
+
+    Returns a dict with:
+        loan_count, total_tenure, total_emis_paid, total_loan_amount,
+        current_year_loans and total_monthly_payment.
+    """
+    current_year = datetime.now().year
+    try:
+        profile = customer.credit_profile
+    except CustomerCreditProfile.DoesNotExist:
+        profile = None
+    if profile is not None:
+        return _stats_from_profile(profile, current_year)
+    return _stats_from_aggregates(customer.loans.aggregate(**_loan_stats_aggregates(current_year)))
+
+async def aget_loan_stats(customer):
+    """
+    Async version of get_loan_stats(). No query is needed if the customer was
+    loaded with its credit profile (see CustomerLoader.aget).
+    """
+    current_year = datetime.now().year
+    if Customer.credit_profile.is_cached(customer):
+        profile = getattr(customer, 'credit_profile', None)
+    else:
+        profile = await CustomerCreditProfile.objects.filter(customer_id=customer.customer_id).afirst()
+    if profile is not None:
+        return _stats_from_profile(profile, current_year)
+    return _stats_from_aggregates(await customer.loans.aaggregate(**_loan_stats_aggregates(current_year)))
+
+def get_loan_stats_bulk(customer_ids):
+    """
+    Load customers together with their credit-profile loan stats.
+
+    Profiles come back joined to their customers in one query; customers
+    without a profile are filled in by one grouped aggregate over loans.
+
+    Returns {customer_id: (customer, stats)} where stats has the same keys as
+    get_loan_stats(). Unknown customer IDs are omitted.
+    """
+    current_year = datetime.now().year
+    customers = Customer.objects.filter(customer_id__in=set(customer_ids)).select_related(
+        'credit_profile', 'stored_score'
+    )
+    result = {}
+    missing = []
+    for customer in customers:
+        try:
+            customer.credit_profile
+        except CustomerCreditProfile.DoesNotExist:
+            missing.append(customer)
+            continue
+        result[customer.customer_id] = (customer, get_loan_stats(customer))
+    if missing:
+        totals = {
+            row['customer_id']: row
+            for row in Loan.objects.filter(customer__in=missing).values('customer_id').annotate(
+                **_loan_stats_aggregates(current_year)
+            ).order_by()
+        }
+        for customer in missing:
+            result[customer.customer_id] = (customer, _stats_from_aggregates(totals.get(customer.customer_id, {})))
+    return result
+
+@timed('calculate_emi')
 def calculate_emi(amount: Decimal, rate: Decimal, tenure: int) -> Decimal:
     """
     Calculate the monthly EMI for a loan.
@@ -57,92 +182,218 @@ def calculate_emi(amount: Decimal, rate: Decimal, tenure: int) -> Decimal:
         ValueError: If calculation parameters are invalid.
     """
     try:
-        monthly_rate = rate / Decimal('100') / Decimal('12')
-        if monthly_rate == 0:
-            return amount / Decimal(str(tenure))
-        term = (Decimal('1') + monthly_rate) ** tenure
-        if term == 1:
-            return amount / Decimal(str(tenure))
-        emi = amount * monthly_rate * term / (term - Decimal('1'))
-        return emi.quantize(Decimal('0.01'))
-    except (OverflowError, ZeroDivisionError):
+        return decimal_emi(amount, rate, tenure)
+    except ArithmeticError:
+        # Also covers Decimal overflow, and amounts too large to quantize to paise.
         raise ValueError("Error calculating EMI due to invalid parameters.")
 
+@timed('check_eligibility')
 def check_eligibility(customer, loan_amount, interest_rate, tenure):
     """
     Determine if a customer is eligible for a loan based on their credit score,
     current debt, and EMI-to-income ratio.
     """
     try:
-        # Ensure all numbers are Decimal
-        loan_amount = Decimal(str(loan_amount))
-        interest_rate = Decimal(str(interest_rate))
-        tenure = int(tenure)
+        stats = None if customer.current_debt > customer.approved_limit else get_loan_stats(customer)
+    except DatabaseError:
+        raise DatabaseError("Database error while calculating credit score.")
+    return eligibility_from_stats(customer, stats, loan_amount, interest_rate, tenure)
 
-        # Initialize
+@timed('acheck_eligibility')
+async def acheck_eligibility(customer, loan_amount, interest_rate, tenure):
+    """
+    Async version of check_eligibility() for the ASGI views.
+    """
+    try:
+        stats = None if customer.current_debt > customer.approved_limit else await aget_loan_stats(customer)
+    except DatabaseError:
+        raise DatabaseError("Database error while calculating credit score.")
+    return eligibility_from_stats(customer, stats, loan_amount, interest_rate, tenure)
+
+def stored_credit_score(customer):
+    """
+    The customer's CustomerScore if it can stand in for computing the score:
+    loaded along with the customer (see CustomerLoader), scored this year,
+    younger than CREDIT_SCORE_MAX_AGE_HOURS and not older than the credit
+    profile. Otherwise None. Does not touch the database.
+    """
+    max_age = settings.CREDIT_SCORE_MAX_AGE_HOURS
+    if not max_age or not Customer.stored_score.is_cached(customer):
+        return None
+    score = getattr(customer, 'stored_score', None)
+    if score is None:
+        return None
+    if score.scored_at < timezone.now() - timedelta(hours=max_age):
+        return None
+    if timezone.localtime(score.scored_at).year != datetime.now().year:
+        return None
+    # Loan changes touch the profile, so a newer profile means newer loans.
+    if not Customer.credit_profile.is_cached(customer):
+        return None
+    profile = getattr(customer, 'credit_profile', None)
+    if profile is not None and profile.updated_at > score.scored_at:
+        return None
+    return score.credit_score
+
+def calculate_credit_score(stats):
+    """
+    The credit score for a customer's loan stats (as from get_loan_stats()),
+    rounded to 0.01. Shared by credit_decision() and the pre-scoring job, so
+    stored and live scores are identical.
+    """
+    P = Decimal('0')
+    if stats['loan_count']:
+        total_emis_paid = stats['total_emis_paid']
+        total_tenure = stats['total_tenure'] or 1
+        P = Decimal(str(total_emis_paid)) / Decimal(str(total_tenure))
+    N = stats['loan_count']
+    N_norm = Decimal(str(math.exp(-0.1 * N)))
+    A = stats['current_year_loans']
+    A_norm = Decimal(str(math.exp(-0.2 * A)))
+    V = stats['total_loan_amount']
+    V_norm = Decimal('1') / (Decimal('1') + Decimal('0.00001') * V)
+    W1, W2, W3, W4 = Decimal('0.4'), Decimal('0.2'), Decimal('0.15'), Decimal('0.25')
+    credit_score = Decimal('100') * (W1 * P + W2 * N_norm + W3 * A_norm + W4 * V_norm)
+    return credit_score.quantize(Decimal('0.01'))
+
+def credit_decision(customer, stats, interest_rate):
+    """
+    The part of the eligibility decision that does not depend on the loan
+    amount or tenure: the credit score (a fresh stored one if there is one),
+    the slab approval and the corrected interest rate. Returns (credit_score,
+    approval, corrected_interest_rate, message); stats are as for
+    eligibility_from_stats().
+    """
+    interest_rate = Decimal(str(interest_rate))
+
+    # Initialize
+    credit_score = Decimal('0')
+    approval = False
+    corrected_interest_rate = Decimal(str(interest_rate))
+    message = ""
+
+    # Calculate credit score
+    if customer.current_debt > customer.approved_limit:
         credit_score = Decimal('0')
+        message = "Loan rejected: Current debt exceeds approved limit."
+    else:
+        credit_score = stored_credit_score(customer)
+        if credit_score is None:
+            credit_score = calculate_credit_score(stats)
+        message = "Loan eligibility calculated."
+
+    # Determine eligibility
+    if credit_score > 50:
+        approval = True
+    elif 30 < credit_score <= 50:
+        approval = True
+        if interest_rate <= 12:
+            corrected_interest_rate = Decimal('12.00')
+            message = "Loan approved with corrected interest rate of 12%."
+    elif 10 < credit_score <= 30:
+        approval = True
+        if interest_rate <= 16:
+            corrected_interest_rate = Decimal('16.00')
+            message = "Loan approved with corrected interest rate of 16%."
+    else:
         approval = False
-        corrected_interest_rate = Decimal(str(interest_rate))
-        monthly_installment = Decimal('0')
-        message = ""
-
-        # Calculate credit score
-        loans = customer.loans.all()
-        if customer.current_debt > customer.approved_limit:
-            credit_score = Decimal('0')
-            message = "Loan rejected: Current debt exceeds approved limit."
-        else:
-            P = Decimal('0')
-            if loans.exists():
-                total_emis_paid = loans.aggregate(Sum('emi_paid_on_time'))['emi_paid_on_time__sum'] or 0
-                total_tenure = loans.aggregate(Sum('tenure'))['tenure__sum'] or 1
-                P = Decimal(str(total_emis_paid)) / Decimal(str(total_tenure))
-            N = loans.count()
-            N_norm = Decimal(str(math.exp(-0.1 * N)))
-            current_year = datetime.now().year
-            A = customer.loans.filter(start_date__year=current_year).count()
-            A_norm = Decimal(str(math.exp(-0.2 * A)))
-            V = loans.aggregate(Sum('loan_amount'))['loan_amount__sum'] or Decimal('0.00')
-            V_norm = Decimal('1') / (Decimal('1') + Decimal('0.00001') * V)
-            W1, W2, W3, W4 = Decimal('0.4'), Decimal('0.2'), Decimal('0.15'), Decimal('0.25')
-            credit_score = Decimal('100') * (W1 * P + W2 * N_norm + W3 * A_norm + W4 * V_norm)
-            credit_score = credit_score.quantize(Decimal('0.01'))
-            message = "Loan eligibility calculated."
-
-        # Determine eligibility
-        try:
-            if credit_score > 50:
-                approval = True
-            elif 30 < credit_score <= 50:
-                approval = True
-                if interest_rate <= 12:
-                    corrected_interest_rate = Decimal('12.00')
-                    message = "Loan approved with corrected interest rate of 12%."
-            elif 10 < credit_score <= 30:
-                approval = True
-                if interest_rate <= 16:
-                    corrected_interest_rate = Decimal('16.00')
-                    message = "Loan approved with corrected interest rate of 16%."
-            else:
-                approval = False
-                message = "Loan rejected: Credit score too low (<= 10)."
-
-            monthly_installment = calculate_emi(loan_amount, corrected_interest_rate, tenure)
-            if approval:
-                current_emis = customer.loans.aggregate(Sum('monthly_payment'))['monthly_payment__sum'] or Decimal('0.00')
-                emi_threshold = customer.monthly_income * Decimal('0.5')
-                if current_emis + monthly_installment > emi_threshold:
-                    approval = False
-                    message = "Loan rejected: Total EMIs exceed 50% of monthly income."
-        except ValueError as e:
-            raise ValueError(str(e))
-
-        return {
-            'approval': approval,
-            'corrected_interest_rate': corrected_interest_rate,
-            'monthly_installment': monthly_installment,
-            'message': message,
-            'credit_score': credit_score
-        }
+        message = "Loan rejected: Credit score too low (<= 10)."
+    return credit_score, approval, corrected_interest_rate, message
+
+def exceeds_emi_limit(customer, stats, monthly_installment):
+    """
+    Whether a new EMI would take the customer's total EMIs above 50% of
+    their monthly income.
+    """
+    current_emis = stats['total_monthly_payment']
+    emi_threshold = customer.monthly_income * Decimal('0.5')
+    return current_emis + monthly_installment > emi_threshold
+
+def eligibility_from_stats(customer, stats, loan_amount, interest_rate, tenure):
+    """
+    The eligibility decision for a customer given their loan stats (as from
+    get_loan_stats(); None if current debt exceeds the approved limit, where
+    stats are not needed). Does not touch the database.
+    """
+    # Ensure all numbers are Decimal
+    loan_amount = Decimal(str(loan_amount))
+    interest_rate = Decimal(str(interest_rate))
+    tenure = int(tenure)
+
+    credit_score, approval, corrected_interest_rate, message = credit_decision(customer, stats, interest_rate)
+    monthly_installment = Decimal('0')
+
+    try:
+        monthly_installment = calculate_emi(loan_amount, corrected_interest_rate, tenure)
+        if approval and exceeds_emi_limit(customer, stats, monthly_installment):
+            approval = False
+            message = "Loan rejected: Total EMIs exceed 50% of monthly income."
+    except ValueError as e:
+        raise ValueError(str(e))
+
+    return {
+        'approval': approval,
+        'corrected_interest_rate': corrected_interest_rate,
+        'monthly_installment': monthly_installment,
+        'message': message,
+        'credit_score': credit_score
+    }
+
+OFFER_TENURES = (6, 12, 18, 24, 36, 48, 60)
+
+@timed('loan_offers')
+def loan_offers(customer, interest_rate, tenures=OFFER_TENURES):
+    """
+    The largest loan check_eligibility() would approve for each tenure, at
+    the given requested interest rate, from a single credit score.
+
+    The amount is bounded by the 50%-of-income EMI test and by the customer's
+    remaining approved limit (approved_limit - current_debt); limited_by says
+    which applied. Amounts are found by inverting the EMI formula across the
+    tenure grid at once, then checked to the paisa with calculate_emi() and
+    the same EMI test as check_eligibility().
+    """
+    try:
+        stats = None if customer.current_debt > customer.approved_limit else get_loan_stats(customer)
     except DatabaseError:
-        raise DatabaseError("Database error while calculating credit score.")
\ No newline at end of file
+        raise DatabaseError("Database error while calculating credit score.")
+    credit_score, approval, corrected_interest_rate, message = credit_decision(customer, stats, interest_rate)
+    result = {
+        'approval': approval,
+        'credit_score': credit_score,
+        'corrected_interest_rate': corrected_interest_rate,
+        'message': message,
+        'offers': [],
+    }
+    if not approval:
+        return result
+
+    available = customer.monthly_income * Decimal('0.5') - stats['total_monthly_payment']
+    headroom = max(customer.approved_limit - customer.current_debt, Decimal('0.00'))
+    estimates = max_principals(float(max(available, Decimal('0'))), float(corrected_interest_rate), list(tenures))
+
+    def approvable(amount, tenure):
+        return not exceeds_emi_limit(customer, stats, calculate_emi(amount, corrected_interest_rate, tenure))
+
+    for tenure, estimate in zip(tenures, estimates.tolist()):
+        amount = Decimal(str(estimate)).quantize(CENT)
+        while amount > 0 and not approvable(amount, tenure):
+            amount -= CENT
+        while approvable(amount + CENT, tenure):
+            amount += CENT
+        limited_by = 'income'
+        if amount > headroom:
+            amount, limited_by = headroom, 'approved_limit'
+        result['offers'].append({
+            'tenure': tenure,
+            'max_loan_amount': amount,
+            'monthly_installment': calculate_emi(amount, corrected_interest_rate, tenure),
+            'limited_by': limited_by,
+        })
+    if not any(offer['max_loan_amount'] > 0 for offer in result['offers']):
+        result['approval'] = False
+        result['message'] = (
+            "Loan rejected: No approved limit left." if headroom == 0
+            else "Loan rejected: Total EMIs exceed 50% of monthly income."
+        )
+    return result
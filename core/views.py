@@ -3,31 +3,61 @@ Views for the Credit Approval System API.
 
 This module contains API endpoints for:
 - Registering customers
-- Checking loan eligibility
-- Viewing loan details
+- Checking loan eligibility (single and batch)
+- Maximum loan offers per tenure
+- Viewing loan details and repayment schedules
 - Listing loans for a customer
 - Creating new loans
+- Posting EMI repayments in bulk
+- Exporting the loan book (staff only)
+- Response cache and connection pool statistics
+- Prometheus metrics
 
-Each view is implemented as a DRF APIView.
+Each view is implemented as a DRF APIView; async (ASGI) variants of the
+eligibility and loan-view endpoints are plain Django views.
 """
 
 # core/views.py
 
-from rest_framework import generics, status
+from rest_framework import generics, permissions, status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from .models import Customer, Loan
 from .serializers import (
-    CustomerRegisterSerializer, LoanDetailSerializer, CustomerLoanListSerializer,
+    CustomerRegisterSerializer, LoanDetailValuesSerializer, CustomerLoanListValuesSerializer,
     CheckEligibilityRequestSerializer, CheckEligibilityResponseSerializer,
-    CreateLoanRequestSerializer, CreateLoanResponseSerializer
+    CheckEligibilityItemSerializer, CheckEligibilityBatchRequestSerializer, LoanOffersRequestSerializer,
+    CreateLoanRequestSerializer, CreateLoanResponseSerializer,
+    RepaymentItemSerializer, RepaymentBatchRequestSerializer, LoanBookExportRequestSerializer
 )
-from .utils import check_eligibility, get_valid_customer
+from .cache import acached_response, cache_stats, cached_response, customer_loans_key, loan_detail_key
+from . import idempotency
+from .db import pool_stats
+from .emi import amortization_schedule
+from .export import LoanBookExport
+from .loaders import get_customer_loader
+from .metrics import record_serialization, render_metrics
+from .pagination import LoanCursorPagination
+from .repayments import post_repayments, summarize as summarize_repayments
+from .scoring import score_applications
+from .utils import (
+    OFFER_TENURES, acheck_eligibility, check_eligibility, customer_limits_error, eligibility_from_stats,
+    get_loan_stats_bulk, get_valid_customer, loan_offers, stored_credit_score
+)
+from django.conf import settings
 from django.db import transaction, DatabaseError, IntegrityError
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import ValidationError
 from datetime import timedelta, datetime
 from decimal import Decimal
+import hmac
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -79,94 +109,558 @@ class CheckEligibilityView(APIView):
             return error_response("Error formatting response data.", status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response(response_serializer.data, status=status.HTTP_200_OK)
 
+class CheckEligibilityBatchView(APIView):
+    """
+    Check many applications in one request. Every referenced customer is
+    loaded with its loan stats and stored score in bulk, then all
+    applications are decided at once with core.scoring.score_applications;
+    those it leaves unsettled (too close to a decision threshold for float
+    arithmetic) get the same Decimal decision as check-eligibility
+    (eligibility_from_stats). Results are returned in request order, each
+    shaped like the single check-eligibility response or carrying that
+    endpoint's error body.
+    """
+
+    def post(self, request):
+        serializer = CheckEligibilityBatchRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.warning(f"Batch eligibility validation errors: {serializer.errors}")
+            return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        applications = serializer.validated_data['applications']
+        results = [None] * len(applications)
+
+        valid = []
+        for index, item in enumerate(applications):
+            item_serializer = CheckEligibilityItemSerializer(data=item)
+            if item_serializer.is_valid():
+                valid.append((index, item_serializer.validated_data))
+            else:
+                results[index] = {"errors": item_serializer.errors}
+
+        try:
+            customers = get_loan_stats_bulk(data['customer_id'] for _, data in valid)
+        except DatabaseError:
+            logger.error("Database error while loading batch eligibility stats.")
+            return error_response("Database error while calculating credit score.", status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        scorable = []
+        for index, data in valid:
+            entry = customers.get(data['customer_id'])
+            if entry is None:
+                results[index] = {"errors": {"customer_id": ["Customer with this ID does not exist."]}}
+                continue
+            customer, stats = entry
+            error = customer_limits_error(customer)
+            if error:
+                results[index] = {"error": error}
+                continue
+            scorable.append((index, data, customer, stats))
+        if not scorable:
+            return Response({"results": results}, status=status.HTTP_200_OK)
+
+        columns = {
+            'current_debt': [], 'approved_limit': [], 'monthly_income': [], 'stored_score': [],
+            **{key: [] for key in scorable[0][3]},
+        }
+        for _, _, customer, stats in scorable:
+            stored_score = stored_credit_score(customer)
+            columns['current_debt'].append(float(customer.current_debt))
+            columns['approved_limit'].append(float(customer.approved_limit))
+            columns['monthly_income'].append(float(customer.monthly_income))
+            columns['stored_score'].append(float('nan') if stored_score is None else float(stored_score))
+            for key, value in stats.items():
+                columns[key].append(float(value))
+        scored = score_applications(
+            columns,
+            [float(data['loan_amount']) for _, data, _, _ in scorable],
+            [float(data['interest_rate']) for _, data, _, _ in scorable],
+            [data['tenure'] for _, data, _, _ in scorable],
+        )
+
+        for position, (index, data, customer, stats) in enumerate(scorable):
+            if scored['unsettled'][position]:
+                try:
+                    result = eligibility_from_stats(
+                        customer, stats, data['loan_amount'], data['interest_rate'], data['tenure']
+                    )
+                except Exception as e:
+                    results[index] = {"error": str(e)}
+                    continue
+            else:
+                result = {key: scored[key][position].item() for key in (
+                    'approval', 'corrected_interest_rate', 'monthly_installment'
+                )}
+            results[index] = {
+                'customer_id': data['customer_id'],
+                'approval': result['approval'],
+                'interest_rate': float(data['interest_rate']),
+                'corrected_interest_rate': float(result['corrected_interest_rate']),
+                'tenure': data['tenure'],
+                'monthly_installment': float(result['monthly_installment']),
+            }
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+class LoanOffersView(APIView):
+    """
+    The largest approvable loan per tenure for a customer at a requested
+    interest rate, so clients need not probe check-eligibility with different
+    amounts. Each offer is approved by check-eligibility with the same terms.
+    """
+    def get(self, request, customer_id):
+        serializer = LoanOffersRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            logger.warning(f"Loan offer validation errors: {serializer.errors}")
+            return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        customer, error_resp = get_valid_customer(customer_id)
+        if error_resp:
+            return error_resp
+        tenures = sorted(set(data.get('tenure') or OFFER_TENURES))
+        try:
+            result = loan_offers(customer, data['interest_rate'], tenures)
+        except DatabaseError:
+            logger.error("Database error while calculating credit score.")
+            return error_response("Database error while calculating credit score.", status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except ValueError as e:
+            logger.warning(f"Value error: {e}")
+            return error_response(str(e), status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'customer_id': customer.customer_id,
+            'approval': result['approval'],
+            'message': result['message'],
+            'interest_rate': data['interest_rate'],
+            'corrected_interest_rate': float(result['corrected_interest_rate']),
+            'offers': [
+                {
+                    'tenure': offer['tenure'],
+                    'max_loan_amount': float(offer['max_loan_amount']),
+                    'monthly_installment': float(offer['monthly_installment']),
+                    'limited_by': offer['limited_by'],
+                }
+                for offer in result['offers']
+            ],
+        }, status=status.HTTP_200_OK)
+
 class ViewLoanDetail(APIView):
+    """
+    Loan detail, served from the response cache with ETag / Last-Modified.
+    """
+    def get(self, request, loan_id):
+        try:
+            return cached_response(request, loan_detail_key(loan_id), lambda: self.build(loan_id))
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            return error_response(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def build(self, loan_id):
+        row = LoanDetailValuesSerializer.project(Loan.objects.filter(loan_id=loan_id)).first()
+        if row is None:
+            logger.info(f"Loan not found: {loan_id}")
+            return error_response('Loan not found', status.HTTP_404_NOT_FOUND)
+        return row['customer_id'], LoanDetailValuesSerializer.to_representation(row)
+
+class LoanAmortizationView(APIView):
+    """
+    Stream a loan's month-by-month repayment schedule as a JSON document,
+    writing the rows in chunks instead of building the whole body in memory.
+    """
+    chunk_months = 120
+
     def get(self, request, loan_id):
         try:
-            loan = Loan.objects.select_related('customer').get(loan_id=loan_id)
-            serializer = LoanDetailSerializer(loan)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            loan = Loan.objects.only('loan_id', 'loan_amount', 'interest_rate', 'tenure').get(loan_id=loan_id)
         except Loan.DoesNotExist:
             logger.info(f"Loan not found: {loan_id}")
             return error_response('Loan not found', status.HTTP_404_NOT_FOUND)
-        except Exception as e:
+        except DatabaseError as e:
             logger.error(f"Unexpected error: {e}")
             return error_response(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
+        schedule = amortization_schedule(float(loan.loan_amount), float(loan.interest_rate), loan.tenure)
+        return StreamingHttpResponse(self.render(loan, schedule), content_type='application/json')
+
+    def render(self, loan, schedule):
+        yield (
+            f'{{"loan_id":{loan.loan_id},"loan_amount":"{loan.loan_amount:.2f}",'
+            f'"interest_rate":"{loan.interest_rate:.2f}","tenure":{loan.tenure},'
+            f'"monthly_installment":"{schedule["emi"]:.2f}","schedule":['
+        )
+        columns = zip(
+            schedule['month'].tolist(), schedule['payment'].tolist(), schedule['principal'].tolist(),
+            schedule['interest'].tolist(), schedule['balance'].tolist(),
+        )
+        rows = []
+        separator = ''
+        for month, payment, principal, interest, balance in columns:
+            rows.append(
+                f'{{"month":{month},"payment":"{payment:.2f}","principal":"{principal:.2f}",'
+                f'"interest":"{interest:.2f}","balance":"{balance:.2f}"}}'
+            )
+            if len(rows) == self.chunk_months:
+                yield separator + ','.join(rows)
+                rows, separator = [], ','
+        if rows:
+            yield separator + ','.join(rows)
+        yield ']}'
 
 class ViewLoansByCustomer(APIView):
+    """
+    List a customer's loans.
+
+    - Default: the full list in one response, served from the response cache
+      with ETag / Last-Modified.
+    - ?page_size=N and/or ?cursor=...: keyset-paginated pages on loan_id with
+      next/previous links.
+    - ?stream=ndjson or ?stream=json: every loan, written in chunks from a
+      server-side cursor so memory and time-to-first-byte stay flat.
+    """
+    pagination_class = LoanCursorPagination
+    stream_chunk_size = 2000
+    stream_formats = {'ndjson': 'application/x-ndjson', 'json': 'application/json'}
+
     def get(self, request, customer_id):
         try:
-            customer = Customer.objects.get(pk=customer_id)
-            loans = Loan.objects.filter(customer=customer)
-            if not loans.exists():
-                return Response({"message": "No loans found."}, status=status.HTTP_200_OK)
-            serializer = CustomerLoanListSerializer(loans, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Customer.DoesNotExist:
-            logger.info(f"Customer not found: {customer_id}")
-            return error_response("Customer not found.", status.HTTP_404_NOT_FOUND)
+            stream = request.query_params.get('stream')
+            paginate = 'cursor' in request.query_params or 'page_size' in request.query_params
+            if stream is None and not paginate:
+                return cached_response(request, customer_loans_key(customer_id), lambda: self.build(customer_id))
+            customer = get_customer_loader().get(customer_id)
+            if customer is None:
+                logger.info(f"Customer not found: {customer_id}")
+                return error_response("Customer not found.", status.HTTP_404_NOT_FOUND)
+            loans = CustomerLoanListValuesSerializer.project(Loan.objects.filter(customer=customer))
+            if stream is not None:
+                if stream not in self.stream_formats:
+                    return error_response(f"stream must be one of: {', '.join(self.stream_formats)}.")
+                response = StreamingHttpResponse(self.stream(loans, stream), content_type=self.stream_formats[stream])
+                response['X-Accel-Buffering'] = 'no'
+                return response
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(loans, request, view=self)
+            return paginator.get_paginated_response(CustomerLoanListValuesSerializer.many(page))
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return error_response(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def build(self, customer_id):
+        customer = get_customer_loader().get(customer_id)
+        if customer is None:
+            logger.info(f"Customer not found: {customer_id}")
+            return error_response("Customer not found.", status.HTTP_404_NOT_FOUND)
+        data = CustomerLoanListValuesSerializer.many(
+            CustomerLoanListValuesSerializer.project(Loan.objects.filter(customer=customer))
+        )
+        if not data:
+            data = {"message": "No loans found."}
+        return customer.customer_id, data
+
+    def stream(self, loans, fmt):
+        """
+        Yield the loans as NDJSON lines or as one JSON array, a chunk at a time.
+        """
+        to_representation = CustomerLoanListValuesSerializer.to_representation
+        rows = (
+            json.dumps(to_representation(row), ensure_ascii=False, separators=(',', ':')).encode()
+            for row in loans.order_by('loan_id').iterator(chunk_size=self.stream_chunk_size)
+        )
+        if fmt == 'ndjson':
+            yield from (row + b'\n' for row in rows)
+            return
+        yield b'['
+        separator = b''
+        for row in rows:
+            yield separator + row
+            separator = b','
+        yield b']'
+
 class CreateLoanView(APIView):
+    """
+    Create a loan if the customer is eligible.
+
+    The customer row is locked (SELECT ... FOR UPDATE) from validation through
+    the eligibility check to the insert, so concurrent requests for the same
+    customer cannot both pass the EMI-to-income test on stale figures.
+    Requests for other customers are not blocked.
+
+    With an Idempotency-Key header, the response is stored under the key and
+    retries get it back without the loan being scored or created again (see
+    core.idempotency). Server errors are not stored, so they can be retried.
+    """
+    idempotency_scope = 'create-loan'
+
     def post(self, request):
+        key = request.headers.get(idempotency.HEADER)
+        if key is not None:
+            error = idempotency.key_error(key)
+            if error:
+                return error_response(error)
+            request_fingerprint = idempotency.fingerprint(request.data)
+            stored = idempotency.get_cached(self.idempotency_scope, key)
+            if stored is not None:
+                return idempotency.replay(request_fingerprint, stored)
         try:
-            serializer = CreateLoanRequestSerializer(data=request.data)
-            if not serializer.is_valid():
-                logger.warning(f"Loan creation validation errors: {serializer.errors}")
-                return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
-            data = serializer.validated_data
-            customer_id = data['customer_id']
-            loan_amount = Decimal(str(data['loan_amount']))
-            interest_rate = Decimal(str(data['interest_rate']))
-            tenure = data['tenure']
-            customer, error_resp = get_valid_customer(customer_id)
-            if error_resp:
-                return error_resp
+            with transaction.atomic(), get_customer_loader().locking():
+                if key is None:
+                    return self.create_loan(request)
+                record = idempotency.claim(self.idempotency_scope, key, request_fingerprint)
+                if record is not None:
+                    return idempotency.replay_record(request_fingerprint, record)
+                response = self.create_loan(request)
+                if response.status_code >= 500:
+                    transaction.set_rollback(True)
+                else:
+                    idempotency.complete(self.idempotency_scope, key, request_fingerprint, response)
+                return response
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            return error_response(f"Unexpected error: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def create_loan(self, request):
+        serializer = CreateLoanRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.warning(f"Loan creation validation errors: {serializer.errors}")
+            return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        customer_id = data['customer_id']
+        loan_amount = Decimal(str(data['loan_amount']))
+        interest_rate = Decimal(str(data['interest_rate']))
+        tenure = data['tenure']
+        customer, error_resp = get_valid_customer(customer_id)
+        if error_resp:
+            return error_resp
+        try:
+            result = check_eligibility(customer, loan_amount, interest_rate, tenure)
+        except DatabaseError:
+            logger.error("Database error while calculating credit score.")
+            return error_response("Database error while calculating credit score.", status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except ValueError as e:
+            logger.warning(f"Value error: {e}")
+            return error_response(str(e), status.HTTP_400_BAD_REQUEST)
+        loan_id = None
+        approval = result['approval']
+        monthly_installment = result['monthly_installment']
+        message = result['message']
+        if approval:
             try:
-                result = check_eligibility(customer, loan_amount, interest_rate, tenure)
+                with transaction.atomic():
+                    start_date = datetime.now().date()
+                    end_date = start_date + timedelta(days=tenure * 30)
+                    loan = Loan.objects.create(
+                        customer=customer,
+                        loan_amount=loan_amount,
+                        interest_rate=result['corrected_interest_rate'],
+                        tenure=tenure,
+                        monthly_payment=monthly_installment,
+                        start_date=start_date,
+                        end_date=end_date,
+                        emi_paid_on_time=0
+                    )
+                    loan_id = loan.loan_id
+                    message = "Loan approved and created successfully."
             except DatabaseError:
-                logger.error("Database error while calculating credit score.")
-                return error_response("Database error while calculating credit score.", status.HTTP_500_INTERNAL_SERVER_ERROR)
-            except ValueError as e:
-                logger.warning(f"Value error: {e}")
-                return error_response(str(e), status.HTTP_400_BAD_REQUEST)
-            loan_id = None
-            approval = result['approval']
-            monthly_installment = result['monthly_installment']
-            message = result['message']
-            if approval:
-                try:
-                    with transaction.atomic():
-                        start_date = datetime.now().date()
-                        end_date = start_date + timedelta(days=tenure * 30)
-                        loan = Loan.objects.create(
-                            customer=customer,
-                            loan_amount=loan_amount,
-                            interest_rate=result['corrected_interest_rate'],
-                            tenure=tenure,
-                            monthly_payment=monthly_installment,
-                            start_date=start_date,
-                            end_date=end_date,
-                            emi_paid_on_time=0
-                        )
-                        loan_id = loan.loan_id
-                        message = "Loan approved and created successfully."
-                except DatabaseError:
-                    logger.error("Database error while creating loan.")
-                    return error_response("Database error while creating loan.", status.HTTP_500_INTERNAL_SERVER_ERROR)
-            response_data = {
-                'loan_id': loan_id,
-                'customer_id': customer_id,
-                'loan_approved': approval,
-                'message': message,
-                'monthly_installment': float(monthly_installment)
-            }
-            response_serializer = CreateLoanResponseSerializer(data=response_data)
-            if not response_serializer.is_valid():
-                logger.error("Error formatting loan creation response data.")
-                return error_response("Error formatting response data.", status.HTTP_500_INTERNAL_SERVER_ERROR)
-            return Response(response_serializer.data, status=status.HTTP_200_OK)
+                logger.error("Database error while creating loan.")
+                return error_response("Database error while creating loan.", status.HTTP_500_INTERNAL_SERVER_ERROR)
+        response_data = {
+            'loan_id': loan_id,
+            'customer_id': customer_id,
+            'loan_approved': approval,
+            'message': message,
+            'monthly_installment': float(monthly_installment)
+        }
+        response_serializer = CreateLoanResponseSerializer(data=response_data)
+        if not response_serializer.is_valid():
+            logger.error("Error formatting loan creation response data.")
+            return error_response("Error formatting response data.", status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(response_serializer.data, status=status.HTTP_200_OK)
+
+class PostRepaymentsView(APIView):
+    """
+    Post many EMI repayments in one request. Records are applied with
+    set-based updates in chunked transactions (see core.repayments), which
+    also reduce the customers' current debt. Results are returned in request
+    order: applied records with the loan's new EMI count, others with an error.
+    Staff only.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    chunk_size = 1000
+
+    def post(self, request):
+        serializer = RepaymentBatchRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.warning(f"Repayment validation errors: {serializer.errors}")
+            return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        repayments = serializer.validated_data['repayments']
+        results = [None] * len(repayments)
+
+        valid = []
+        for index, item in enumerate(repayments):
+            item_serializer = RepaymentItemSerializer(data=item)
+            if item_serializer.is_valid():
+                valid.append((index, item_serializer.validated_data))
+            else:
+                results[index] = {"status": "rejected", "errors": item_serializer.errors}
+
+        posted = post_repayments(
+            ((data['loan_id'], data['emis_paid']) for _, data in valid), self.chunk_size
+        )
+        for (index, _), result in zip(valid, posted):
+            results[index] = result
+        counts = summarize_repayments(posted)
+        counts['rejected'] += len(repayments) - len(valid)
+        return Response({**counts, "results": results}, status=status.HTTP_200_OK)
+
+class LoanBookExportView(APIView):
+    """
+    Stream the whole loan book (or a customer range / start_date window of it)
+    as CSV, NDJSON or Parquet. Staff only.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    chunk_size = 2000
+
+    def get(self, request, dataset, fmt):
+        serializer = LoanBookExportRequestSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            export = LoanBookExport(dataset, fmt, self.chunk_size, **serializer.validated_data)
+        except ValueError as e:
+            return error_response(str(e))
+        response = StreamingHttpResponse(export, content_type=export.content_type)
+        response['Content-Disposition'] = f'attachment; filename="{export.filename}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+class CacheStatsView(APIView):
+    """
+    Response cache hit/miss counters for this process. Staff only.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats(), status=status.HTTP_200_OK)
+
+class PoolStatsView(APIView):
+    """
+    Database connection pool statistics for this process. Staff only.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(pool_stats(), status=status.HTTP_200_OK)
+
+class MetricsView(View):
+    """
+    Request metrics of this process in Prometheus text format. Open unless
+    METRICS_TOKEN is set, in which case scrapes must send it as a bearer token.
+    """
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def get(self, request):
+        if settings.METRICS_TOKEN and not hmac.compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'
+        ):
+            return HttpResponseForbidden()
+        return HttpResponse(render_metrics(), content_type=self.content_type)
+
+# Async (ASGI) versions of the hot read endpoints. They are plain Django views
+# with async handlers, because DRF's APIView is synchronous, but they accept
+# and return the same JSON as their APIView counterparts above.
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    start = time.perf_counter()
+    body = JSONRenderer().render(data)
+    record_serialization(time.perf_counter() - start)
+    return HttpResponse(body, status=status_code, content_type='application/json')
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncCheckEligibilityView(View):
+    """
+    Async CheckEligibilityView using the async ORM and acheck_eligibility().
+    """
+    async def post(self, request):
+        try:
+            body = json.loads(request.body or b'{}')
+        except ValueError as e:
+            return json_response({"detail": f"JSON parse error - {e}"}, status.HTTP_400_BAD_REQUEST)
+        serializer = CheckEligibilityItemSerializer(data=body)
+        serializer.is_valid()
+        errors = dict(serializer.errors)
+        customer = None
+        # A body that is not a JSON object only gets the serializer's non_field_errors.
+        if isinstance(body, dict) and 'customer_id' not in errors:
+            # Same check as CheckEligibilityRequestSerializer.validate_customer_id, done with the async ORM.
+            customer = await get_customer_loader().aget(serializer.fields['customer_id'].to_internal_value(body['customer_id']))
+            if customer is None:
+                errors = {"customer_id": ["Customer with this ID does not exist."], **errors}
+        if errors:
+            logger.warning(f"Eligibility validation errors: {errors}")
+            return json_response({"errors": errors}, status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        error = customer_limits_error(customer)
+        if error:
+            return json_response({"error": error}, status.HTTP_400_BAD_REQUEST)
+        try:
+            result = await acheck_eligibility(customer, data['loan_amount'], data['interest_rate'], data['tenure'])
+        except Exception as e:
+            logger.error(f"Eligibility check failed: {e}")
+            return json_response({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+        response_serializer = CheckEligibilityResponseSerializer(data={
+            'customer_id': data['customer_id'],
+            'approval': result['approval'],
+            'interest_rate': float(data['interest_rate']),
+            'corrected_interest_rate': float(result['corrected_interest_rate']),
+            'tenure': data['tenure'],
+            'monthly_installment': float(result['monthly_installment'])
+        })
+        if not response_serializer.is_valid():
+            logger.error("Error formatting eligibility response data.")
+            return json_response({"error": "Error formatting response data."}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return json_response(response_serializer.data)
+
+class AsyncViewLoanDetail(View):
+    """
+    Async ViewLoanDetail, sharing its response cache entries.
+    """
+    async def get(self, request, loan_id):
+        try:
+            return await acached_response(
+                request, loan_detail_key(loan_id), lambda: self.build(loan_id), json_response
+            )
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
-            return error_response(f"Unexpected error: {str(e)}", status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return json_response({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    async def build(self, loan_id):
+        row = await LoanDetailValuesSerializer.project(Loan.objects.filter(loan_id=loan_id)).afirst()
+        if row is None:
+            logger.info(f"Loan not found: {loan_id}")
+            return json_response({"error": "Loan not found"}, status.HTTP_404_NOT_FOUND)
+        return row['customer_id'], LoanDetailValuesSerializer.to_representation(row)
+
+class AsyncViewLoansByCustomer(View):
+    """
+    Async ViewLoansByCustomer (full list only), sharing its response cache
+    entries. Pagination and streaming are served by the sync view.
+    """
+    async def get(self, request, customer_id):
+        if request.GET.keys() & {'cursor', 'page_size', 'stream'}:
+            return json_response(
+                {"error": "Pagination and streaming are only available on /view-loans/."}, status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            return await acached_response(
+                request, customer_loans_key(customer_id), lambda: self.build(customer_id), json_response
+            )
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            return json_response({"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    async def build(self, customer_id):
+        customer = await get_customer_loader().aget(customer_id)
+        if customer is None:
+            logger.info(f"Customer not found: {customer_id}")
+            return json_response({"error": "Customer not found."}, status.HTTP_404_NOT_FOUND)
+        loans = CustomerLoanListValuesSerializer.project(Loan.objects.filter(customer_id=customer_id))
+        data = [CustomerLoanListValuesSerializer.to_representation(row) async for row in loans]
+        if not data:
+            data = {"message": "No loans found."}
+        return customer.customer_id, data
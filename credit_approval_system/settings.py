@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.CustomerLoaderMiddleware',
 ]
 
 ROOT_URLCONF = 'credit_approval_system.urls'
@@ -75,6 +78,20 @@ WSGI_APPLICATION = 'credit_approval_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection reuse is tuned with environment variables:
+# - DB_POOL=1 enables a bounded psycopg connection pool per process
+#   (DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT seconds to wait for a
+#   free connection, DB_POOL_MAX_IDLE / DB_POOL_MAX_LIFETIME seconds).
+# - Otherwise DB_CONN_MAX_AGE > 0 keeps one persistent connection per thread.
+# - With neither, every request opens a new connection.
+# Reused connections are health-checked before being handed out unless
+# DB_CONN_HEALTH_CHECKS is turned off.
+
+def env_flag(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+DB_POOL = env_flag('DB_POOL')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -83,9 +100,80 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD', 'mypassword'),
         'HOST': os.environ.get('DB_HOST', 'db'),
         'PORT': os.environ.get('DB_PORT', '5432'),
+        # Pooling and persistent connections are mutually exclusive in Django.
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', '0')),
+        'CONN_HEALTH_CHECKS': env_flag('DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {},
     }
 }
 
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', '600')),
+        'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', '3600')),
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory (per process, LRU-evicted beyond CACHE_MAX_ENTRIES) by default.
+# A local-memory cache only sees invalidations made in its own process, so a
+# change made through another worker or a management command is served stale
+# until the entry expires; its TTL is kept short for that reason.
+# Point CACHE_BACKEND/CACHE_LOCATION at a shared backend such as
+# django.core.cache.backends.redis.RedisCache so every worker, and management
+# commands, see the same entries and invalidations.
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+LOCAL_CACHE = CACHE_BACKEND.endswith('LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'credit-approval'),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', '5' if LOCAL_CACHE else '300')),
+    }
+}
+
+if LOCAL_CACHE:
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '10000'))}
+
+
+# Idempotency keys
+# Responses stored for create-loan requests sent with an Idempotency-Key header
+# are kept this long; purge them with `manage.py purge_idempotency_keys`.
+
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
+
+# Stored credit scores
+# Scores written by `manage.py score_all_customers` are used by eligibility
+# checks while younger than this and newer than the customer's credit profile;
+# otherwise the score is computed live. 0 always computes live.
+
+CREDIT_SCORE_MAX_AGE_HOURS = float(os.environ.get('CREDIT_SCORE_MAX_AGE_HOURS', '24'))
+
+
+# Metrics
+# Per-process request metrics are served in Prometheus text format at /metrics.
+# Set METRICS_TOKEN to require `Authorization: Bearer <token>` on scrapes.
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
+# Profiling
+# Off unless PROFILING_SAMPLE_RATE (fraction of requests, e.g. 0.001) or
+# PROFILING_TOKEN (sent as the X-Profile-Token header) is set. Reports are kept
+# in PROFILING_DIR, newest PROFILING_MAX_REPORTS only; see `manage.py profiles`.
+
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+PROFILING_DIR = os.environ.get('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+PROFILING_MAX_REPORTS = int(os.environ.get('PROFILING_MAX_REPORTS', '100'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators